@@ -0,0 +1,165 @@
+import hashlib
+import logging
+import boto3
+from boto3.dynamodb.conditions import Key
+from datetime import datetime, timezone
+from defaultInstance import DefaultInstance
+
+# Configuração de logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Constantes
+ARTIFACT_INDEX_TABLE = 'generated-artifacts-index'
+USER_HISTORY_INDEX = 'user-history-index'
+DEFAULT_USER_ID = 'anonymous'
+DEFAULT_PAGE_SIZE = 20
+
+def _is_trackable(request_id):
+    # Sem requestId real todas as requisições cairiam no mesmo item do índice
+    return bool(request_id) and request_id != 'unknown'
+
+def build_index_entry(request_id, language, kind, bucket, s3_key, content, timings=None, user_id=None):
+    """
+    Monta a entrada de índice de um artefato gerado (código ou BDD).
+    Tempos em milissegundos inteiros (DynamoDB não aceita float).
+    """
+    body = content.encode('utf-8') if isinstance(content, str) else content
+    return {
+        'requestId': request_id,
+        'userId': user_id or DEFAULT_USER_ID,
+        'language': language,
+        'kind': kind,
+        'bucket': bucket,
+        'key': s3_key,
+        'size': len(body),
+        'sha256': hashlib.sha256(body).hexdigest(),
+        'timings': {name: int(value) for name, value in (timings or {}).items()},
+        'createdAt': datetime.now(timezone.utc).isoformat()
+    }
+
+class DynamoArtifactIndex:
+    """
+    Índice de artefatos no DynamoDB: um item por requestId com um mapa de artefatos.
+
+    A busca por requisição é um GetItem; o histórico por usuário usa o GSI
+    USER_HISTORY_INDEX (userId + createdAt) com paginação por LastEvaluatedKey.
+    """
+
+    def __init__(self, table_name=ARTIFACT_INDEX_TABLE):
+        self.table = boto3.resource('dynamodb').Table(table_name)
+
+    def put_artifact(self, entry):
+        slot = f"{entry['kind']}_{entry['language']}"
+        self.table.update_item(
+            Key={'requestId': entry['requestId']},
+            UpdateExpression=(
+                'SET artifacts = if_not_exists(artifacts, :empty), '
+                'userId = if_not_exists(userId, :user), '
+                'createdAt = if_not_exists(createdAt, :created), '
+                'updatedAt = :created'
+            ),
+            ExpressionAttributeValues={
+                ':empty': {},
+                ':user': entry['userId'],
+                ':created': entry['createdAt']
+            }
+        )
+        # Segunda escrita separada: DynamoDB não permite criar o mapa e
+        # um atributo aninhado dele na mesma expressão
+        self.table.update_item(
+            Key={'requestId': entry['requestId']},
+            UpdateExpression='SET artifacts.#slot = :entry',
+            ExpressionAttributeNames={'#slot': slot},
+            ExpressionAttributeValues={':entry': entry}
+        )
+
+    def get_request(self, request_id):
+        response = self.table.get_item(Key={'requestId': request_id})
+        return response.get('Item')
+
+    def query_history(self, user_id, limit=DEFAULT_PAGE_SIZE, cursor=None):
+        params = {
+            'IndexName': USER_HISTORY_INDEX,
+            'KeyConditionExpression': Key('userId').eq(user_id),
+            'ScanIndexForward': False,
+            'Limit': limit
+        }
+        if cursor:
+            params['ExclusiveStartKey'] = cursor
+        response = self.table.query(**params)
+        return response.get('Items', []), response.get('LastEvaluatedKey')
+
+class LocalArtifactIndex:
+    """
+    Substituto em memória do DynamoArtifactIndex para testes e execução local.
+    """
+
+    def __init__(self):
+        self.items = {}
+
+    def put_artifact(self, entry):
+        item = self.items.setdefault(entry['requestId'], {
+            'requestId': entry['requestId'],
+            'userId': entry['userId'],
+            'createdAt': entry['createdAt'],
+            'artifacts': {}
+        })
+        item['updatedAt'] = entry['createdAt']
+        item['artifacts'][f"{entry['kind']}_{entry['language']}"] = dict(entry)
+
+    def get_request(self, request_id):
+        return self.items.get(request_id)
+
+    def query_history(self, user_id, limit=DEFAULT_PAGE_SIZE, cursor=None):
+        ordered = sorted(
+            (item for item in self.items.values() if item['userId'] == user_id),
+            key=lambda item: (item['createdAt'], item['requestId']),
+            reverse=True
+        )
+        if cursor:
+            position = (cursor['createdAt'], cursor['requestId'])
+            ordered = [item for item in ordered if (item['createdAt'], item['requestId']) < position]
+        page = ordered[:limit]
+        next_cursor = None
+        if len(ordered) > limit:
+            last = page[-1]
+            next_cursor = {'requestId': last['requestId'], 'userId': user_id, 'createdAt': last['createdAt']}
+        return page, next_cursor
+
+# Índice padrão (DynamoDB); set_artifact_index troca por LocalArtifactIndex em testes
+_default_index = DefaultInstance(DynamoArtifactIndex)
+get_artifact_index = _default_index.get
+set_artifact_index = _default_index.set
+
+def record_artifact(entry, index=None):
+    """
+    Registra um artefato no índice. Falhas são logadas e não interrompem o fluxo.
+
+    Artefatos sem requestId rastreável não são indexados.
+    """
+    if not _is_trackable(entry.get('requestId')):
+        logger.info(f"Artefato sem requestId, não indexado: {entry['kind']}/{entry['language']} -> {entry['key']}")
+        return False
+    try:
+        (index or get_artifact_index()).put_artifact(entry)
+        logger.info(f"Artefato indexado: {entry['requestId']} {entry['kind']}/{entry['language']} -> {entry['key']}")
+        return True
+    except Exception as e:
+        logger.error(f"Erro ao indexar artefato: {str(e)}")
+        return False
+
+def get_request_artifacts(request_id, index=None):
+    """
+    Busca todos os artefatos de uma requisição com uma leitura pontual.
+    """
+    if not _is_trackable(request_id):
+        return {}
+    item = (index or get_artifact_index()).get_request(request_id)
+    return item.get('artifacts', {}) if item else {}
+
+def list_user_history(user_id, limit=DEFAULT_PAGE_SIZE, cursor=None, index=None):
+    """
+    Lista o histórico de requisições de um usuário, mais recentes primeiro, paginado.
+    """
+    return (index or get_artifact_index()).query_history(user_id, limit=limit, cursor=cursor)
@@ -0,0 +1,292 @@
+import ast
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from bedrockScheduler import LANE_INTERACTIVE, DEFAULT_TENANT
+from modelInvocation import invoke_model_text, prepare_model_clients
+from deadlines import DeadlineExceeded
+from outputEnvelope import extract_artifact
+
+# Configuração de logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Constantes
+UNIT_MAX_TOKENS = 2000
+UNIT_POOL_SIZE = 4
+MAX_UNITS = 10
+JAVA_TYPE_DECLARATION = re.compile(
+    r'^[ \t]*public\s+(?:(?:abstract|final|static|sealed)\s+)*(class|interface|enum|record)\s+(\w+)[^{]*\{',
+    re.MULTILINE
+)
+JAVA_PUBLIC_METHOD = re.compile(r'^[ \t]*public\s+[\w<>\[\],.? ]+?\s+(\w+)\s*\([^)]*\)', re.MULTILINE)
+SCENARIO_LINE = re.compile(
+    r'^\s*(?:Scenario(?: Outline| Template)?|Example|Cen[aá]rio|Esquema do Cen[aá]rio|Delinea[çc][ãa]o do Cen[aá]rio|Exemplo)\s*:',
+    re.MULTILINE
+)
+LANGUAGE_HEADER = re.compile(r'^\s*#\s*language:\s*(\S+)', re.MULTILINE)
+
+# Palavras-chave Gherkin equivalentes (inglês -> português); as mais longas primeiro
+GHERKIN_KEYWORDS = [
+    ('Scenario Outline', 'Esquema do Cenário'),
+    ('Scenario Template', 'Esquema do Cenário'),
+    ('Feature', 'Funcionalidade'),
+    ('Rule', 'Regra'),
+    ('Background', 'Contexto'),
+    ('Scenario', 'Cenário'),
+    ('Examples', 'Exemplos'),
+    ('Example', 'Exemplo'),
+    ('Given', 'Dado'),
+    ('When', 'Quando'),
+    ('Then', 'Então'),
+    ('And', 'E'),
+    ('But', 'Mas'),
+]
+PT_KEYWORD_VARIANTS = {
+    'Esquema do Cenario': 'Esquema do Cenário', 'Delineação do Cenário': 'Esquema do Cenário',
+    'Delineacao do Cenario': 'Esquema do Cenário', 'Cenario': 'Cenário', 'Característica': 'Funcionalidade',
+    'Caracteristica': 'Funcionalidade', 'Cenários': 'Exemplos', 'Cenarios': 'Exemplos',
+    'Dada': 'Dado', 'Dados': 'Dado', 'Dadas': 'Dado', 'Entao': 'Então'
+}
+
+def index_python_code(code):
+    """
+    Unidades públicas de um módulo Python (classes e funções de topo) via ast.
+    """
+    tree = ast.parse(code)
+    units = []
+    for node in tree.body:
+        if not isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)) or node.name.startswith('_'):
+            continue
+        if isinstance(node, ast.ClassDef):
+            methods = [
+                f"{item.name}({ast.unparse(item.args)})"
+                for item in node.body
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))
+                and (not item.name.startswith('_') or item.name == '__init__')
+            ]
+            signature = f"class {node.name}: " + '; '.join(methods)
+            kind = 'class'
+        else:
+            signature = f"def {node.name}({ast.unparse(node.args)})"
+            kind = 'function'
+        units.append({
+            'name': node.name,
+            'kind': kind,
+            'signature': signature,
+            'source': ast.get_source_segment(code, node)
+        })
+    return units
+
+def _matching_brace(code, open_index):
+    # Percorre ignorando strings, chars e comentários até fechar a chave
+    depth = 0
+    index = open_index
+    length = len(code)
+    while index < length:
+        char = code[index]
+        if code.startswith('//', index):
+            index = code.find('\n', index)
+            if index < 0:
+                return length - 1
+        elif code.startswith('/*', index):
+            index = code.find('*/', index + 2)
+            if index < 0:
+                return length - 1
+            index += 1
+        elif char in '"\'':
+            index += 1
+            while index < length and code[index] != char:
+                index += 2 if code[index] == '\\' else 1
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return index
+        index += 1
+    return length - 1
+
+def index_java_code(code):
+    """
+    Unidades públicas de código Java (tipos de topo) por um scanner de declarações.
+    """
+    units = []
+    position = 0
+    while True:
+        match = JAVA_TYPE_DECLARATION.search(code, position)
+        if not match:
+            break
+        end = _matching_brace(code, match.end() - 1)
+        source = code[match.start():end + 1]
+        methods = [
+            method.group(0).strip()
+            for method in JAVA_PUBLIC_METHOD.finditer(source)
+            if method.group(1) != match.group(2)  # cabeçalho de record
+        ]
+        units.append({
+            'name': match.group(2),
+            'kind': match.group(1),
+            'signature': f"{match.group(1)} {match.group(2)}: " + '; '.join(methods),
+            'source': source.strip()
+        })
+        position = end + 1
+    return units
+
+def index_code(code, language):
+    """
+    Indexa o código na linguagem informada; erro de parse resulta em lista vazia.
+    """
+    try:
+        units = index_python_code(code) if language == 'python' else index_java_code(code)
+    except SyntaxError as e:
+        logger.info(f"Código não indexável ({str(e)}), usando geração única")
+        return []
+    return units[:MAX_UNITS]
+
+def build_unit_bdd_prompt(unit, shared_signatures, language):
+    """
+    Prompt BDD de uma unidade: apenas o código dela e as assinaturas compartilhadas.
+    """
+    return f"""
+Você é um especialista em testes BDD (Behavior Driven Development) e Quality Assurance.
+
+Gere UMA Feature Gherkin, em português brasileiro, para a unidade {unit['name']} do código {language.upper()}.
+
+ASSINATURAS PÚBLICAS DO SISTEMA (apenas referência):
+{shared_signatures}
+
+UNIDADE A SER TESTADA:
+```{language}
+{unit['source']}
+```
+
+DIRETRIZES:
+- Use o formato Gherkin padrão (Feature, Scenario, Given, When, Then)
+- Cubra o fluxo principal, validações de entrada, erros e casos extremos desta unidade
+- Cada cenário deve ser independente e usar dados de exemplo realistas
+- Use linguagem de negócio, não técnica
+
+FORMATO DE SAÍDA:
+- APENAS código Gherkin, começando por "Feature:"
+- Não inclua explicações nem markdown
+"""
+
+def count_scenarios(feature_text):
+    """
+    Cenários de um .feature em inglês ou português (Scenario, Scenario Outline, Cenário, Esquema do Cenário...).
+    """
+    return len(SCENARIO_LINE.findall(feature_text))
+
+def detect_dialect(feature_text):
+    """
+    Dialeto Gherkin do texto: o cabeçalho `# language:` ou, sem ele, 'pt' se usar palavras-chave em português.
+    """
+    header = LANGUAGE_HEADER.search(feature_text)
+    if header:
+        return header.group(1).split('-')[0].lower()
+    if re.search(r'^\s*(Funcionalidade|Cen[aá]rio|Esquema do Cen[aá]rio|Regra)\s*:', feature_text, re.MULTILINE):
+        return 'pt'
+    return 'en'
+
+def _keyword_pattern(keywords):
+    alternatives = '|'.join(re.escape(keyword) for keyword in sorted(keywords, key=len, reverse=True))
+    return re.compile(rf'^(\s*)({alternatives})(?=\s*:|\s)')
+
+def translate_keywords(feature_text, dialect):
+    """
+    Reescreve as palavras-chave do início de cada linha no dialeto informado ('pt' ou 'en').
+
+    Passos (Given/Dado...) levam o restante da linha; apenas a palavra-chave muda.
+    """
+    if dialect == 'pt':
+        mapping = dict(GHERKIN_KEYWORDS)
+    else:
+        mapping = {pt: en for en, pt in reversed(GHERKIN_KEYWORDS)}
+        mapping.update({variant: mapping[canonical] for variant, canonical in PT_KEYWORD_VARIANTS.items()})
+    pattern = _keyword_pattern(mapping)
+    return '\n'.join(
+        pattern.sub(lambda match: match.group(1) + mapping[match.group(2)], line)
+        for line in feature_text.split('\n')
+    )
+
+def merge_features(title, unit_features):
+    """
+    Junta as Features de cada unidade em um .feature válido: uma Feature com uma Rule por unidade.
+
+    O arquivo usa o dialeto da maioria das unidades; com português, sai com
+    `# language: pt` e Funcionalidade/Regra, e as unidades em inglês são
+    traduzidas (o parser não aceita dialetos misturados).
+    """
+    texts = [(unit_name, extract_artifact(feature_text, 'gherkin')) for unit_name, feature_text in unit_features]
+    dialects = [detect_dialect(text) for _, text in texts]
+    dialect = 'pt' if dialects.count('pt') > len(dialects) / 2 else 'en'
+    feature_keyword, rule_keyword = ('Funcionalidade', 'Regra') if dialect == 'pt' else ('Feature', 'Rule')
+
+    lines = (['# language: pt'] if dialect == 'pt' else []) + [f"{feature_keyword}: {title}", '']
+    for (unit_name, text), unit_dialect in zip(texts, dialects):
+        if unit_dialect != dialect:
+            text = translate_keywords(text, dialect)
+        body = text.split('\n')
+        feature_index = next((index for index, line in enumerate(body) if re.match(r'^\s*(Feature|Funcionalidade|Caracter[ií]stica):', line)), None)
+        if feature_index is None:
+            rule_title, rest, tags = unit_name, [line for line in body if not LANGUAGE_HEADER.match(line)], []
+        else:
+            rule_title = body[feature_index].split(':', 1)[1].strip() or unit_name
+            tags = [line.strip() for line in body[:feature_index] if line.strip().startswith('@')]
+            rest = body[feature_index + 1:]
+        lines.extend(f"  {tag}" for tag in tags)
+        lines.append(f"  {rule_keyword}: {rule_title}")
+        for line in rest:
+            lines.append(f"  {line.rstrip()}" if line.strip() else '')
+        lines.append('')
+    return '\n'.join(lines).rstrip() + '\n'
+
+def generate_bdd_by_units(code, language, title, lane=LANE_INTERACTIVE, tenant=DEFAULT_TENANT):
+    """
+    Gera Features por unidade em paralelo e as junta em um único .feature.
+
+    Retorna (conteúdo, stats) ou (None, None) se o código tiver menos de duas unidades.
+    """
+    units = index_code(code, language)
+    if len(units) < 2:
+        return None, None
+
+    shared_signatures = '\n'.join(f"- {unit['signature']}" for unit in units)
+    logger.info(f"Gerando BDD para {len(units)} unidades em paralelo")
+    started = time.perf_counter()
+
+    def generate_unit(unit):
+        unit_started = time.perf_counter()
+        feature_text, stop_reason, output_tokens = invoke_model_text(
+            build_unit_bdd_prompt(unit, shared_signatures, language),
+            UNIT_MAX_TOKENS, temperature=0.2, lane=lane, tenant=tenant, artifact='gherkin', task='bdd_unit'
+        )
+        return {
+            'name': unit['name'],
+            'feature': feature_text,
+            'ms': round((time.perf_counter() - unit_started) * 1000),
+            'outputTokens': output_tokens,
+            'truncated': stop_reason == 'max_tokens',
+            'scenarioCount': count_scenarios(feature_text)
+        }
+
+    # Clientes criados aqui, no thread principal; as threads só os reutilizam
+    prepare_model_clients()
+    try:
+        with ThreadPoolExecutor(max_workers=UNIT_POOL_SIZE) as executor:
+            results = list(executor.map(generate_unit, units))
+    except DeadlineExceeded as e:
+        # O parcial é de uma única unidade, não do .feature: a próxima tentativa gera tudo de novo
+        e.partial = ''
+        raise
+
+    merged = merge_features(title, [(result['name'], result['feature']) for result in results])
+    stats = {
+        'wallClockMs': round((time.perf_counter() - started) * 1000),
+        'units': [{key: result[key] for key in ('name', 'ms', 'outputTokens', 'scenarioCount', 'truncated')} for result in results]
+    }
+    for unit_stats in stats['units']:
+        logger.info(f"Unidade {unit_stats['name']}: {unit_stats['ms']}ms, {unit_stats['scenarioCount']} cenários")
+    return merged, stats
@@ -0,0 +1,287 @@
+import logging
+import random
+import statistics
+import threading
+import time
+import boto3
+from botocore.exceptions import ClientError
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from deadlines import DeadlineExceeded, get_current_deadline
+from defaultInstance import DefaultInstance
+
+# Configuração de logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Constantes
+SCHEDULER_TABLE = 'bedrock-scheduler-state'
+LANE_INTERACTIVE = 'interactive'
+LANE_BULK = 'bulk'
+LANES = [LANE_INTERACTIVE, LANE_BULK]
+DEFAULT_TENANT = 'default'
+
+GLOBAL_CONCURRENCY = 10          # chamadas simultâneas ao Bedrock (todas as Lambdas)
+BULK_MAX_CONCURRENCY = 6         # teto do bulk sem demanda interativa
+BULK_YIELD_CONCURRENCY = 1       # teto do bulk com demanda interativa recente
+INTERACTIVE_QUIET_SECONDS = 30   # janela sem interativo para o bulk voltar a crescer
+TENANT_MAX_CONCURRENCY = 4       # fair share: teto por tenant dentro da lane
+TOKENS_PER_MINUTE = 400000       # orçamento global de tokens (entrada + max_tokens)
+
+ACQUIRE_TIMEOUT_SECONDS = {LANE_INTERACTIVE: 60, LANE_BULK: 240}
+POLL_INITIAL_SECONDS = 0.05
+POLL_MAX_SECONDS = 2.0
+
+class SchedulerBusyError(Exception):
+    """
+    Nenhuma vaga liberada dentro do tempo limite da lane.
+    """
+
+def admission_limits(lane, now, last_interactive_at):
+    """
+    Tetos de concorrência aplicados a uma lane no instante `now`.
+    """
+    if lane == LANE_INTERACTIVE:
+        return GLOBAL_CONCURRENCY
+    interactive_recent = now - last_interactive_at < INTERACTIVE_QUIET_SECONDS
+    return BULK_YIELD_CONCURRENCY if interactive_recent else BULK_MAX_CONCURRENCY
+
+class LocalSchedulerStore:
+    """
+    Estado do escalonador em memória (um processo); substituto do DynamoSchedulerStore.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.lanes = {lane: 0 for lane in LANES}
+        self.tenants = {}
+        self.last_interactive_at = 0.0
+        self.token_window = (0, 0)
+
+    def try_acquire(self, lane, tenant, tokens, now):
+        with self.lock:
+            if lane == LANE_INTERACTIVE:
+                self.last_interactive_at = now
+            tenant_key = f"{lane}#{tenant}"
+            window = int(now // 60)
+            window_tokens = self.token_window[1] if self.token_window[0] == window else 0
+
+            if (self.active >= GLOBAL_CONCURRENCY
+                    or self.lanes[lane] >= admission_limits(lane, now, self.last_interactive_at)
+                    or self.tenants.get(tenant_key, 0) >= TENANT_MAX_CONCURRENCY
+                    or window_tokens + tokens > TOKENS_PER_MINUTE):
+                return None
+
+            self.active += 1
+            self.lanes[lane] += 1
+            self.tenants[tenant_key] = self.tenants.get(tenant_key, 0) + 1
+            self.token_window = (window, window_tokens + tokens)
+            return {'lane': lane, 'tenantKey': tenant_key}
+
+    def release(self, lease):
+        with self.lock:
+            self.active -= 1
+            self.lanes[lease['lane']] -= 1
+            self.tenants[lease['tenantKey']] -= 1
+
+class DynamoSchedulerStore:
+    """
+    Estado compartilhado entre Lambdas em um item de contadores no DynamoDB.
+
+    A admissão é uma única atualização condicional, com o teto da lane vindo de
+    admission_limits; o orçamento de tokens usa um item por janela de um minuto.
+    Uma Lambda encerrada por timeout não libera a vaga, então os contadores são
+    particionados em épocas de LEASE_ITEM_TTL segundos: vagas vazadas somem na
+    troca de época, ao custo de admitir um pouco acima do limite logo após ela.
+    O instante da última chamada interativa fica em um item próprio, fora das
+    épocas, para que o bulk continue cedendo vaga logo após a troca.
+    """
+
+    COUNTERS_KEY = 'counters'
+    INTERACTIVE_KEY = 'interactive'
+    LEASE_ITEM_TTL = 900
+
+    def __init__(self, table_name=SCHEDULER_TABLE):
+        self.table = boto3.resource('dynamodb').Table(table_name)
+
+    def _counters_key(self, now):
+        # Contadores particionados por época: vagas vazadas expiram com a época
+        return {'pk': f"{self.COUNTERS_KEY}#{int(now // self.LEASE_ITEM_TTL)}"}
+
+    def _last_interactive_at(self, lane, now):
+        # Fica em um item fora das épocas: a demanda interativa recente sobrevive à troca de época
+        interactive_key = {'pk': self.INTERACTIVE_KEY}
+        if lane == LANE_INTERACTIVE:
+            self.table.update_item(
+                Key=interactive_key,
+                UpdateExpression='SET lastInteractiveAt = :now',
+                ExpressionAttributeValues={':now': int(now)}
+            )
+            return now
+        item = self.table.get_item(Key=interactive_key).get('Item') or {}
+        return float(item.get('lastInteractiveAt', 0))
+
+    def try_acquire(self, lane, tenant, tokens, now):
+        tenant_key = f"tenant_{lane}_{tenant}"
+        lane_key = f"lane_{lane}"
+        counters_key = self._counters_key(now)
+        lane_max = admission_limits(lane, now, self._last_interactive_at(lane, now))
+
+        condition = (
+            '(attribute_not_exists(active) OR active < :global) AND '
+            '(attribute_not_exists(#tenant) OR #tenant < :tenant_max) AND '
+            '(attribute_not_exists(#lane) OR #lane < :lane_max)'
+        )
+        values = {
+            ':one': 1,
+            ':global': GLOBAL_CONCURRENCY,
+            ':tenant_max': TENANT_MAX_CONCURRENCY,
+            ':lane_max': lane_max
+        }
+
+        try:
+            self.table.update_item(
+                Key=counters_key,
+                UpdateExpression='ADD active :one, #lane :one, #tenant :one',
+                ConditionExpression=condition,
+                ExpressionAttributeNames={'#lane': lane_key, '#tenant': tenant_key},
+                ExpressionAttributeValues=values
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return None
+            raise
+
+        lease = {'counters': counters_key, 'laneKey': lane_key, 'tenantKey': tenant_key}
+        try:
+            self.table.update_item(
+                Key={'pk': f"tokens#{int(now // 60)}"},
+                UpdateExpression='ADD tokens :tokens SET expiresAt = :expires',
+                ConditionExpression='attribute_not_exists(tokens) OR tokens <= :remaining',
+                ExpressionAttributeValues={
+                    ':tokens': tokens,
+                    ':remaining': TOKENS_PER_MINUTE - tokens,
+                    ':expires': int(now) + 120
+                }
+            )
+        except ClientError as e:
+            self.release(lease)
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return None
+            raise
+        return lease
+
+    def release(self, lease):
+        self.table.update_item(
+            Key=lease['counters'],
+            UpdateExpression='ADD active :minus, #lane :minus, #tenant :minus',
+            ExpressionAttributeNames={'#lane': lease['laneKey'], '#tenant': lease['tenantKey']},
+            ExpressionAttributeValues={':minus': -1}
+        )
+
+# Store padrão (DynamoDB); set_scheduler_store troca por LocalSchedulerStore em testes e no harness
+_default_store = DefaultInstance(DynamoSchedulerStore)
+get_scheduler_store = _default_store.get
+set_scheduler_store = _default_store.set
+
+def normalize_lane(priority):
+    """
+    Converte a prioridade do evento em lane (padrão: interativo).
+    """
+    return LANE_BULK if str(priority or '').lower() == LANE_BULK else LANE_INTERACTIVE
+
+@contextmanager
+def bedrock_slot(lane=LANE_INTERACTIVE, tenant=DEFAULT_TENANT, tokens=0, store=None):
+    """
+    Aguarda uma vaga na lane antes de uma chamada ao Bedrock e a libera ao final.
+
+    Falhas do próprio store não bloqueiam a geração (fail-open).
+    """
+    store = store or get_scheduler_store()
+    lane = normalize_lane(lane)
+    tenant = tenant or DEFAULT_TENANT
+    # A espera por vaga nunca passa do prazo da invocação
+    timeout_seconds = ACQUIRE_TIMEOUT_SECONDS[lane]
+    invocation_deadline = get_current_deadline()
+    if invocation_deadline:
+        timeout_seconds = max(0, min(timeout_seconds, invocation_deadline.remaining_ms() / 1000))
+    deadline = time.monotonic() + timeout_seconds
+    delay = POLL_INITIAL_SECONDS
+    started = time.monotonic()
+    lease = None
+
+    while True:
+        try:
+            lease = store.try_acquire(lane, tenant, tokens, time.time())
+        except Exception as e:
+            logger.error(f"Escalonador indisponível, seguindo sem vaga: {str(e)}")
+            break
+        if lease:
+            break
+        if time.monotonic() >= deadline:
+            if invocation_deadline and invocation_deadline.expired():
+                raise DeadlineExceeded(f"Prazo esgotado aguardando vaga na lane {lane}")
+            raise SchedulerBusyError(f"Sem vaga na lane {lane} para {tenant} após {timeout_seconds:.0f}s")
+        time.sleep(delay * random.uniform(0.5, 1.0))
+        delay = min(delay * 2, POLL_MAX_SECONDS)
+
+    waited_ms = (time.monotonic() - started) * 1000
+    if waited_ms > 100:
+        logger.info(f"Vaga {lane}/{tenant} obtida após {waited_ms:.0f}ms")
+    try:
+        yield
+    finally:
+        if lease:
+            try:
+                store.release(lease)
+            except Exception as e:
+                logger.error(f"Erro ao liberar vaga do escalonador: {str(e)}")
+
+def run_load_harness(duration_seconds=20, bulk_workers=12, interactive_rate=16.0, service_seconds=(0.3, 0.8), tokens_per_call=200):
+    """
+    Simula tráfego interativo com e sem bulk concorrente sobre um LocalSchedulerStore.
+
+    A carga interativa padrão (16 req/s x 0,55 s de serviço, ~9 chamadas
+    simultâneas) chega ao GLOBAL_CONCURRENCY, então a vaga cedida ao bulk
+    aparece na latência. `tokens_per_call` fica baixo para que o orçamento de
+    tokens por minuto não seja o limite medido. A latência conta desde a
+    chegada da requisição. Retorna p95 interativo e pico de chamadas
+    simultâneas nos dois cenários.
+    """
+    def simulated_call(lane, tenant, latencies, arrived=None):
+        started = arrived or time.monotonic()
+        with bedrock_slot(lane, tenant, tokens=tokens_per_call, store=store):
+            peak[0] = max(peak[0], store.active)
+            time.sleep(random.uniform(*service_seconds))
+        if latencies is not None:
+            latencies.append((time.monotonic() - started) * 1000)
+
+    def scenario(with_bulk):
+        stop = time.monotonic() + duration_seconds
+        latencies = []
+
+        def bulk_loop(worker):
+            while time.monotonic() < stop:
+                simulated_call(LANE_BULK, f"import-{worker % 3}", None)
+
+        # Threads suficientes para a fila de chegadas não esperar no executor
+        with ThreadPoolExecutor(max_workers=bulk_workers + int(interactive_rate * max(service_seconds) * 4) + 16) as executor:
+            if with_bulk:
+                for worker in range(bulk_workers):
+                    executor.submit(bulk_loop, worker)
+            while time.monotonic() < stop:
+                executor.submit(simulated_call, LANE_INTERACTIVE, f"user-{random.randint(1, 20)}", latencies, time.monotonic())
+                time.sleep(random.expovariate(interactive_rate))
+        return statistics.quantiles(latencies, n=20)[18] if len(latencies) >= 20 else max(latencies, default=0)
+
+    results = {'offeredInteractiveConcurrency': round(interactive_rate * statistics.mean(service_seconds), 1)}
+    for name, with_bulk in (('baseline', False), ('withBulk', True)):
+        store = LocalSchedulerStore()
+        peak = [0]
+        results[f"interactiveP95Ms{'WithBulk' if with_bulk else ''}"] = round(scenario(with_bulk))
+        results[f"peakConcurrency{'WithBulk' if with_bulk else ''}"] = peak[0]
+    return results
+
+if __name__ == '__main__':
+    print(run_load_harness())
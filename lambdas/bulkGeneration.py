@@ -0,0 +1,344 @@
+import json
+import logging
+import traceback
+import os
+import time
+from datetime import datetime, timezone
+from extractHistory import clean_text, build_context_for_generation, SUPPORTED_LANGUAGES
+from languageRegistry import get_language
+from generateBddTest import build_bdd_prompt, build_s3_key as build_bdd_key, S3_BUCKET as BDD_BUCKET
+from artifactIndex import build_index_entry, record_artifact
+from outputEnvelope import envelope_messages, extract_artifact, STOP_SEQUENCES
+from modelInvocation import build_model_request
+from deadlines import client_for, start_deadline
+
+# Configuração de logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Constantes
+BATCH_BUCKET = 'temp-storage-bulk-generation'
+BATCH_PREFIX = 'batch-jobs'
+BATCH_ROLE_ARN = os.environ.get('BEDROCK_BATCH_ROLE_ARN', '')
+BATCH_MODEL_ID = 'amazon.nova-pro-v1:0'
+RECORD_ID_SEPARATOR = '|'  # recordId = requestId|language
+MIN_BATCH_RECORDS = 100  # mínimo exigido pelo Bedrock por job
+PROGRESS_SAVE_EVERY = 50
+POLL_INTERVAL_SECONDS = 60
+CODE_MAX_TOKENS = 8000
+BDD_MAX_TOKENS = 6000
+
+# Estados terminais de um job de batch inference
+JOB_DONE_STATUSES = ['Completed', 'PartiallyCompleted']
+JOB_FAILED_STATUSES = ['Failed', 'Stopped', 'Expired']
+
+def _job_key(job_name, *parts):
+    return '/'.join([BATCH_PREFIX, job_name, *parts])
+
+def _read_json(s3_client, key):
+    try:
+        return json.loads(s3_client.get_object(Bucket=BATCH_BUCKET, Key=key)['Body'].read())
+    except s3_client.exceptions.NoSuchKey:
+        return None
+
+def _write_json(s3_client, key, data):
+    s3_client.put_object(Bucket=BATCH_BUCKET, Key=key, Body=json.dumps(data, ensure_ascii=False), ContentType='application/json')
+
+def _write_jsonl(s3_client, key, records):
+    body = '\n'.join(json.dumps(record, ensure_ascii=False) for record in records)
+    s3_client.put_object(Bucket=BATCH_BUCKET, Key=key, Body=body, ContentType='application/jsonl')
+
+def build_model_input(prompt, max_tokens, temperature):
+    """
+    Corpo da requisição Nova usado em cada linha do JSONL de batch, com o envelope <artifact>.
+    """
+    return build_model_request(envelope_messages(prompt), max_tokens, temperature, STOP_SEQUENCES)
+
+def find_invalid_request_ids(stories):
+    """
+    Problemas de requestId nas histórias (vazio ou com o separador do recordId).
+
+    O requestId compõe o recordId e as chaves S3, então não pode conter
+    RECORD_ID_SEPARATOR.
+    """
+    problems = []
+    for position, story in enumerate(stories):
+        request_id = story.get('requestId')
+        if not isinstance(request_id, str) or not request_id.strip():
+            problems.append(f"história {position}: requestId ausente")
+        elif RECORD_ID_SEPARATOR in request_id:
+            problems.append(f"história {position}: requestId contém '{RECORD_ID_SEPARATOR}'")
+    return problems
+
+def build_code_records(stories):
+    """
+    Uma linha de batch por história, com o mesmo prompt das Lambdas online.
+
+    Sem a etapa de padronização por LLM: o contexto é montado a partir do texto limpo.
+    """
+    records = []
+    for story in stories:
+        language = story['language']
+        context_for_generation = build_context_for_generation(clean_text(story['userStory']), language)
+        prompt = get_language(language)['build_prompt'](context_for_generation)
+        records.append({
+            'recordId': f"{story['requestId']}{RECORD_ID_SEPARATOR}{language}",
+            'modelInput': build_model_input(prompt, CODE_MAX_TOKENS, 0.1)
+        })
+    return records
+
+def build_bdd_records(generated_codes):
+    """
+    Uma linha de batch por código gerado, usando build_bdd_prompt.
+    """
+    return [
+        {
+            'recordId': record_id,
+            'modelInput': build_model_input(build_bdd_prompt(code, record_id.split(RECORD_ID_SEPARATOR)[1]), BDD_MAX_TOKENS, 0.2)
+        }
+        for record_id, code in generated_codes.items()
+    ]
+
+def submit_batch_job(job_name, phase, records, s3_client, bedrock_client, model_id=BATCH_MODEL_ID):
+    """
+    Grava o JSONL de entrada no S3 e submete o job de batch inference.
+    """
+    if len(records) < MIN_BATCH_RECORDS:
+        logger.info(f"Aviso: {len(records)} registros, abaixo do mínimo de {MIN_BATCH_RECORDS} do Bedrock")
+
+    input_key = _job_key(job_name, phase, 'input.jsonl')
+    _write_jsonl(s3_client, input_key, records)
+
+    response = bedrock_client.create_model_invocation_job(
+        jobName=f"{job_name}-{phase}",
+        roleArn=BATCH_ROLE_ARN,
+        modelId=model_id,
+        inputDataConfig={'s3InputDataConfig': {'s3Uri': f"s3://{BATCH_BUCKET}/{input_key}"}},
+        outputDataConfig={'s3OutputDataConfig': {'s3Uri': f"s3://{BATCH_BUCKET}/{_job_key(job_name, phase, 'output')}/"}}
+    )
+    logger.info(f"Job {phase} submetido: {response['jobArn']} ({len(records)} registros)")
+    return {'arn': response['jobArn'], 'status': 'Submitted', 'records': len(records)}
+
+def iter_batch_output(job_name, phase, s3_client):
+    """
+    Percorre as linhas do(s) arquivo(s) .jsonl.out sem carregá-los inteiros em memória.
+    """
+    prefix = _job_key(job_name, phase, 'output') + '/'
+    listing = s3_client.list_objects_v2(Bucket=BATCH_BUCKET, Prefix=prefix)
+    for item in listing.get('Contents', []):
+        if not item['Key'].endswith('.jsonl.out'):
+            continue
+        body = s3_client.get_object(Bucket=BATCH_BUCKET, Key=item['Key'])['Body']
+        for line in body.iter_lines():
+            if line.strip():
+                yield json.loads(line)
+
+def extract_output_text(record, phase):
+    """
+    Artefato gerado de uma linha de saída (None se o registro falhou).
+    """
+    if record.get('error') or 'modelOutput' not in record:
+        return None
+    text = record['modelOutput']['output']['message']['content'][0]['text']
+    return extract_artifact(text, 'gherkin' if phase == 'bdd' else record['recordId'].split(RECORD_ID_SEPARATOR)[1])
+
+def save_artifact(s3_client, phase, record_id, text, user_id=None):
+    """
+    Salva um artefato com o mesmo bucket, chave e metadados das Lambdas online.
+    """
+    request_id, language = record_id.split(RECORD_ID_SEPARATOR)
+    metadata = {'request-id': request_id, 'generated-at': datetime.now(timezone.utc).isoformat()}
+
+    if phase == 'bdd':
+        bucket, s3_key, kind = BDD_BUCKET, build_bdd_key(request_id), 'bdd'
+        metadata['file-type'] = 'gherkin-feature'
+    else:
+        spec = get_language(language)
+        artifact = spec['describe_artifact'](request_id, text)
+        bucket, s3_key, kind = spec['bucket'], artifact['key'], 'code'
+        metadata.update({'language': language, **artifact['metadata']})
+
+    s3_client.put_object(Bucket=bucket, Key=s3_key, Body=text, ContentType='text/plain', Metadata=metadata)
+    record_artifact(build_index_entry(request_id, language, kind, bucket, s3_key, text, user_id=user_id))
+    return s3_key
+
+def process_batch_output(job_name, phase, progress, s3_client):
+    """
+    Converte a saída do job em artefatos, pulando registros já processados.
+
+    O progresso é salvo a cada PROGRESS_SAVE_EVERY registros para permitir retomada.
+    """
+    done = set(progress['processed'][phase])
+    users = progress.get('users', {})
+    pending = 0
+
+    for record in iter_batch_output(job_name, phase, s3_client):
+        record_id = record['recordId']
+        if record_id in done:
+            continue
+        text = extract_output_text(record, phase)
+        if text is None:
+            progress['failed'][phase].append(record_id)
+            logger.error(f"Registro {record_id} falhou no batch: {record.get('error')}")
+        else:
+            save_artifact(s3_client, phase, record_id, text, user_id=users.get(record_id.split(RECORD_ID_SEPARATOR)[0]))
+        progress['processed'][phase].append(record_id)
+        done.add(record_id)
+        pending += 1
+        if pending >= PROGRESS_SAVE_EVERY:
+            save_progress(job_name, progress, s3_client)
+            pending = 0
+
+    save_progress(job_name, progress, s3_client)
+
+def load_progress(job_name, s3_client):
+    return _read_json(s3_client, _job_key(job_name, 'progress.json'))
+
+def save_progress(job_name, progress, s3_client):
+    progress['updatedAt'] = datetime.now(timezone.utc).isoformat()
+    _write_json(s3_client, _job_key(job_name, 'progress.json'), progress)
+
+def start_bulk_job(job_name, stories, s3_client=None, bedrock_client=None):
+    """
+    Inicia a conversão em lote: valida histórias e submete o job de código.
+
+    Levanta ValueError se alguma história tiver requestId inválido.
+    """
+    s3_client = s3_client or client_for('s3', 's3')
+    bedrock_client = bedrock_client or client_for('bedrock', 'bedrock')
+
+    existing = load_progress(job_name, s3_client)
+    if existing:
+        logger.info(f"Job {job_name} já existe (fase {existing['phase']}), retomando")
+        return existing
+
+    problems = find_invalid_request_ids(stories)
+    if problems:
+        raise ValueError('; '.join(problems))
+
+    valid = [story for story in stories if story.get('language') in SUPPORTED_LANGUAGES and story.get('userStory', '').strip()]
+    logger.info(f"Histórias válidas: {len(valid)}/{len(stories)}")
+
+    progress = {
+        'jobName': job_name,
+        'phase': 'code',
+        'jobs': {},
+        'processed': {'code': [], 'bdd': []},
+        'failed': {'code': [], 'bdd': []},
+        'users': {story['requestId']: story['userId'] for story in valid if story.get('userId')},
+        'createdAt': datetime.now(timezone.utc).isoformat()
+    }
+    progress['jobs']['code'] = submit_batch_job(job_name, 'code', build_code_records(valid), s3_client, bedrock_client)
+    save_progress(job_name, progress, s3_client)
+    return progress
+
+def advance_bulk_job(job_name, s3_client=None, bedrock_client=None):
+    """
+    Avança o job um passo: consulta status, processa saída e submete a fase BDD.
+
+    Idempotente e retomável: todo o estado vive em progress.json no S3.
+    """
+    s3_client = s3_client or client_for('s3', 's3')
+    bedrock_client = bedrock_client or client_for('bedrock', 'bedrock')
+
+    progress = load_progress(job_name, s3_client)
+    if not progress:
+        raise ValueError(f"Job {job_name} não encontrado")
+    phase = progress['phase']
+    if phase in ['done', 'failed']:
+        return progress
+
+    job = progress['jobs'][phase]
+    job['status'] = bedrock_client.get_model_invocation_job(jobIdentifier=job['arn'])['status']
+    logger.info(f"Job {job_name} fase {phase}: {job['status']}")
+
+    if job['status'] in JOB_FAILED_STATUSES:
+        progress['phase'] = 'failed'
+    elif job['status'] in JOB_DONE_STATUSES:
+        process_batch_output(job_name, phase, progress, s3_client)
+        if phase == 'code':
+            failed = set(progress['failed']['code'])
+            generated_codes = {
+                record['recordId']: extract_output_text(record, 'code')
+                for record in iter_batch_output(job_name, 'code', s3_client)
+                if record['recordId'] not in failed
+            }
+            progress['jobs']['bdd'] = submit_batch_job(job_name, 'bdd', build_bdd_records(generated_codes), s3_client, bedrock_client)
+            progress['phase'] = 'bdd'
+        else:
+            progress['phase'] = 'done'
+
+    save_progress(job_name, progress, s3_client)
+    return progress
+
+def run_bulk_job(job_name, stories, s3_client=None, bedrock_client=None, poll_interval=POLL_INTERVAL_SECONDS):
+    """
+    Executa o job até o fim (uso em script/CLI; na AWS, agende advance_bulk_job).
+    """
+    progress = start_bulk_job(job_name, stories, s3_client, bedrock_client)
+    while progress['phase'] not in ['done', 'failed']:
+        time.sleep(poll_interval)
+        progress = advance_bulk_job(job_name, s3_client, bedrock_client)
+    logger.info(
+        f"Job {job_name} finalizado ({progress['phase']}): "
+        f"{len(progress['processed']['code'])} códigos, {len(progress['processed']['bdd'])} BDDs, "
+        f"{len(progress['failed']['code']) + len(progress['failed']['bdd'])} falhas"
+    )
+    return progress
+
+def lambda_handler(event, context):
+    """
+    Handler para agendamento (ex.: EventBridge): action 'start' com stories ou 'advance'.
+    """
+    job_name = event.get('jobName', '')
+    action = event.get('action', 'advance')
+    logger.info(f"=== BULK_GENERATION {action.upper()} {job_name} ===")
+    start_deadline(context)
+    
+    try:
+        if not job_name:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({
+                    'error': 'Missing jobName',
+                    'message': 'jobName é obrigatório'
+                })
+            }
+        
+        if action == 'start':
+            stories = event.get('stories', [])
+            problems = find_invalid_request_ids(stories)
+            if problems:
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({
+                        'error': 'Invalid requestId',
+                        'message': '; '.join(problems)
+                    })
+                }
+            progress = start_bulk_job(job_name, stories)
+        else:
+            progress = advance_bulk_job(job_name)
+        
+        return {
+            'statusCode': 200,
+            'body': {
+                'jobName': job_name,
+                'phase': progress['phase'],
+                'processed': {phase: len(ids) for phase, ids in progress['processed'].items()},
+                'failed': {phase: len(ids) for phase, ids in progress['failed'].items()}
+            }
+        }
+        
+    except Exception as e:
+        logger.error(f"Erro no job {job_name}: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({
+                'error': 'Internal server error',
+                'message': str(e),
+                'jobName': job_name,
+                'timestamp': datetime.now(timezone.utc).isoformat()
+            })
+        }
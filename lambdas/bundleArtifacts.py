@@ -0,0 +1,295 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import traceback
+import zipfile
+from datetime import datetime, timezone
+from invocationProfiler import profiled_handler
+from artifactIndex import build_index_entry, record_artifact, get_request_artifacts
+from stageIdempotency import begin_stage, complete_stage, release_stage, replay_stage_result, STAGE_COMPLETED, STAGE_IN_PROGRESS, StageInProgressError
+from deadlines import DeadlineExceeded, start_deadline, get_current_deadline, client_for
+
+# Configuração de logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Constantes
+S3_BUCKET = 'temp-storage-generation-bundles'
+STAGE_NAME = 'bundle_artifacts'
+PART_SIZE = 8 * 1024 * 1024      # partes do multipart upload (mínimo do S3: 5 MB)
+READ_CHUNK_SIZE = 64 * 1024
+COMPRESS_LEVEL = 6
+
+def get_s3_client():
+    """
+    Cliente S3 (upload, leitura e presigned URL) com timeouts limitados pelo prazo da invocação.
+    """
+    return client_for('s3', 's3')
+
+def build_s3_key(request_id):
+    """
+    Chave S3 do pacote de artefatos de uma requisição.
+    """
+    return f"bundles/{request_id}.zip"
+
+class S3MultipartWriter(io.RawIOBase):
+    """
+    Arquivo somente escrita que envia os bytes ao S3 em partes de multipart upload.
+
+    A memória fica limitada a uma parte; tamanho e sha256 do objeto são
+    calculados durante a escrita.
+    """
+
+    def __init__(self, s3_client, bucket, key, content_type='application/zip', metadata=None, part_size=PART_SIZE):
+        super().__init__()
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.buffer = bytearray()
+        self.parts = []
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self.upload_id = s3_client.create_multipart_upload(
+            Bucket=bucket, Key=key, ContentType=content_type, Metadata=metadata or {}
+        )['UploadId']
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        self.size += len(data)
+        self.sha256.update(data)
+        if len(self.buffer) >= self.part_size:
+            self._upload_part()
+        return len(data)
+
+    def _upload_part(self):
+        part_number = len(self.parts) + 1
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            PartNumber=part_number, Body=bytes(self.buffer)
+        )
+        self.parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+        self.buffer.clear()
+
+    def close(self):
+        if not self.closed:
+            if self.buffer or not self.parts:
+                self._upload_part()
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                MultipartUpload={'Parts': self.parts}
+            )
+        super().close()
+
+    def abort(self):
+        """
+        Cancela o upload (as partes enviadas são descartadas pelo S3).
+        """
+        if not self.closed:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            super().close()
+
+def _write_s3_object(archive, name, s3_client, bucket, key):
+    # Copia o objeto para o zip em trechos, sem carregá-lo inteiro
+    sha256 = hashlib.sha256()
+    size = 0
+    body = s3_client.get_object(Bucket=bucket, Key=key)['Body']
+    try:
+        with archive.open(name, 'w') as entry:
+            for chunk in body.iter_chunks(READ_CHUNK_SIZE):
+                entry.write(chunk)
+                sha256.update(chunk)
+                size += len(chunk)
+    finally:
+        body.close()
+    return {'name': name, 'source': f"s3://{bucket}/{key}", 'size': size, 'sha256': sha256.hexdigest()}
+
+def _write_text(archive, name, text):
+    data = text.encode('utf-8')
+    archive.writestr(name, data)
+    return {'name': name, 'source': 'inline', 'size': len(data), 'sha256': hashlib.sha256(data).hexdigest()}
+
+def select_bundle_sources(artifacts, language):
+    """
+    Escolhe no índice o código e o .feature da requisição: (code_entry, bdd_entry).
+    """
+    code_entry = artifacts.get(f"code_{language}") or next(
+        (entry for slot, entry in artifacts.items() if slot.startswith('code_')), None
+    )
+    bdd_entry = artifacts.get(f"bdd_{language}") or next(
+        (entry for slot, entry in artifacts.items() if slot.startswith('bdd_')), None
+    )
+    return code_entry, bdd_entry
+
+def build_bundle(request_id, language, standardized_story, code_entry, bdd_entry, s3_client=None):
+    """
+    Monta o .zip (história, código, .feature e manifest.json) em streaming direto para o S3.
+
+    Retorna (chave do pacote, manifesto, tamanho, sha256).
+    """
+    s3_client = s3_client or get_s3_client()
+    s3_key = build_s3_key(request_id)
+    writer = S3MultipartWriter(s3_client, S3_BUCKET, s3_key, metadata={
+        'request-id': request_id,
+        'generated-at': datetime.now(timezone.utc).isoformat(),
+        'language': language
+    })
+
+    deadline = get_current_deadline()
+    try:
+        files = []
+        with zipfile.ZipFile(writer, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=COMPRESS_LEVEL) as archive:
+            if deadline:
+                deadline.check('empacotar os artefatos')
+            if standardized_story:
+                files.append(_write_text(archive, 'story.md', standardized_story))
+            if code_entry:
+                files.append(_write_s3_object(archive, f"code/{os.path.basename(code_entry['key'])}", s3_client, code_entry['bucket'], code_entry['key']))
+            if deadline:
+                deadline.check('copiar o .feature para o pacote')
+            if bdd_entry:
+                files.append(_write_s3_object(archive, f"tests/{os.path.basename(bdd_entry['key'])}", s3_client, bdd_entry['bucket'], bdd_entry['key']))
+
+            manifest = {
+                'requestId': request_id,
+                'language': language,
+                'createdAt': datetime.now(timezone.utc).isoformat(),
+                'files': files
+            }
+            archive.writestr('manifest.json', json.dumps(manifest, indent=2, ensure_ascii=False))
+        writer.close()
+    except Exception:
+        writer.abort()
+        raise
+
+    logger.info(f"Pacote salvo no S3: s3://{S3_BUCKET}/{s3_key} ({writer.size} bytes, {len(files)} arquivos)")
+    return s3_key, manifest, writer.size, writer.sha256.hexdigest()
+
+@profiled_handler(STAGE_NAME, S3_BUCKET)
+def lambda_handler(event, context):
+    """
+    Handler principal da Lambda que empacota os artefatos de uma requisição em um único download.
+    """
+    # Log de início
+    request_id = event.get('requestId', 'unknown')
+    logger.info(f"=== INICIANDO BUNDLE_ARTIFACTS_LAMBDA ===")
+    logger.info(f"Request ID: {request_id}")
+    logger.info(f"Timestamp: {datetime.now(timezone.utc).isoformat()}")
+    stage_claimed = False
+    start_deadline(context)
+
+    try:
+        # 1. EXTRAÇÃO DOS DADOS
+        logger.info("ETAPA 1: Localizando artefatos da requisição")
+        if not event.get('requestId') or request_id == 'unknown':
+            logger.error("requestId não fornecido")
+            return {
+                'statusCode': 400,
+                'body': json.dumps({
+                    'error': 'Missing requestId',
+                    'message': 'requestId é obrigatório para empacotar os artefatos',
+                    'requestId': request_id
+                })
+            }
+        language = event.get('language', '').lower()
+        standardized_story = event.get('standardizedStory', '')
+        code_entry, bdd_entry = select_bundle_sources(get_request_artifacts(request_id), language)
+
+        if not code_entry and not bdd_entry:
+            logger.error("Nenhum artefato encontrado para a requisição")
+            return {
+                'statusCode': 404,
+                'body': json.dumps({
+                    'error': 'Artifacts not found',
+                    'message': 'Nenhum código ou BDD indexado para este requestId',
+                    'requestId': request_id
+                })
+            }
+
+        # Idempotência: retries do Step Functions não refazem o pacote
+        stage_status, stored_record = begin_stage(request_id, STAGE_NAME)
+        if stage_status == STAGE_COMPLETED:
+            return {
+                'statusCode': 200,
+                'body': replay_stage_result(stored_record)
+            }
+        if stage_status == STAGE_IN_PROGRESS:
+            raise StageInProgressError(request_id, STAGE_NAME)
+        stage_claimed = True
+
+        # 2. EMPACOTAMENTO EM STREAMING
+        logger.info("ETAPA 2: Gerando pacote .zip em streaming para o S3")
+        s3_client = get_s3_client()
+        s3_key, manifest, bundle_size, bundle_sha256 = build_bundle(
+            request_id, language, standardized_story, code_entry, bdd_entry, s3_client
+        )
+
+        entry = build_index_entry(request_id, language, 'bundle', S3_BUCKET, s3_key, b'', user_id=event.get('userId'))
+        entry.update({'size': bundle_size, 'sha256': bundle_sha256})
+        record_artifact(entry)
+
+        # 3. PRESIGNED URL ÚNICA
+        logger.info("ETAPA 3: Gerando presigned URL do pacote")
+        presigned_url = s3_client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': S3_BUCKET, 'Key': s3_key},
+            ExpiresIn=3600  # 1 hora
+        )
+
+        response_body = {
+            'presignedUrl': presigned_url,
+            'bundleKey': s3_key,
+            'bundleSize': bundle_size,
+            'files': manifest['files'],
+            'language': language,
+            'requestId': request_id,
+            'generatedAt': datetime.now(timezone.utc).isoformat()
+        }
+
+        logger.info("=== EMPACOTAMENTO CONCLUÍDO ===")
+
+        complete_stage(request_id, STAGE_NAME, response_body, artifact={'bucket': S3_BUCKET, 'key': s3_key})
+
+        return {
+            'statusCode': 200,
+            'body': response_body
+        }
+
+    except DeadlineExceeded as e:
+        # Upload já abortado em build_bundle; a próxima tentativa refaz o pacote
+        if stage_claimed:
+            release_stage(request_id, STAGE_NAME)
+        logger.error(f"Prazo esgotado em {STAGE_NAME}: {str(e)}")
+        raise
+
+    except StageInProgressError:
+        # Propaga para a regra Retry do Step Functions
+        raise
+
+    except Exception as e:
+        if stage_claimed:
+            release_stage(request_id, STAGE_NAME)
+
+        # Log de erro
+        error_message = str(e)
+        error_traceback = traceback.format_exc()
+
+        logger.error("=== ERRO NO EMPACOTAMENTO ===")
+        logger.error(f"Request ID: {request_id}")
+        logger.error(f"Erro: {error_message}")
+        logger.error(f"Traceback: {error_traceback}")
+
+        return {
+            'statusCode': 500,
+            'body': json.dumps({
+                'error': 'Internal server error',
+                'message': error_message,
+                'requestId': request_id,
+                'timestamp': datetime.now(timezone.utc).isoformat()
+            })
+        }
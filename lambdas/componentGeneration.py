@@ -0,0 +1,301 @@
+import json
+import logging
+import re
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from bedrockScheduler import LANE_INTERACTIVE, DEFAULT_TENANT
+from modelInvocation import invoke_model_text, prepare_model_clients
+from deadlines import DeadlineExceeded
+from languageRegistry import get_language
+from outputEnvelope import extract_artifact
+
+# Configuração de logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Constantes
+PLAN_MAX_TOKENS = 1500
+COMPONENT_MAX_TOKENS = 3000
+SINGLE_SHOT_MAX_TOKENS = 8000
+COMPONENT_POOL_SIZE = 4
+MAX_COMPONENTS = 8
+
+def build_plan_prompt(context_for_generation, language):
+    """
+    Prompt curto que pede apenas o esboço dos componentes, com assinaturas.
+    """
+    if language == 'java':
+        kinds = 'DTO, Repository, Service, Controller, Exception ou Model'
+        naming = 'PascalCase, um tipo público por componente'
+    else:
+        kinds = 'model, repository, service, api, exceptions ou utils'
+        naming = 'PEP 8 (classes em PascalCase, funções em snake_case)'
+
+    return f"""
+Você é um arquiteto de software. Planeje a implementação em {language.upper()} da história abaixo,
+SEM escrever a implementação.
+
+{context_for_generation}
+
+Responda APENAS com um JSON válido neste formato:
+{{
+  "components": [
+    {{
+      "name": "NomeDoComponente",
+      "kind": "um de: {kinds}",
+      "responsibility": "uma frase",
+      "dependsOn": ["OutroComponente"],
+      "signatures": ["assinaturas públicas completas (classes, métodos, parâmetros e retornos)"]
+    }}
+  ]
+}}
+
+REGRAS:
+- No máximo {MAX_COMPONENTS} componentes
+- Nomes seguindo {naming}
+- As assinaturas são o contrato entre componentes: seja preciso nos tipos
+"""
+
+def parse_plan(text):
+    """
+    Extrai a lista de componentes do JSON do plano, tolerando texto ao redor.
+    """
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    if not match:
+        raise ValueError("Plano sem JSON")
+    components = json.loads(match.group(0)).get('components', [])
+    components = [component for component in components if component.get('name')]
+    if not components:
+        raise ValueError("Plano sem componentes")
+    return components[:MAX_COMPONENTS]
+
+def order_components(components):
+    """
+    Ordena os componentes para que cada um venha depois dos que ele usa (dependsOn).
+
+    Mantém a ordem do plano entre componentes independentes; dependências
+    desconhecidas são ignoradas e ciclos seguem na ordem do plano.
+    """
+    names = {component['name'] for component in components}
+    pending = list(components)
+    ordered = []
+    placed = set()
+    while pending:
+        ready = next(
+            (component for component in pending
+             if all(dependency in placed for dependency in component.get('dependsOn') or [] if dependency in names and dependency != component['name'])),
+            pending[0]
+        )
+        pending.remove(ready)
+        ordered.append(ready)
+        placed.add(ready['name'])
+    return ordered
+
+def format_outline(components):
+    """
+    Esboço compartilhado enviado a cada geração de componente.
+    """
+    lines = []
+    for component in components:
+        lines.append(f"- {component['name']} ({component.get('kind', '')}): {component.get('responsibility', '')}")
+        for signature in component.get('signatures', []):
+            lines.append(f"    {signature}")
+    return '\n'.join(lines)
+
+def build_component_prompt(context_for_generation, language, outline, component):
+    """
+    Prompt de um único componente, com o esboço completo como contrato.
+    """
+    return f"""
+Você é um desenvolvedor {language.upper()} sênior. Implemente SOMENTE o componente {component['name']}.
+
+{context_for_generation}
+
+ESBOÇO DO SISTEMA (contrato entre componentes, já definido):
+{outline}
+
+COMPONENTE A IMPLEMENTAR: {component['name']} ({component.get('kind', '')})
+Responsabilidade: {component.get('responsibility', '')}
+
+REGRAS:
+- Implemente exatamente as assinaturas do esboço para este componente
+- Use os outros componentes apenas pelas assinaturas do esboço, sem reimplementá-los
+- Inclua imports necessários no topo
+- Gere APENAS código {language.upper()}, sem markdown e sem explicações
+"""
+
+PUBLIC_TOP_LEVEL_TYPE = re.compile(r'^public\s+(?=(?:(?:abstract|final|sealed|non-sealed|strictfp)\s+)*(?:class|interface|enum|record|@interface)\b)', re.MULTILINE)
+
+PYTHON_TOP_LEVEL_NAME = re.compile(r'^(?:class|def|async\s+def)\s+(\w+)|^(\w+)\s*(?::[^=\n]*)?=', re.MULTILINE)
+
+def _demote_public_types(code, keep_first=False):
+    # Um arquivo .java só pode ter um tipo público de topo
+    matches = list(PUBLIC_TOP_LEVEL_TYPE.finditer(code))[1 if keep_first else 0:]
+    for match in reversed(matches):
+        code = code[:match.start()] + code[match.end():]
+    return code
+
+def assemble_components(language, generated):
+    """
+    Junta os componentes em um arquivo, com package/imports deduplicados no topo.
+
+    `generated` vem na ordem de dependências (order_components): em Python cada
+    definição aparece antes de quem a usa. Em Java só o último componente (o que
+    depende dos demais) continua público no arquivo único; o mapa de arquivos
+    mantém um tipo público por arquivo. Retorna (arquivo_unico, {nome_arquivo: código}).
+    """
+    extension = 'java' if language == 'java' else 'py'
+    header_pattern = re.compile(r'^\s*(package\s+[\w.]+;|import\s+[\w.*]+;)\s*$' if language == 'java'
+                                else r'^(import\s+.+|from\s+\S+\s+import\s+.+)$')
+    headers = []
+    bodies = []
+    files = {}
+
+    # Nomes definidos no próprio arquivo único: componentes e definições de topo
+    defined_names = {name for name, _ in generated}
+    if language == 'python':
+        for _, code in generated:
+            defined_names.update(name for match in PYTHON_TOP_LEVEL_NAME.findall(code) for name in match if name)
+
+    for index, (name, code) in enumerate(generated):
+        code = extract_artifact(code, language)
+        files[f"{name}.{extension}"] = code
+        if language == 'java':
+            code = _demote_public_types(code, keep_first=index == len(generated) - 1)
+        body_lines = []
+        for line in code.split('\n'):
+            local_import = re.match(r'^from\s+\S+\s+import\s+(.+)$', line) if language == 'python' else None
+            if local_import and {part.split(' as ')[0].strip() for part in local_import.group(1).split(',')} <= defined_names:
+                # No arquivo único os outros componentes já estão definidos
+                continue
+            if header_pattern.match(line):
+                if line.strip() not in headers:
+                    headers.append(line.strip())
+            else:
+                body_lines.append(line)
+        bodies.append('\n'.join(body_lines).strip())
+
+    packages = [header for header in headers if header.startswith('package ')][:1]
+    imports = [header for header in headers if not header.startswith('package ')]
+    top = '\n'.join(packages + ([''] if packages else []) + imports)
+    separator = '\n\n\n' if language == 'python' else '\n\n'
+    return (top + separator + separator.join(bodies)).strip() + '\n', files
+
+def _generate_single_shot(context_for_generation, language, lane, tenant, started, plan_ms, reason):
+    # Fallback quando o plano não pode ser usado: o prompt normal da linguagem, sem arquivos por componente
+    try:
+        code, stop_reason, _ = invoke_model_text(
+            get_language(language)['build_prompt'](context_for_generation), SINGLE_SHOT_MAX_TOKENS,
+            lane=lane, tenant=tenant, artifact=language, task=f"code_{language}"
+        )
+    except DeadlineExceeded as e:
+        # O modo por componentes não retoma checkpoints: a próxima tentativa recomeça pelo plano
+        e.partial = ''
+        raise
+    stats = {
+        'planMs': round(plan_ms),
+        'wallClockMs': round((time.perf_counter() - started) * 1000),
+        'components': [],
+        'truncated': stop_reason == 'max_tokens',
+        'fallback': 'singleShot',
+        'fallbackReason': reason
+    }
+    return code, None, stats
+
+def generate_with_components(context_for_generation, language, lane=LANE_INTERACTIVE, tenant=DEFAULT_TENANT):
+    """
+    Geração em duas fases: plano curto e componentes em paralelo (pool limitado).
+    """
+    logger.info(f"Gerando {language} por componentes")
+    started = time.perf_counter()
+
+    try:
+        plan_text, _, _ = invoke_model_text(build_plan_prompt(context_for_generation, language), PLAN_MAX_TOKENS, lane=lane, tenant=tenant, task='plan')
+    except DeadlineExceeded as e:
+        # O plano não é código: nada a retomar
+        e.partial = ''
+        raise
+    plan_ms = (time.perf_counter() - started) * 1000
+    try:
+        components = order_components(parse_plan(plan_text))
+    except ValueError as e:
+        logger.error(f"Plano inválido ({str(e)}), gerando {language} em uma única chamada")
+        return _generate_single_shot(context_for_generation, language, lane, tenant, started, plan_ms, str(e))
+    outline = format_outline(components)
+    logger.info(f"Plano com {len(components)} componentes em {plan_ms:.0f}ms")
+
+    def generate_component(component):
+        component_started = time.perf_counter()
+        code, stop_reason, output_tokens = invoke_model_text(
+            build_component_prompt(context_for_generation, language, outline, component),
+            COMPONENT_MAX_TOKENS, lane=lane, tenant=tenant, artifact=language, task=f"component_{language}"
+        )
+        return {
+            'name': component['name'],
+            'code': code,
+            'truncated': stop_reason == 'max_tokens',
+            'outputTokens': output_tokens,
+            'ms': round((time.perf_counter() - component_started) * 1000)
+        }
+
+    # Clientes criados aqui, no thread principal; as threads só os reutilizam
+    prepare_model_clients()
+    try:
+        with ThreadPoolExecutor(max_workers=COMPONENT_POOL_SIZE) as executor:
+            results = list(executor.map(generate_component, components))
+    except DeadlineExceeded as e:
+        # O parcial é de um único componente, não do arquivo: a próxima tentativa gera tudo de novo
+        e.partial = ''
+        raise
+
+    combined, files = assemble_components(language, [(result['name'], result['code']) for result in results])
+    stats = {
+        'planMs': round(plan_ms),
+        'wallClockMs': round((time.perf_counter() - started) * 1000),
+        'components': [{key: result[key] for key in ('name', 'ms', 'outputTokens', 'truncated')} for result in results],
+        'truncated': any(result['truncated'] for result in results)
+    }
+    logger.info(f"Componentes gerados em {stats['wallClockMs']}ms (truncado: {stats['truncated']})")
+    return combined, files, stats
+
+def benchmark_component_generation(stories, language, build_prompt, build_context):
+    """
+    Compara geração única (8000 tokens) com plano + componentes: tempo e taxa de truncamento.
+
+    Chama o Bedrock de verdade; `build_prompt` é build_java_prompt ou build_python_prompt.
+    """
+    rows = {'singleShot': [], 'components': []}
+    for story in stories:
+        context_for_generation = build_context(story, language)
+
+        started = time.perf_counter()
+        _, stop_reason, _ = invoke_model_text(build_prompt(context_for_generation), SINGLE_SHOT_MAX_TOKENS)
+        rows['singleShot'].append({'ms': (time.perf_counter() - started) * 1000, 'truncated': stop_reason == 'max_tokens'})
+
+        _, _, stats = generate_with_components(context_for_generation, language)
+        rows['components'].append({'ms': stats['wallClockMs'], 'truncated': stats['truncated']})
+
+    return {
+        mode: {
+            'p50Ms': round(statistics.median(row['ms'] for row in samples)),
+            'maxMs': round(max(row['ms'] for row in samples)),
+            'truncationRate': sum(1 for row in samples if row['truncated']) / len(samples)
+        }
+        for mode, samples in rows.items()
+    }
+
+if __name__ == '__main__':
+    import sys
+    from extractHistory import build_context_for_generation
+    from generateJavaCode import build_java_prompt
+    from generatePythonCode import build_python_prompt
+    from modelBenchmark import BENCHMARK_STORIES
+
+    target_language = sys.argv[1] if len(sys.argv) > 1 else 'java'
+    print(benchmark_component_generation(
+        [story['text'] for story in BENCHMARK_STORIES],
+        target_language,
+        build_java_prompt if target_language == 'java' else build_python_prompt,
+        build_context_for_generation
+    ))
@@ -0,0 +1,209 @@
+import logging
+import threading
+import time
+import boto3
+from botocore.config import Config
+
+# Configuração de logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Constantes
+SAFETY_MARGIN_MS = 8000          # reservado para salvar o checkpoint e responder
+MIN_CALL_SECONDS = 1
+CONNECT_TIMEOUT_SECONDS = 5
+MAX_CALL_SECONDS = {'bedrock': 240, 's3': 30}
+CLIENT_TIMEOUT_BUCKETS = (1, 2, 5, 15, 30, 60, 120, 240)  # um cliente em cache por faixa de timeout
+CHECKPOINT_TIMEOUT_SECONDS = 5
+CHECKPOINT_PREFIX = 'checkpoints'
+
+class DeadlineExceeded(Exception):
+    """
+    O orçamento de tempo da invocação acabou; `partial` traz o texto gerado até ali.
+
+    Os handlers gravam o checkpoint e deixam o erro sair da Lambda: o Step
+    Functions repete a etapa pela regra Retry (ErrorEquals: ["DeadlineExceeded"])
+    e a nova invocação continua a partir do checkpoint.
+    """
+
+    def __init__(self, message, partial=''):
+        super().__init__(message)
+        self.partial = partial
+
+class Deadline:
+    """
+    Prazo da invocação derivado de context.get_remaining_time_in_millis().
+
+    O tempo restante já desconta SAFETY_MARGIN_MS, então um prazo "vencido"
+    ainda deixa tempo para gravar um checkpoint antes do timeout da Lambda.
+    """
+
+    def __init__(self, context, margin_ms=SAFETY_MARGIN_MS):
+        self.context = context
+        self.margin_ms = margin_ms
+
+    def remaining_ms(self):
+        return self.context.get_remaining_time_in_millis() - self.margin_ms
+
+    def expired(self):
+        return self.remaining_ms() <= 0
+
+    def check(self, operation):
+        """
+        Falha antes de iniciar uma operação sem tempo para concluí-la.
+        """
+        if self.expired():
+            raise DeadlineExceeded(f"Sem tempo restante para {operation}")
+
+    def timeout_seconds(self, service):
+        """
+        Timeout de uma chamada ao serviço: o menor entre o teto do serviço e o tempo restante.
+        """
+        return max(MIN_CALL_SECONDS, min(MAX_CALL_SECONDS[service], self.remaining_ms() / 1000))
+
+    def timeout_bucket(self, service):
+        """
+        Maior faixa de CLIENT_TIMEOUT_BUCKETS que cabe no timeout da chamada.
+        """
+        timeout = self.timeout_seconds(service)
+        return max([bucket for bucket in CLIENT_TIMEOUT_BUCKETS if bucket <= timeout] or [CLIENT_TIMEOUT_BUCKETS[0]])
+
+    def client_config(self, service):
+        return _timeout_config(service, self.timeout_bucket(service))
+
+class LocalLambdaContext:
+    """
+    Contexto de Lambda com orçamento próprio para execuções locais e simulações.
+
+    O tempo restante diminui com o relógio real; `consume_ms` simula trabalho
+    sem esperar.
+    """
+
+    def __init__(self, budget_ms, clock=time.monotonic):
+        self.clock = clock
+        self.started = clock()
+        self.budget_ms = budget_ms
+        self.consumed_ms = 0
+
+    def consume_ms(self, milliseconds):
+        self.consumed_ms += milliseconds
+
+    def get_remaining_time_in_millis(self):
+        elapsed_ms = (self.clock() - self.started) * 1000 + self.consumed_ms
+        return max(0, int(self.budget_ms - elapsed_ms))
+
+def _timeout_config(service, timeout):
+    return Config(
+        connect_timeout=min(CONNECT_TIMEOUT_SECONDS, timeout),
+        read_timeout=timeout,
+        # Retentativas do botocore não cabem em um prazo curto
+        retries={'max_attempts': 1 if timeout < MAX_CALL_SECONDS[service] else 3}
+    )
+
+_current_deadline = None
+
+# Clientes do container: criar clientes na Session padrão do boto3 não é thread-safe,
+# então a criação é serializada e cada cliente é reutilizado entre threads e invocações
+_session = boto3.session.Session()
+_clients = {}
+_clients_lock = threading.Lock()
+
+def _cached_client(service_name, variant, build_config):
+    key = (service_name, variant)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _session.client(service_name, config=build_config())
+                _clients[key] = client
+    return client
+
+def start_deadline(context, margin_ms=SAFETY_MARGIN_MS):
+    """
+    Define o prazo da invocação atual (um por container; vale também para as threads dela).
+
+    Sem contexto de Lambda (execução local) não há prazo.
+    """
+    global _current_deadline
+    _current_deadline = Deadline(context, margin_ms) if hasattr(context, 'get_remaining_time_in_millis') else None
+    if _current_deadline:
+        logger.info(f"Prazo da invocação: {_current_deadline.remaining_ms()}ms úteis")
+    return _current_deadline
+
+def get_current_deadline():
+    """
+    Prazo da invocação atual (None fora de uma Lambda).
+    """
+    return _current_deadline
+
+def client_for(service_name, service):
+    """
+    Cliente boto3 com timeouts limitados pelo prazo atual (`service` é bedrock ou s3).
+
+    Os clientes ficam em cache por faixa de timeout (CLIENT_TIMEOUT_BUCKETS), então
+    chamadas feitas de threads de trabalho reutilizam clientes já criados.
+    """
+    deadline = get_current_deadline()
+    if deadline is None:
+        return _cached_client(service_name, None, lambda: None)
+    deadline.check(service_name)
+    bucket = deadline.timeout_bucket(service)
+    return _cached_client(service_name, bucket, lambda: _timeout_config(service, bucket))
+
+def build_checkpoint_key(request_id, stage):
+    """
+    Chave S3 do texto parcial de uma etapa interrompida pelo prazo.
+    """
+    return f"{CHECKPOINT_PREFIX}/{request_id}/{stage}.partial"
+
+def margin_client():
+    """
+    Cliente S3 de timeouts curtos para gravações feitas na margem de segurança,
+    depois que o prazo já venceu (checkpoint, perfil da invocação).
+    """
+    return _cached_client(
+        's3', 'checkpoint',
+        lambda: Config(connect_timeout=2, read_timeout=CHECKPOINT_TIMEOUT_SECONDS, retries={'max_attempts': 1})
+    )
+
+def save_checkpoint(bucket, request_id, stage, text):
+    """
+    Grava o texto parcial para a próxima tentativa continuar de onde parou.
+    """
+    s3_key = build_checkpoint_key(request_id, stage)
+    s3_client = margin_client()
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=s3_key,
+        Body=text,
+        ContentType='text/plain',
+        Metadata={'request-id': request_id, 'stage': stage}
+    )
+    logger.info(f"Checkpoint salvo: s3://{bucket}/{s3_key} ({len(text)} caracteres)")
+    return {'bucket': bucket, 'key': s3_key, 'length': len(text)}
+
+def load_checkpoint(bucket, request_id, stage):
+    """
+    Texto parcial salvo por uma tentativa anterior ('' se não houver).
+
+    Checkpoints só são gravados sob prazo; fora de uma Lambda não há o que ler.
+    """
+    if get_current_deadline() is None:
+        return ''
+    try:
+        response = client_for('s3', 's3').get_object(Bucket=bucket, Key=build_checkpoint_key(request_id, stage))
+        return response['Body'].read().decode('utf-8')
+    except DeadlineExceeded:
+        raise
+    except Exception:
+        return ''
+
+def clear_checkpoint(bucket, request_id, stage):
+    """
+    Remove o checkpoint depois que a etapa conclui (falhas são ignoradas).
+    """
+    try:
+        client_for('s3', 's3').delete_object(Bucket=bucket, Key=build_checkpoint_key(request_id, stage))
+    except Exception as e:
+        logger.info(f"Checkpoint não removido: {str(e)}")
@@ -0,0 +1,27 @@
+import threading
+
+class DefaultInstance:
+    """
+    Instância padrão de um store, criada sob demanda e reutilizada entre invocações.
+
+    `factory` cria a instância de produção (ex.: DynamoIdempotencyStore) no
+    primeiro get(); set() a substitui (ex.: store local em testes e simulações).
+    A criação é serializada: o recurso DynamoDB do boto3 não é thread-safe.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.instance = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        instance = self.instance
+        if instance is None:
+            with self.lock:
+                if self.instance is None:
+                    self.instance = self.factory()
+                instance = self.instance
+        return instance
+
+    def set(self, instance):
+        self.instance = instance
@@ -0,0 +1,159 @@
+import codecs
+import logging
+import os
+import re
+import time
+import tracemalloc
+from deadlines import client_for
+
+# Configuração de logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Constantes
+STREAM_CHUNK_SIZE = 64 * 1024
+CONTROL_CHARS = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F-\x9F]')
+TRAILING_WHITESPACE = re.compile(r'\s*$')
+# Único local de onde documentos enviados podem ser lidos (sem bucket configurado, nenhum)
+UPLOAD_BUCKET = os.environ.get('DOCUMENT_UPLOAD_BUCKET', '')
+UPLOAD_PREFIX = os.environ.get('DOCUMENT_UPLOAD_PREFIX', 'uploads/')
+
+def _normalize_whitespace(text):
+    # Mesmas regras de clean_text, aplicadas a um trecho sem espaço em branco cortado
+    text = re.sub(r'\r\n|\r', '\n', text)
+    text = re.sub(r'[ \t]+', ' ', text)
+    return re.sub(r'\n\s*\n\s*\n', '\n\n', text)
+
+def iter_clean_chunks(raw_chunks, encoding='utf-8'):
+    """
+    Normaliza um fluxo de bytes em trechos limpos, equivalente a clean_text no texto inteiro.
+
+    A sequência final de espaço em branco de cada trecho fica retida até o próximo,
+    para que quebras de linha e espaços nunca sejam normalizados pela metade.
+    Gera tuplas (trecho_limpo, caracteres_lidos).
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    carry = ''
+    started = False
+
+    for raw in raw_chunks:
+        decoded = decoder.decode(raw)
+        text = carry + CONTROL_CHARS.sub('', decoded)
+        split_at = TRAILING_WHITESPACE.search(text).start()
+        head, carry = text[:split_at], text[split_at:]
+        if len(carry) > STREAM_CHUNK_SIZE:
+            # Sequência longa só de espaço em branco: compacta sem mudar o resultado
+            carry = _normalize_whitespace(carry)
+
+        cleaned = _normalize_whitespace(head)
+        if not started:
+            cleaned = cleaned.lstrip()
+            started = bool(cleaned)
+        yield cleaned, len(decoded)
+
+    tail = decoder.decode(b'', final=True)
+    text = carry + CONTROL_CHARS.sub('', tail)
+    cleaned = _normalize_whitespace(text).rstrip()
+    yield (cleaned.lstrip() if not started else cleaned), len(tail)
+
+def stream_clean_text(raw_chunks, max_length):
+    """
+    Limpa um fluxo com memória limitada a ~max_length + um trecho.
+
+    Interrompe a leitura assim que o texto limpo passa de max_length.
+    Retorna (texto_limpo, stats) com contagens acumuladas.
+    """
+    parts = []
+    stats = {'originalLength': 0, 'cleanedLength': 0, 'chunks': 0, 'exceeded': False}
+
+    for cleaned, read_length in iter_clean_chunks(raw_chunks):
+        stats['originalLength'] += read_length
+        stats['cleanedLength'] += len(cleaned)
+        stats['chunks'] += 1
+        if stats['cleanedLength'] > max_length:
+            stats['exceeded'] = True
+            break
+        parts.append(cleaned)
+
+    return ''.join(parts), stats
+
+def is_allowed_upload(bucket, key):
+    """
+    Verifica se (bucket, key) está no bucket e prefixo de uploads configurados.
+
+    Os valores vêm do evento: sem esta checagem a Lambda leria qualquer objeto
+    que o seu papel IAM alcança.
+    """
+    if not UPLOAD_BUCKET or bucket != UPLOAD_BUCKET:
+        return False
+    if not key or not key.startswith(UPLOAD_PREFIX) or key == UPLOAD_PREFIX:
+        return False
+    return '..' not in key.split('/')
+
+def stream_clean_s3_object(bucket, key, max_length, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Lê um documento do S3 em trechos e devolve o texto limpo sem carregar o original.
+    """
+    logger.info(f"Lendo documento em streaming: s3://{bucket}/{key}")
+
+    try:
+        s3_client = client_for('s3', 's3')
+        body = s3_client.get_object(Bucket=bucket, Key=key)['Body']
+        try:
+            cleaned_text, stats = stream_clean_text(body.iter_chunks(chunk_size), max_length)
+        finally:
+            body.close()
+
+        logger.info(
+            f"Documento lido: {stats['originalLength']} -> {stats['cleanedLength']} caracteres "
+            f"em {stats['chunks']} trechos{' (limite excedido)' if stats['exceeded'] else ''}"
+        )
+        return cleaned_text, stats
+
+    except Exception as e:
+        logger.error(f"Erro ao ler documento do S3: {str(e)}")
+        raise
+
+def benchmark_streaming_memory(sizes_mb=(1, 4, 16), chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Compara pico de memória (tracemalloc) entre clean_text no texto inteiro e o streaming.
+
+    O documento sintético tem muito espaço em branco e caracteres de controle, como
+    um .docx exportado; o streaming é medido consumindo os trechos sem acumulá-los.
+    """
+    from extractHistory import clean_text
+
+    paragraph = ("Como cliente\t\t eu quero   acompanhar meus pedidos\r\n\x0c\r\n\r\n\r\n" * 40).encode('utf-8')
+    results = []
+    for size_mb in sizes_mb:
+        document = paragraph * (size_mb * 1024 * 1024 // len(paragraph) + 1)
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        clean_text(document.decode('utf-8'))
+        in_memory_seconds = time.perf_counter() - started
+        in_memory_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        chunks = (document[offset:offset + chunk_size] for offset in range(0, len(document), chunk_size))
+        tracemalloc.start()
+        started = time.perf_counter()
+        for _ in iter_clean_chunks(chunks):
+            pass
+        streaming_seconds = time.perf_counter() - started
+        streaming_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results.append({
+            'sizeMb': size_mb,
+            'inMemoryPeakMb': round(in_memory_peak / 1024 / 1024, 2),
+            'streamingPeakMb': round(streaming_peak / 1024 / 1024, 2),
+            'inMemorySeconds': round(in_memory_seconds, 3),
+            'streamingSeconds': round(streaming_seconds, 3)
+        })
+    return results
+
+if __name__ == '__main__':
+    logging.disable(logging.INFO)
+    for row in benchmark_streaming_memory():
+        print(row)
@@ -2,8 +2,15 @@ import json
 import logging
 import traceback
 import re
-import boto3
 from datetime import datetime, timezone
+from documentStreaming import stream_clean_s3_object, is_allowed_upload
+from invocationProfiler import profiled_handler
+from languageRegistry import LANGUAGES, LANGUAGE_BUCKETS
+from bedrockScheduler import LANE_INTERACTIVE, DEFAULT_TENANT
+from modelInvocation import invoke_model_text
+from deadlines import DeadlineExceeded, start_deadline
+from storyStructure import should_skip_standardization, parse_threshold, STRUCTURE_SKIP_THRESHOLD
+from speculativeGeneration import run_speculative_generation, SPECULATION_DIFF_THRESHOLD
 
 # Configuração de logging
 logger = logging.getLogger()
@@ -12,7 +19,9 @@ logger.setLevel(logging.INFO)
 # Constantes
 MAX_TEXT_LENGTH = 100000
 MIN_TEXT_LENGTH = 10
-SUPPORTED_LANGUAGES = ['python', 'java']
+STANDARDIZATION_MAX_TOKENS = 2000
+STANDARDIZATION_MODEL_ID = 'amazon.nova-lite-v1:0'
+SUPPORTED_LANGUAGES = list(LANGUAGES)
 
 def clean_text(text):
     """
@@ -69,17 +78,11 @@ def validate_input(user_story, language):
         logger.error(f"Erro na validação: {str(e)}")
         return False, f"Erro de validação: {str(e)}"
 
-def standardize_story_with_llm(text):
+def build_standardization_prompt(text):
     """
-    Usa LLM para padronizar e estruturar a história de usuário.
+    Constrói o prompt de padronização da história de usuário.
     """
-    logger.info("Padronizando história com LLM")
-    
-    try:
-        bedrock_client = boto3.client('bedrock-runtime')
-        
-        # Prompt para padronização
-        standardization_prompt = f"""
+    return f"""
 Você é um analista de requisitos especializado. Sua tarefa é reformular a história de usuário fornecida de forma clara e estruturada, SEM INVENTAR nenhuma informação nova.
 
 REGRAS IMPORTANTES:
@@ -102,29 +105,31 @@ INSTRUÇÕES:
 
 Reformule a história mantendo todas as informações originais, apenas organizando melhor:
 """
+
+def standardize_story_with_llm(text, lane=LANE_INTERACTIVE, tenant=DEFAULT_TENANT):
+    """
+    Usa LLM para padronizar e estruturar a história de usuário.
+    """
+    logger.info("Padronizando história com LLM")
+    
+    try:
+        # Prompt para padronização
+        standardization_prompt = build_standardization_prompt(text)
         
-        # Chamar Bedrock
-        response = bedrock_client.invoke_model(
-            modelId='amazon.nova-lite-v1:0',  # Usando Amazon Nova Lite
-            body=json.dumps({
-                'messages': [
-                    {
-                        'role': 'user',
-                        'content': standardization_prompt
-                    }
-                ],
-                'max_tokens': 2000,
-                'temperature': 0.1  # Baixa temperatura para manter consistência
-            })
+        # Amazon Nova Lite, max_tokens adaptativo (teto STANDARDIZATION_MAX_TOKENS), repetindo se truncar
+        standardized_story, _, _ = invoke_model_text(
+            standardization_prompt, STANDARDIZATION_MAX_TOKENS,
+            temperature=0.1,  # Baixa temperatura para manter consistência
+            lane=lane, tenant=tenant, task='standardization', model_id=STANDARDIZATION_MODEL_ID
         )
         
-        # Processar resposta
-        response_body = json.loads(response['body'].read())
-        standardized_story = response_body['output']['message']['content'][0]['text'].strip()
-        
         logger.info(f"História padronizada: {len(text)} -> {len(standardized_story)} caracteres")
         return standardized_story
         
+    except DeadlineExceeded:
+        # Sem tempo para seguir: o handler encerra a invocação
+        raise
+        
     except Exception as e:
         logger.error(f"Erro ao padronizar com LLM: {str(e)}")
         logger.info("Usando texto original como fallback")
@@ -156,6 +161,8 @@ def build_context_for_generation(standardized_story, language):
         logger.error(f"Erro ao construir contexto: {str(e)}")
         raise
 
+# Perfis ficam no bucket da linguagem pedida, ao lado do código gerado
+@profiled_handler('extract_history', LANGUAGE_BUCKETS)
 def lambda_handler(event, context):
     """
     Handler principal da Lambda para processar e padronizar história de usuário.
@@ -165,12 +172,15 @@ def lambda_handler(event, context):
     logger.info(f"=== INICIANDO EXTRACT_HISTORY_LAMBDA ===")
     logger.info(f"Request ID: {request_id}")
     logger.info(f"Timestamp: {datetime.now(timezone.utc).isoformat()}")
+    start_deadline(context)
     
     try:
         # 1. EXTRAÇÃO DOS DADOS
         logger.info("ETAPA 1: Extraindo dados do evento")
         user_story = event.get('userStory', '').strip()
         file_content = event.get('fileContent', '').strip()
+        file_s3_bucket = event.get('fileS3Bucket', '')
+        file_s3_key = event.get('fileS3Key', '')
         language = event.get('language', '').lower()
         
         # Usar arquivo se existir, senão usar texto direto
@@ -178,11 +188,38 @@ def lambda_handler(event, context):
         
         logger.info(f"Texto: {len(input_text)} caracteres")
         logger.info(f"Linguagem: {language}")
-        logger.info(f"Fonte: {'arquivo' if file_content else 'texto_direto'}")
+        logger.info(f"Fonte: {'s3' if file_s3_key else 'arquivo' if file_content else 'texto_direto'}")
         
         # 2. VALIDAÇÃO
-        logger.info("ETAPA 2: Validando entrada")
-        is_valid, validation_message = validate_input(input_text, language)
+        if file_s3_key and not is_allowed_upload(file_s3_bucket, file_s3_key):
+            # Só documentos do bucket/prefixo de uploads podem ser lidos
+            logger.error(f"Leitura recusada fora do local de uploads: s3://{file_s3_bucket}/{file_s3_key}")
+            return {
+                'statusCode': 403,
+                'body': json.dumps({
+                    'error': 'Forbidden',
+                    'message': 'Documento fora do bucket de uploads',
+                    'requestId': request_id
+                })
+            }
+        if file_s3_key:
+            # Documento grande no S3: lido e limpo em trechos, validado pelas contagens
+            logger.info("ETAPA 2: Lendo documento do S3 e validando")
+            cleaned_text, stream_stats = stream_clean_s3_object(file_s3_bucket, file_s3_key, MAX_TEXT_LENGTH)
+            original_length = stream_stats['originalLength']
+            if stream_stats['exceeded']:
+                is_valid, validation_message = False, f"História muito longa (máximo {MAX_TEXT_LENGTH} caracteres)"
+            else:
+                is_valid, validation_message = validate_input(cleaned_text, language)
+        else:
+            logger.info("ETAPA 2: Validando entrada")
+            original_length = len(input_text)
+            is_valid, validation_message = validate_input(input_text, language)
+        
+        structure_threshold, threshold_error = parse_threshold(event, 'structureThreshold', STRUCTURE_SKIP_THRESHOLD)
+        speculation_threshold, speculation_error = parse_threshold(event, 'speculationThreshold', SPECULATION_DIFF_THRESHOLD)
+        if is_valid and (threshold_error or speculation_error):
+            is_valid, validation_message = False, threshold_error or speculation_error
         
         if not is_valid:
             logger.error(f"Validação falhou: {validation_message}")
@@ -198,12 +235,32 @@ def lambda_handler(event, context):
         logger.info("✓ Entrada válida")
         
         # 3. LIMPEZA DO TEXTO
-        logger.info("ETAPA 3: Limpando texto")
-        cleaned_text = clean_text(input_text)
+        if not file_s3_key:
+            logger.info("ETAPA 3: Limpando texto")
+            cleaned_text = clean_text(input_text)
         
         # 4. PADRONIZAÇÃO COM LLM
-        logger.info("ETAPA 4: Padronizando história com LLM")
-        standardized_story = standardize_story_with_llm(cleaned_text)
+        # Histórias já no formato "Como ... Eu quero ... Para que ..." com critérios pulam o LLM
+        skip_standardization, structure_score, structure_signals = should_skip_standardization(cleaned_text, structure_threshold)
+        
+        # No modo especulativo o código é gerado em paralelo à padronização
+        speculation = None
+        lane, tenant = event.get('priority'), event.get('tenantId') or event.get('userId')
+        if skip_standardization:
+            logger.info(f"ETAPA 4: História já estruturada (score {structure_score:.2f}), padronização dispensada")
+            standardized_story = cleaned_text
+        elif event.get('speculative'):
+            logger.info("ETAPA 4: Padronizando história com geração especulativa de código")
+            speculation = run_speculative_generation(
+                cleaned_text, language,
+                standardize_story_with_llm, build_context_for_generation,
+                threshold=speculation_threshold,
+                lane=lane, tenant=tenant
+            )
+            standardized_story = speculation['standardizedStory']
+        else:
+            logger.info("ETAPA 4: Padronizando história com LLM")
+            standardized_story = standardize_story_with_llm(cleaned_text, lane, tenant)
         
         # 5. CONSTRUÇÃO DO CONTEXTO
         logger.info("ETAPA 5: Construindo contexto para próxima Lambda")
@@ -219,13 +276,24 @@ def lambda_handler(event, context):
             'requestId': request_id,
             'processedAt': datetime.now(timezone.utc).isoformat(),
             'stats': {
-                'originalLength': len(input_text),
+                'originalLength': original_length,
                 'cleanedLength': len(cleaned_text),
                 'standardizedLength': len(standardized_story),
-                'wordCount': len(standardized_story.split())
+                'wordCount': len(standardized_story.split()),
+                'standardization': {
+                    'skipped': skip_standardization,
+                    'structureScore': structure_score,
+                    'threshold': structure_threshold,
+                    'signals': structure_signals
+                }
             }
         }
         
+        if speculation:
+            # Código pronto para a Lambda de geração, que pula a chamada ao LLM
+            response_body['speculativeCode'] = speculation['generatedCode']
+            response_body['stats']['speculation'] = speculation['stats']
+        
         logger.info("=== PROCESSAMENTO CONCLUÍDO COM SUCESSO ===")
         logger.info(f"Texto original: {len(cleaned_text)} caracteres")
         logger.info(f"Texto padronizado: {len(standardized_story)} caracteres")
@@ -236,6 +304,11 @@ def lambda_handler(event, context):
             'body': response_body
         }
         
+    except DeadlineExceeded as e:
+        # Nada a retomar nesta etapa: propaga para a regra Retry do Step Functions
+        logger.error(f"Prazo esgotado em extract_history: {str(e)}")
+        raise
+        
     except Exception as e:
         # Log de erro
         error_message = str(e)
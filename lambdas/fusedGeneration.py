@@ -0,0 +1,162 @@
+import logging
+import statistics
+import time
+from bedrockScheduler import LANE_INTERACTIVE, DEFAULT_TENANT
+from componentGeneration import SINGLE_SHOT_MAX_TOKENS
+from modelInvocation import invoke_model_text
+from outputEnvelope import split_fused_artifacts, ENVELOPE_INSTRUCTIONS, FUSED_INSTRUCTIONS
+from stageIdempotency import begin_stage, complete_stage, release_stage, replay_stage_result, STAGE_COMPLETED, STAGE_IN_PROGRESS, StageInProgressError
+from deadlines import DeadlineExceeded
+import generateBddTest
+
+# Configuração de logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Constantes
+FUSED_MAX_TOKENS = 10000   # limite de saída do Nova Pro; código + .feature cabem na mesma resposta
+
+def build_fused_prompt(code_prompt):
+    """
+    Prompt de código acrescido do pedido de testes BDD para o próprio código gerado.
+    """
+    return f"""{code_prompt}
+ALÉM DO CÓDIGO, gere testes BDD no formato Gherkin para o código que você acabou de escrever.
+
+{generateBddTest.BDD_GUIDELINES}"""
+
+def estimate_tokens(text):
+    """
+    Tokens estimados (len/4, a mesma estimativa do tokenBudget e do agendador).
+    """
+    return len(text) // 4
+
+def generate_code_and_bdd(code_prompt, language, lane=LANE_INTERACTIVE, tenant=DEFAULT_TENANT):
+    """
+    Gera código e .feature em uma única chamada, com as seções <artifact> e <feature>.
+
+    O código não volta ao modelo como entrada de uma segunda requisição. Se a
+    resposta não trouxer o .feature (ex.: truncada), os testes são gerados
+    pelo caminho de duas chamadas. Retorna (código, .feature, estatísticas).
+    """
+    prompt = build_fused_prompt(code_prompt)
+    logger.info(f"Gerando código {language} e testes BDD em uma única chamada ({len(prompt)} caracteres)")
+
+    try:
+        text, stop_reason, output_tokens = invoke_model_text(
+            prompt, FUSED_MAX_TOKENS,
+            temperature=0.1,  # Mesma temperatura da geração de código
+            lane=lane, tenant=tenant, artifact=language, task=f"fused_{language}", fused=True
+        )
+    except DeadlineExceeded as e:
+        # A resposta combinada não é retomada: a próxima tentativa gera tudo de novo
+        e.partial = ''
+        raise
+
+    generated_code, generated_bdd = split_fused_artifacts(text, language)
+    stats = {
+        'promptLength': len(prompt),
+        'estimatedInputTokens': estimate_tokens(prompt + FUSED_INSTRUCTIONS),
+        'outputTokens': output_tokens,
+        'stopReason': stop_reason,
+        'bddFallback': not generated_bdd
+    }
+    if not generated_bdd:
+        logger.info(f"Resposta sem seção <feature> ({stop_reason}), gerando testes BDD em chamada separada")
+        generated_bdd = generateBddTest.generate_bdd_with_llm(
+            generateBddTest.build_bdd_prompt(generated_code, language), lane, tenant
+        )
+
+    logger.info(f"Código: {len(generated_code)} caracteres, BDD: {len(generated_bdd)} caracteres, {output_tokens} tokens de saída")
+    return generated_code, generated_bdd, stats
+
+def save_fused_bdd(generated_bdd, request_id, language, prompt_length, timings=None, user_id=None):
+    """
+    Salva o .feature da geração combinada como resultado da etapa de BDD.
+
+    Usa a mesma chave S3 e o mesmo corpo de resposta de generateBddTest; a
+    etapa fica concluída, então uma chamada posterior a generateBddTest apenas
+    devolve este resultado. Retorna o corpo de resposta da etapa de BDD.
+
+    Levanta StageInProgressError se outra invocação estiver gerando os testes
+    BDD desse requestId; o resultado fica com a etapa de BDD.
+    """
+    stage_status, stored_record = begin_stage(request_id, generateBddTest.STAGE_NAME)
+    if stage_status == STAGE_COMPLETED:
+        logger.info("Etapa de BDD já concluída, mantendo o resultado existente")
+        return replay_stage_result(stored_record)
+    if stage_status == STAGE_IN_PROGRESS:
+        raise StageInProgressError(request_id, generateBddTest.STAGE_NAME)
+
+    try:
+        presigned_url = generateBddTest.save_to_s3_and_get_presigned_url(
+            generated_bdd, request_id, language, timings=timings, user_id=user_id
+        )
+        response_body = generateBddTest.build_bdd_response_body(
+            generated_bdd, presigned_url, language, request_id, prompt_length
+        )
+        complete_stage(
+            request_id, generateBddTest.STAGE_NAME, response_body,
+            artifact={'bucket': generateBddTest.S3_BUCKET, 'key': generateBddTest.build_s3_key(request_id)}
+        )
+        return response_body
+    except Exception:
+        release_stage(request_id, generateBddTest.STAGE_NAME)
+        raise
+
+def benchmark_fused_generation(samples, invoke=invoke_model_text):
+    """
+    Compara código + BDD em duas chamadas com a resposta combinada em uma chamada.
+
+    `samples` é uma lista de (prompt de código, linguagem) e `invoke` é invoke_model_text.
+    Mede a latência total e os tokens de entrada estimados (o caminho de duas
+    chamadas reenvia o código gerado no prompt de BDD).
+    """
+    rows = {'twoCalls': [], 'fused': []}
+    for code_prompt, language in samples:
+        started = time.perf_counter()
+        code, _, code_tokens = invoke(code_prompt, SINGLE_SHOT_MAX_TOKENS, artifact=language)
+        bdd_prompt = generateBddTest.build_bdd_prompt(code, language)
+        _, _, bdd_tokens = invoke(bdd_prompt, generateBddTest.MAX_TOKENS, temperature=0.2, artifact='gherkin')
+        rows['twoCalls'].append({
+            'ms': (time.perf_counter() - started) * 1000,
+            'inputTokens': estimate_tokens(code_prompt + ENVELOPE_INSTRUCTIONS) + estimate_tokens(bdd_prompt + ENVELOPE_INSTRUCTIONS),
+            'outputTokens': code_tokens + bdd_tokens,
+            'bddMissing': 0
+        })
+
+        fused_prompt = build_fused_prompt(code_prompt)
+        started = time.perf_counter()
+        text, _, output_tokens = invoke(fused_prompt, FUSED_MAX_TOKENS, artifact=language, fused=True)
+        rows['fused'].append({
+            'ms': (time.perf_counter() - started) * 1000,
+            'inputTokens': estimate_tokens(fused_prompt + FUSED_INSTRUCTIONS),
+            'outputTokens': output_tokens,
+            'bddMissing': 0 if split_fused_artifacts(text, language)[1] else 1
+        })
+
+    summary = {
+        mode: {
+            'p50Ms': round(statistics.median(row['ms'] for row in mode_rows)),
+            'meanMs': round(statistics.mean(row['ms'] for row in mode_rows)),
+            'meanInputTokens': round(statistics.mean(row['inputTokens'] for row in mode_rows)),
+            'meanOutputTokens': round(statistics.mean(row['outputTokens'] for row in mode_rows)),
+            'bddMissingRate': round(statistics.mean(row['bddMissing'] for row in mode_rows), 3)
+        }
+        for mode, mode_rows in rows.items()
+    }
+    summary['inputTokenReduction'] = round(1 - summary['fused']['meanInputTokens'] / max(1, summary['twoCalls']['meanInputTokens']), 3)
+    summary['p50TimeReduction'] = round(1 - summary['fused']['p50Ms'] / max(1, summary['twoCalls']['p50Ms']), 3)
+    return summary
+
+if __name__ == '__main__':
+    from extractHistory import build_context_for_generation
+    from languageRegistry import get_language
+    from modelBenchmark import BENCHMARK_STORIES
+
+    corpus = [
+        (get_language(language)['build_prompt'](build_context_for_generation(story['text'], language)), language)
+        for story in BENCHMARK_STORIES
+        for language in ('java', 'python')
+    ]
+    print(benchmark_fused_generation(corpus))
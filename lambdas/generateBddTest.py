@@ -1,8 +1,16 @@
 import json
 import logging
 import traceback
-import boto3
+import time
 from datetime import datetime, timezone
+from bedrockScheduler import LANE_INTERACTIVE, DEFAULT_TENANT
+from modelInvocation import invoke_model_text
+from bddUnits import generate_bdd_by_units, count_scenarios
+from languageRegistry import LANGUAGES
+from invocationProfiler import profiled_handler
+from artifactIndex import build_index_entry, record_artifact
+from stageIdempotency import begin_stage, complete_stage, release_stage, replay_stage_result, STAGE_COMPLETED, STAGE_IN_PROGRESS, StageInProgressError
+from deadlines import DeadlineExceeded, start_deadline, client_for, load_checkpoint, save_checkpoint, clear_checkpoint
 
 # Configuração de logging
 logger = logging.getLogger()
@@ -10,26 +18,11 @@ logger.setLevel(logging.INFO)
 
 # Constantes
 S3_BUCKET = 'temp-storage-generate-bdd-test'
+STAGE_NAME = 'generate_bdd_test'
 MAX_TOKENS = 6000
 
-def build_bdd_prompt(generated_code, language):
-    """
-    Constrói prompt específico para geração de testes BDD.
-    """
-    logger.info(f"Construindo prompt para geração BDD - {language}")
-    
-    try:
-        prompt = f"""
-Você é um especialista em testes BDD (Behavior Driven Development) e Quality Assurance.
-
-Analise o código {language.upper()} fornecido e gere testes BDD completos no formato Gherkin.
-
-CÓDIGO A SER TESTADO:
-```{language}
-{generated_code}
-```
-
-DIRETRIZES PARA TESTES BDD:
+# Diretrizes compartilhadas com a geração combinada código + BDD (fusedGeneration)
+BDD_GUIDELINES = """DIRETRIZES PARA TESTES BDD:
 - Use o formato Gherkin padrão (Feature, Scenario, Given, When, Then)
 - Escreva em português brasileiro
 - Crie cenários que cubram diferentes aspectos do código
@@ -77,7 +70,26 @@ QUALIDADE DOS TESTES:
 - Evite cenários muito complexos
 - Use linguagem de negócio, não técnica
 - Garanta que os cenários sejam executáveis
+"""
 
+def build_bdd_prompt(generated_code, language):
+    """
+    Constrói prompt específico para geração de testes BDD.
+    """
+    logger.info(f"Construindo prompt para geração BDD - {language}")
+    
+    try:
+        prompt = f"""
+Você é um especialista em testes BDD (Behavior Driven Development) e Quality Assurance.
+
+Analise o código {language.upper()} fornecido e gere testes BDD completos no formato Gherkin.
+
+CÓDIGO A SER TESTADO:
+```{language}
+{generated_code}
+```
+
+{BDD_GUIDELINES}
 FORMATO DE SAÍDA:
 - APENAS código Gherkin (.feature)
 - Não inclua explicações fora do formato Gherkin
@@ -94,55 +106,50 @@ Agora gere os testes BDD no formato Gherkin baseados no código fornecido:
         logger.error(f"Erro ao construir prompt: {str(e)}")
         raise
 
-def generate_bdd_with_llm(prompt):
+def generate_bdd_with_llm(prompt, lane=LANE_INTERACTIVE, tenant=DEFAULT_TENANT, resume_from=''):
     """
     Chama Amazon Nova Pro para gerar testes BDD.
+
+    A resposta usa o envelope <artifact> com stop sequence: a geração termina
+    com a última Feature e o .feature salvo não leva explicações nem markdown.
+    `resume_from` continua o .feature parcial de uma tentativa interrompida pelo prazo.
     """
     logger.info("Gerando testes BDD com Amazon Nova Pro")
     
     try:
-        bedrock_client = boto3.client('bedrock-runtime')
-        
-        # Chamar Bedrock com Amazon Nova Pro
-        response = bedrock_client.invoke_model(
-            modelId='amazon.nova-pro-v1:0',  # Amazon Nova Pro
-            body=json.dumps({
-                'messages': [
-                    {
-                        'role': 'user',
-                        'content': prompt
-                    }
-                ],
-                'max_tokens': MAX_TOKENS,
-                'temperature': 0.2,  # Temperatura um pouco maior para criatividade nos cenários
-                'top_p': 0.9
-            })
+        generated_bdd, stop_reason, output_tokens = invoke_model_text(
+            prompt, MAX_TOKENS,
+            temperature=0.2,  # Temperatura um pouco maior para criatividade nos cenários
+            lane=lane, tenant=tenant, artifact='gherkin', task='bdd',
+            resume_from=resume_from
         )
         
-        # Processar resposta
-        response_body = json.loads(response['body'].read())
-        generated_bdd = response_body['output']['message']['content'][0]['text'].strip()
-        
-        logger.info(f"BDD gerado: {len(generated_bdd)} caracteres")
+        logger.info(f"BDD gerado: {len(generated_bdd)} caracteres, {output_tokens} tokens de saída ({stop_reason})")
         return generated_bdd
         
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         logger.error(f"Erro ao gerar BDD com LLM: {str(e)}")
         raise
 
+def build_s3_key(request_id):
+    """
+    Chave S3 do arquivo .feature gerado.
+    """
+    return f"bdd-tests/{request_id}_tests.feature"
 
-
-def save_to_s3_and_get_presigned_url(bdd_content, request_id):
+def save_to_s3_and_get_presigned_url(bdd_content, request_id, language='unknown', timings=None, user_id=None):
     """
     Salva testes BDD no S3 e retorna presigned URL.
     """
     logger.info("Salvando testes BDD no S3")
     
     try:
-        s3_client = boto3.client('s3')
+        s3_client = client_for('s3', 's3')
         
         # Definir chave do objeto
-        s3_key = f"bdd-tests/{request_id}_tests.feature"
+        s3_key = build_s3_key(request_id)
         
         # Salvar no S3
         s3_client.put_object(
@@ -159,6 +166,12 @@ def save_to_s3_and_get_presigned_url(bdd_content, request_id):
         
         logger.info(f"BDD salvo no S3: s3://{S3_BUCKET}/{s3_key}")
         
+        # Indexar artefato para busca por requestId e histórico por usuário
+        record_artifact(build_index_entry(
+            request_id, language, 'bdd', S3_BUCKET, s3_key, bdd_content,
+            timings=timings, user_id=user_id
+        ))
+        
         # Gerar presigned URL
         presigned_url = s3_client.generate_presigned_url(
             'get_object',
@@ -173,6 +186,33 @@ def save_to_s3_and_get_presigned_url(bdd_content, request_id):
         logger.error(f"Erro ao salvar no S3: {str(e)}")
         raise
 
+def build_bdd_response_body(generated_bdd, presigned_url, language, request_id, prompt_length, unit_stats=None):
+    """
+    Corpo de resposta da etapa de BDD (também gravado como resultado da etapa pela geração combinada).
+    """
+    # Contar cenários (palavras-chave em inglês ou português)
+    scenario_count = count_scenarios(generated_bdd)
+
+    response_body = {
+        'presignedUrl': presigned_url,
+        'bddLength': len(generated_bdd),
+        'scenarioCount': scenario_count,
+        'language': language,
+        'requestId': request_id,
+        'generatedAt': datetime.now(timezone.utc).isoformat(),
+        'stats': {
+            'promptLength': prompt_length,
+            'bddLength': len(generated_bdd),
+            'estimatedLines': len(generated_bdd.split('\n')),
+            'scenarioCount': scenario_count
+        }
+    }
+
+    if unit_stats:
+        response_body['stats']['units'] = unit_stats
+    return response_body
+
+@profiled_handler(STAGE_NAME, S3_BUCKET)
 def lambda_handler(event, context):
     """
     Handler principal da Lambda para geração de testes BDD.
@@ -182,6 +222,8 @@ def lambda_handler(event, context):
     logger.info(f"=== INICIANDO GENERATE_BDD_TEST_LAMBDA ===")
     logger.info(f"Request ID: {request_id}")
     logger.info(f"Timestamp: {datetime.now(timezone.utc).isoformat()}")
+    stage_claimed = False
+    start_deadline(context)
     
     try:
         # 1. EXTRAÇÃO DOS DADOS
@@ -210,13 +252,13 @@ def lambda_handler(event, context):
                 })
             }
         
-        if language not in ['python', 'java']:
+        if language not in LANGUAGES:
             logger.error(f"Linguagem não suportada: {language}")
             return {
                 'statusCode': 400,
                 'body': json.dumps({
                     'error': 'Unsupported language',
-                    'message': 'Linguagem deve ser python ou java',
+                    'message': f"Linguagem não suportada. Use: {', '.join(LANGUAGES)}",
                     'requestId': request_id
                 })
             }
@@ -224,48 +266,88 @@ def lambda_handler(event, context):
         logger.info(f"Código recebido: {len(generated_code)} caracteres")
         logger.info(f"Linguagem: {language}")
         
+        # Idempotência: retries do Step Functions não repetem a geração
+        stage_status, stored_record = begin_stage(request_id, STAGE_NAME)
+        if stage_status == STAGE_COMPLETED:
+            return {
+                'statusCode': 200,
+                'body': replay_stage_result(stored_record)
+            }
+        if stage_status == STAGE_IN_PROGRESS:
+            raise StageInProgressError(request_id, STAGE_NAME)
+        stage_claimed = True
+        
         # 2. CONSTRUÇÃO DO PROMPT
         logger.info("ETAPA 2: Construindo prompt para Amazon Nova Pro")
         bdd_prompt = build_bdd_prompt(generated_code, language)
         
         # 3. GERAÇÃO DOS TESTES BDD
-        logger.info("ETAPA 3: Gerando testes BDD com LLM")
-        generated_bdd = generate_bdd_with_llm(bdd_prompt)
+        generation_started = time.perf_counter()
+        generated_bdd, unit_stats = None, None
+        if event.get('bddMode') == 'units':
+            # Uma Feature por classe/função pública, geradas em paralelo
+            logger.info("ETAPA 3: Gerando testes BDD por unidade de código")
+            generated_bdd, unit_stats = generate_bdd_by_units(
+                generated_code, language, f"Testes BDD - {request_id}",
+                event.get('priority'), event.get('tenantId') or event.get('userId')
+            )
+        if generated_bdd is None:
+            # Continua de um checkpoint se a tentativa anterior esgotou o prazo
+            resume_from = load_checkpoint(S3_BUCKET, request_id, STAGE_NAME)
+            if resume_from:
+                logger.info(f"ETAPA 3: Continuando testes BDD a partir de checkpoint ({len(resume_from)} caracteres)")
+            else:
+                logger.info("ETAPA 3: Gerando testes BDD com LLM")
+            generated_bdd = generate_bdd_with_llm(bdd_prompt, event.get('priority'), event.get('tenantId') or event.get('userId'), resume_from)
+            if resume_from:
+                clear_checkpoint(S3_BUCKET, request_id, STAGE_NAME)
+        generation_ms = (time.perf_counter() - generation_started) * 1000
         
         # 4. SALVAMENTO NO S3
         logger.info("ETAPA 4: Salvando testes BDD no S3")
-        presigned_url = save_to_s3_and_get_presigned_url(generated_bdd, request_id)
+        presigned_url = save_to_s3_and_get_presigned_url(
+            generated_bdd, request_id, language,
+            timings={'generationMs': generation_ms},
+            user_id=event.get('userId')
+        )
         
         # 5. RESPOSTA
         logger.info("ETAPA 5: Preparando resposta")
-        # Contar cenários simples
-        scenario_count = generated_bdd.count('Scenario:')
-        
-        response_body = {
-            'presignedUrl': presigned_url,
-            'bddLength': len(generated_bdd),
-            'scenarioCount': scenario_count,
-            'language': language,
-            'requestId': request_id,
-            'generatedAt': datetime.now(timezone.utc).isoformat(),
-            'stats': {
-                'promptLength': len(bdd_prompt),
-                'bddLength': len(generated_bdd),
-                'estimatedLines': len(generated_bdd.split('\n')),
-                'scenarioCount': scenario_count
-            }
-        }
+        response_body = build_bdd_response_body(
+            generated_bdd, presigned_url, language, request_id, len(bdd_prompt), unit_stats
+        )
         
         logger.info("=== GERAÇÃO DE TESTES BDD CONCLUÍDA ===")
         logger.info(f"BDD gerado: {len(generated_bdd)} caracteres")
-        logger.info(f"Cenários: {scenario_count}")
+        logger.info(f"Cenários: {response_body['scenarioCount']}")
+        
+        complete_stage(request_id, STAGE_NAME, response_body, artifact={'bucket': S3_BUCKET, 'key': build_s3_key(request_id)})
         
         return {
             'statusCode': 200,
             'body': response_body
         }
         
+    except DeadlineExceeded as e:
+        # Prazo da invocação esgotado: salva o .feature parcial e propaga para a regra Retry
+        if stage_claimed:
+            release_stage(request_id, STAGE_NAME)
+        logger.error(f"Prazo esgotado em {STAGE_NAME}: {str(e)}")
+        if e.partial:
+            try:
+                save_checkpoint(S3_BUCKET, request_id, STAGE_NAME, e.partial)
+            except Exception as save_error:
+                logger.error(f"Erro ao salvar checkpoint: {str(save_error)}")
+        raise
+        
+    except StageInProgressError:
+        # Propaga para a regra Retry do Step Functions
+        raise
+        
     except Exception as e:
+        if stage_claimed:
+            release_stage(request_id, STAGE_NAME)
+        
         # Log de erro
         error_message = str(e)
         error_traceback = traceback.format_exc()
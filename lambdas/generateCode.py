@@ -0,0 +1,404 @@
+import json
+import logging
+import random
+import traceback
+import time
+from datetime import datetime, timezone
+from bedrockScheduler import LANE_INTERACTIVE, DEFAULT_TENANT
+from componentGeneration import generate_with_components
+from modelInvocation import invoke_model_text, GenerationCancelled
+from fusedGeneration import generate_code_and_bdd, save_fused_bdd
+from generateBddTest import build_s3_key as build_bdd_key, S3_BUCKET as BDD_BUCKET
+from invocationProfiler import profiled_handler
+from artifactIndex import build_index_entry, record_artifact
+from stageIdempotency import begin_stage, complete_stage, release_stage, replay_stage_result, STAGE_COMPLETED, STAGE_IN_PROGRESS, StageInProgressError
+from deadlines import DeadlineExceeded, start_deadline, client_for, load_checkpoint, save_checkpoint, clear_checkpoint
+from languageRegistry import LANGUAGES, LANGUAGE_BUCKETS, get_language
+
+# Configuração de logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Constantes
+MAX_TOKENS = 8000
+PROFILE_STAGE = 'generate_code'
+
+def generate_code_with_llm(prompt, language, lane=LANE_INTERACTIVE, tenant=DEFAULT_TENANT, resume_from='', cancel_event=None):
+    """
+    Chama Amazon Nova Pro para gerar código na linguagem informada.
+
+    A resposta usa o envelope <artifact> com stop sequence, então a geração
+    termina junto com o código, sem explicações ao final. `resume_from`
+    continua o código parcial de uma tentativa interrompida pelo prazo;
+    `cancel_event` permite interromper a geração (geração especulativa).
+    """
+    logger.info(f"Gerando código {language} com Amazon Nova Pro")
+
+    try:
+        generated_code, stop_reason, output_tokens = invoke_model_text(
+            prompt, MAX_TOKENS,
+            temperature=0.1,  # Baixa temperatura para código mais consistente
+            lane=lane, tenant=tenant, artifact=language, task=f"code_{language}",
+            resume_from=resume_from, cancel_event=cancel_event
+        )
+
+        logger.info(f"Código gerado: {len(generated_code)} caracteres, {output_tokens} tokens de saída ({stop_reason})")
+        return generated_code
+
+    except (DeadlineExceeded, GenerationCancelled):
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao gerar código com LLM: {str(e)}")
+        raise
+
+def save_to_s3_and_get_presigned_url(code, request_id, language, timings=None, user_id=None):
+    """
+    Salva código no S3 com a chave da linguagem e retorna (presigned URL, descrição do artefato).
+    """
+    logger.info("Salvando código no S3")
+
+    try:
+        spec = LANGUAGES[language]
+        s3_client = client_for('s3', 's3')
+
+        # Chave, metadados e campos de resposta definidos pela linguagem
+        artifact = spec['describe_artifact'](request_id, code)
+
+        # Salvar no S3
+        s3_client.put_object(
+            Bucket=spec['bucket'],
+            Key=artifact['key'],
+            Body=code,
+            ContentType='text/plain',
+            Metadata={
+                'request-id': request_id,
+                'generated-at': datetime.now(timezone.utc).isoformat(),
+                'language': language,
+                **artifact['metadata']
+            }
+        )
+
+        logger.info(f"Código salvo no S3: s3://{spec['bucket']}/{artifact['key']}")
+
+        # Indexar artefato para busca por requestId e histórico por usuário
+        record_artifact(build_index_entry(
+            request_id, language, 'code', spec['bucket'], artifact['key'], code,
+            timings=timings, user_id=user_id
+        ))
+
+        # Gerar presigned URL
+        presigned_url = s3_client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': spec['bucket'], 'Key': artifact['key']},
+            ExpiresIn=3600  # 1 hora
+        )
+
+        logger.info("Presigned URL gerada com sucesso")
+        return presigned_url, artifact
+
+    except Exception as e:
+        logger.error(f"Erro ao salvar no S3: {str(e)}")
+        raise
+
+def build_component_key(request_id, file_name):
+    """
+    Chave S3 de um arquivo do mapa de componentes (um tipo por arquivo).
+    """
+    return f"generated-code/{request_id}/components/{file_name}"
+
+def save_component_files(files, request_id, language):
+    """
+    Salva o mapa {nome_arquivo: código} da geração por componentes ao lado do arquivo único.
+
+    Retorna a lista de {file, key, presignedUrl} salvos.
+    """
+    spec = LANGUAGES[language]
+    s3_client = client_for('s3', 's3')
+    saved = []
+    for file_name, code in files.items():
+        key = build_component_key(request_id, file_name)
+        s3_client.put_object(
+            Bucket=spec['bucket'],
+            Key=key,
+            Body=code,
+            ContentType='text/plain',
+            Metadata={'request-id': request_id, 'language': language, 'component-file': file_name}
+        )
+        presigned_url = s3_client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': spec['bucket'], 'Key': key},
+            ExpiresIn=3600  # 1 hora
+        )
+        saved.append({'file': file_name, 'key': key, 'presignedUrl': presigned_url})
+    logger.info(f"{len(saved)} arquivos de componentes salvos em s3://{spec['bucket']}/{build_component_key(request_id, '')}")
+    return saved
+
+def _error_response(status_code, error, message, request_id):
+    return {
+        'statusCode': status_code,
+        'body': json.dumps({
+            'error': error,
+            'message': message,
+            'requestId': request_id
+        })
+    }
+
+def handle_generation(event, context, expected_language=None):
+    """
+    Fluxo de geração comum a todas as linguagens registradas.
+
+    `expected_language` restringe a linguagem aceita (handlers de compatibilidade).
+    """
+    # Log de início
+    request_id = event.get('requestId', 'unknown')
+    logger.info(f"=== INICIANDO GENERATE_CODE_LAMBDA ===")
+    logger.info(f"Request ID: {request_id}")
+    logger.info(f"Timestamp: {datetime.now(timezone.utc).isoformat()}")
+    stage_claimed = False
+    stage_name = None
+    spec = None
+    start_deadline(context)
+
+    try:
+        # 1. EXTRAÇÃO DOS DADOS
+        logger.info("ETAPA 1: Extraindo dados do evento")
+        context_for_generation = event.get('contextForGeneration', '')
+        language = event.get('language', '').lower()
+        spec = get_language(language)
+
+        if not context_for_generation:
+            logger.error("Contexto para geração não fornecido")
+            return _error_response(400, 'Missing context', 'contextForGeneration é obrigatório', request_id)
+
+        if spec is None or (expected_language and language != expected_language):
+            logger.error(f"Linguagem incorreta: {language}")
+            supported = [expected_language] if expected_language else list(LANGUAGES)
+            return _error_response(400, 'Wrong language', f"Linguagens suportadas: {', '.join(supported)}", request_id)
+
+        logger.info(f"Linguagem: {language}")
+        logger.info(f"Contexto recebido: {len(context_for_generation)} caracteres")
+
+        # Idempotência: retries do Step Functions não repetem a geração
+        stage_name = spec['stage']
+        stage_status, stored_record = begin_stage(request_id, stage_name)
+        if stage_status == STAGE_COMPLETED:
+            return {
+                'statusCode': 200,
+                'body': replay_stage_result(stored_record)
+            }
+        if stage_status == STAGE_IN_PROGRESS:
+            raise StageInProgressError(request_id, stage_name)
+        stage_claimed = True
+
+        # 2. CONSTRUÇÃO DO PROMPT
+        logger.info("ETAPA 2: Construindo prompt para Amazon Nova Pro")
+        prompt = spec['build_prompt'](context_for_generation)
+
+        # 3. GERAÇÃO DO CÓDIGO
+        generation_started = time.perf_counter()
+        component_files, component_stats = None, None
+        generated_bdd, fused_stats = None, None
+        speculative_code = event.get('speculativeCode', '')
+        lane, tenant = event.get('priority'), event.get('tenantId') or event.get('userId')
+        if speculative_code:
+            # Código já gerado em paralelo à padronização (extractHistory especulativo)
+            logger.info("ETAPA 3: Usando código gerado especulativamente")
+            generated_code = speculative_code
+        elif event.get('generationMode') == 'components':
+            # Plano curto + componentes em paralelo, para saídas grandes
+            logger.info(f"ETAPA 3: Gerando código {spec['display_name']} por componentes")
+            generated_code, component_files, component_stats = generate_with_components(context_for_generation, language, lane, tenant)
+        elif event.get('generationMode') == 'fused':
+            # Código e .feature na mesma resposta: o código não é reenviado para gerar os testes
+            logger.info(f"ETAPA 3: Gerando código {spec['display_name']} e testes BDD em uma única chamada")
+            generated_code, generated_bdd, fused_stats = generate_code_and_bdd(prompt, language, lane, tenant)
+        else:
+            # Continua de um checkpoint se a tentativa anterior esgotou o prazo
+            resume_from = load_checkpoint(spec['bucket'], request_id, stage_name)
+            if resume_from:
+                logger.info(f"ETAPA 3: Continuando código {spec['display_name']} a partir de checkpoint ({len(resume_from)} caracteres)")
+            else:
+                logger.info(f"ETAPA 3: Gerando código {spec['display_name']} com LLM")
+            generated_code = generate_code_with_llm(prompt, language, lane, tenant, resume_from)
+            if resume_from:
+                clear_checkpoint(spec['bucket'], request_id, stage_name)
+        generation_ms = (time.perf_counter() - generation_started) * 1000
+
+        # Pós-processamento e validação da linguagem (problemas são reportados, não bloqueiam)
+        generated_code = spec['postprocess'](generated_code)
+        problems = spec['validate'](generated_code)
+        if problems:
+            logger.info(f"Validação {language}: {'; '.join(problems)}")
+
+        # 4. SALVAMENTO NO S3
+        logger.info("ETAPA 4: Salvando código no S3")
+        presigned_url, artifact = save_to_s3_and_get_presigned_url(
+            generated_code, request_id, language,
+            timings={'generationMs': generation_ms},
+            user_id=event.get('userId')
+        )
+
+        # 5. RESPOSTA
+        logger.info("ETAPA 5: Preparando resposta")
+        estimated_lines = len(generated_code.split('\n'))
+        response_body = {
+            'presignedUrl': presigned_url,
+            'codeLength': len(generated_code),
+            **artifact['fields'],
+            'language': language,
+            'requestId': request_id,
+            'generatedAt': datetime.now(timezone.utc).isoformat(),
+            'stats': {
+                'promptLength': len(prompt),
+                'codeLength': len(generated_code),
+                'estimatedLines': estimated_lines,
+                'validation': {'valid': not problems, 'problems': problems}
+            }
+        }
+
+        if component_stats:
+            response_body['stats']['components'] = component_stats
+
+        if component_files:
+            # Mapa por componente (em Java, um tipo público por arquivo), além do arquivo único
+            logger.info("ETAPA 5.1: Salvando arquivos por componente")
+            response_body['componentFiles'] = save_component_files(component_files, request_id, language)
+
+        if generated_bdd:
+            # .feature salvo como resultado da etapa de BDD (mesma chave S3 e mesmos campos)
+            logger.info("ETAPA 5.1: Salvando testes BDD da geração combinada")
+            try:
+                response_body['bdd'] = save_fused_bdd(
+                    generated_bdd, request_id, language, fused_stats['promptLength'],
+                    timings={'generationMs': generation_ms},
+                    user_id=event.get('userId')
+                )
+            except StageInProgressError:
+                # Outra invocação gera o BDD: o resultado sai pela etapa de BDD, não por esta resposta
+                logger.info("Etapa de BDD em andamento em outra invocação, .feature combinado descartado")
+                fused_stats['bddStage'] = STAGE_IN_PROGRESS
+            response_body['stats']['fused'] = fused_stats
+
+        logger.info(f"=== GERAÇÃO DE CÓDIGO {spec['display_name'].upper()} CONCLUÍDA ===")
+        logger.info(f"Código gerado: {len(generated_code)} caracteres")
+        logger.info(f"Linhas estimadas: {estimated_lines}")
+
+        stage_artifact = {'bucket': spec['bucket'], 'key': artifact['key']}
+        if response_body.get('bdd'):
+            # Referência do .feature combinado para renovar a URL no replay
+            stage_artifact['bdd'] = {'bucket': BDD_BUCKET, 'key': build_bdd_key(request_id)}
+        complete_stage(request_id, stage_name, response_body, artifact=stage_artifact)
+
+        return {
+            'statusCode': 200,
+            'body': response_body
+        }
+
+    except DeadlineExceeded as e:
+        # Prazo da invocação esgotado: salva o código parcial e propaga para a regra Retry
+        if stage_claimed:
+            release_stage(request_id, stage_name)
+        logger.error(f"Prazo esgotado em {stage_name}: {str(e)}")
+        if e.partial and spec:
+            try:
+                save_checkpoint(spec['bucket'], request_id, stage_name, e.partial)
+            except Exception as save_error:
+                logger.error(f"Erro ao salvar checkpoint: {str(save_error)}")
+        raise
+
+    except StageInProgressError:
+        # Propaga para a regra Retry do Step Functions
+        raise
+
+    except Exception as e:
+        if stage_claimed:
+            release_stage(request_id, stage_name)
+
+        # Log de erro
+        error_message = str(e)
+        error_traceback = traceback.format_exc()
+
+        logger.error("=== ERRO NA GERAÇÃO DE CÓDIGO ===")
+        logger.error(f"Request ID: {request_id}")
+        logger.error(f"Erro: {error_message}")
+        logger.error(f"Traceback: {error_traceback}")
+
+        return {
+            'statusCode': 500,
+            'body': json.dumps({
+                'error': 'Internal server error',
+                'message': error_message,
+                'requestId': request_id,
+                'timestamp': datetime.now(timezone.utc).isoformat()
+            })
+        }
+
+@profiled_handler(PROFILE_STAGE, LANGUAGE_BUCKETS)
+def lambda_handler(event, context):
+    """
+    Handler principal da Lambda unificada de geração de código (todas as linguagens).
+    """
+    return handle_generation(event, context)
+
+def language_handler(language):
+    """
+    Handler restrito a uma linguagem, para as Lambdas por linguagem ainda implantadas.
+    """
+    @profiled_handler(PROFILE_STAGE, LANGUAGE_BUCKETS)
+    def handler(event, context):
+        return handle_generation(event, context, expected_language=language)
+    return handler
+
+def simulate_cold_starts(traffic_mix, requests_per_hour=30, hours=24, service_seconds=(15, 45), idle_ttl_seconds=(300, 900), seed=7):
+    """
+    Simula cold starts sob tráfego misto: uma Lambda por linguagem vs. a Lambda unificada.
+
+    Chegadas Poisson por linguagem (`traffic_mix` = {linguagem: fração}); cada container
+    atende uma requisição por vez e é reciclado após um tempo ocioso sorteado em
+    `idle_ttl_seconds`. Os dois cenários usam exatamente a mesma sequência de eventos.
+    """
+    rng = random.Random(seed)
+    horizon = hours * 3600
+    events = []
+    for language, share in traffic_mix.items():
+        rate = requests_per_hour * share / 3600
+        at = rng.expovariate(rate)
+        while at < horizon:
+            events.append((at, language, rng.uniform(*service_seconds), rng.uniform(*idle_ttl_seconds)))
+            at += rng.expovariate(rate)
+    events.sort()
+
+    def scenario(function_for):
+        pools = {}
+        counts = {language: {'requests': 0, 'coldStarts': 0} for language in traffic_mix}
+        for at, language, duration, idle_ttl in events:
+            # Container: [livre_a_partir_de, reciclado_em]
+            pool = [container for container in pools.get(function_for(language), []) if container[1] > at]
+            idle = [container for container in pool if container[0] <= at]
+            counts[language]['requests'] += 1
+            if idle:
+                container = max(idle, key=lambda item: item[0])  # o Lambda reaproveita o mais recente
+            else:
+                counts[language]['coldStarts'] += 1
+                container = [at, 0.0]
+                pool.append(container)
+            container[0] = at + duration
+            container[1] = container[0] + idle_ttl
+            pools[function_for(language)] = pool
+
+        for language_counts in counts.values():
+            language_counts['coldStartRate'] = round(language_counts['coldStarts'] / max(1, language_counts['requests']), 3)
+        total_requests = sum(item['requests'] for item in counts.values())
+        total_cold = sum(item['coldStarts'] for item in counts.values())
+        return {'perLanguage': counts, 'coldStartRate': round(total_cold / max(1, total_requests), 3)}
+
+    return {
+        'perLanguageFunctions': scenario(lambda language: language),
+        'unifiedFunction': scenario(lambda language: PROFILE_STAGE)
+    }
+
+if __name__ == '__main__':
+    mix = {'python': 0.85, 'java': 0.15}
+    for rate in (6, 30, 120):
+        result = simulate_cold_starts(mix, requests_per_hour=rate)
+        print(f"{rate} req/h: {json.dumps(result)}")
@@ -0,0 +1,223 @@
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import tempfile
+import time
+import tracemalloc
+from botocore.client import BaseClient
+from botocore.eventstream import EventStream
+from botocore.response import StreamingBody
+from datetime import datetime, timezone
+from deadlines import client_for, get_current_deadline, margin_client
+
+# Configuração de logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Constantes
+PROFILE_ENV_FLAG = 'PROFILE_INVOCATIONS'
+PROFILE_PREFIX = 'profiles'
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 15
+TRACEMALLOC_FRAMES = 5
+
+def is_profiling_enabled(event):
+    """
+    Perfil ligado por invocação (event.profile) ou para a função inteira (variável de ambiente).
+    """
+    return bool(isinstance(event, dict) and event.get('profile')) or os.environ.get(PROFILE_ENV_FLAG) == '1'
+
+class _TimedStream:
+    # Corpo de resposta (EventStream do Bedrock, StreamingBody do S3) que soma o tempo de leitura à chamada
+    def __init__(self, stream, entry):
+        self._stream = stream
+        self._entry = entry
+
+    def _add(self, started):
+        elapsed = (time.perf_counter() - started) * 1000
+        self._entry['wallMs'] += elapsed
+        self._entry['streamMs'] += elapsed
+
+    def _timed_iter(self, iterator):
+        iterator = iter(iterator)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self._add(started)
+                return
+            self._add(started)
+            yield item
+
+    def __iter__(self):
+        return self._timed_iter(self._stream)
+
+    def read(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._stream.read(*args, **kwargs)
+        finally:
+            self._add(started)
+
+    def iter_chunks(self, *args, **kwargs):
+        return self._timed_iter(self._stream.iter_chunks(*args, **kwargs))
+
+    def iter_lines(self, *args, **kwargs):
+        return self._timed_iter(self._stream.iter_lines(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+class _RemoteCallTimer:
+    # Mede o tempo de parede de cada chamada boto3 (Bedrock, S3, DynamoDB) durante o perfil,
+    # incluindo a leitura do corpo em streaming, que acontece depois do retorno da chamada
+    def __init__(self):
+        self.calls = {}
+        self.original = None
+
+    def __enter__(self):
+        self.original = BaseClient._make_api_call
+        timer = self
+
+        def timed_call(client, operation_name, api_params):
+            key = f"{client.meta.service_model.service_name}.{operation_name}"
+            entry = timer.calls.setdefault(key, {'count': 0, 'wallMs': 0.0, 'streamMs': 0.0})
+            started = time.perf_counter()
+            try:
+                response = timer.original(client, operation_name, api_params)
+            finally:
+                entry['count'] += 1
+                entry['wallMs'] += (time.perf_counter() - started) * 1000
+            if isinstance(response, dict):
+                for field, value in response.items():
+                    if isinstance(value, (EventStream, StreamingBody)):
+                        response[field] = _TimedStream(value, entry)
+            return response
+
+        BaseClient._make_api_call = timed_call
+        return self
+
+    def __exit__(self, *exc):
+        BaseClient._make_api_call = self.original
+
+def build_profile_summary(stage, request_id, wall_ms, cpu_ms, remote_calls, profiler, snapshot, peak_bytes):
+    """
+    Resumo JSON do perfil: tempos, chamadas remotas, funções e alocações principais.
+    """
+    stats_output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stats_output)
+    stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+
+    remote_ms = sum(entry['wallMs'] for entry in remote_calls.values())
+    return {
+        'stage': stage,
+        'requestId': request_id,
+        'profiledAt': datetime.now(timezone.utc).isoformat(),
+        'wallMs': round(wall_ms, 1),
+        'cpuMs': round(cpu_ms, 1),
+        'remoteWaitMs': round(remote_ms, 1),
+        'otherWaitMs': round(max(0.0, wall_ms - cpu_ms - remote_ms), 1),
+        'remoteCalls': {
+            key: {'count': entry['count'], 'wallMs': round(entry['wallMs'], 1), 'streamMs': round(entry['streamMs'], 1)}
+            for key, entry in remote_calls.items()
+        },
+        'memory': {
+            'peakBytes': peak_bytes,
+            'topAllocations': [
+                {
+                    'site': str(stat.traceback[0]),
+                    'sizeBytes': stat.size,
+                    'count': stat.count
+                }
+                for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]
+            ]
+        },
+        'topFunctions': stats_output.getvalue()
+    }
+
+def upload_profile(bucket, stage, request_id, summary, profiler):
+    """
+    Envia summary.json e o .pstats (abrível com pstats/snakeviz) para o S3.
+    """
+    prefix = f"{PROFILE_PREFIX}/{request_id}/{stage}/{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}"
+    # Após um DeadlineExceeded só resta a margem de segurança: usa o cliente de timeouts curtos
+    deadline = get_current_deadline()
+    s3_client = margin_client() if deadline and deadline.expired() else client_for('s3', 's3')
+
+    with tempfile.NamedTemporaryFile(suffix='.pstats') as stats_file:
+        profiler.dump_stats(stats_file.name)
+        stats_file.seek(0)
+        s3_client.put_object(Bucket=bucket, Key=f"{prefix}/profile.pstats", Body=stats_file.read(), ContentType='application/octet-stream')
+
+    s3_client.put_object(Bucket=bucket, Key=f"{prefix}/summary.json", Body=json.dumps(summary, indent=2), ContentType='application/json')
+    logger.info(f"Perfil salvo em s3://{bucket}/{prefix}/")
+    return {'bucket': bucket, 'summaryKey': f"{prefix}/summary.json", 'pstatsKey': f"{prefix}/profile.pstats"}
+
+def _save_profile(stage, bucket, event, request_id, response, error, wall_ms, cpu_ms, remote_calls, profiler, snapshot, peak_bytes):
+    # Falhas ao salvar o perfil nunca mudam o resultado da invocação
+    target_bucket = bucket.get(event.get('language', '').lower()) if isinstance(bucket, dict) else bucket
+    try:
+        summary = build_profile_summary(stage, request_id, wall_ms, cpu_ms, remote_calls, profiler, snapshot, peak_bytes)
+        if error is not None:
+            summary['error'] = type(error).__name__
+        logger.info(
+            f"Perfil {stage}: parede {summary['wallMs']}ms, CPU {summary['cpuMs']}ms, "
+            f"espera remota {summary['remoteWaitMs']}ms, pico {peak_bytes} bytes"
+        )
+        if target_bucket:
+            artifacts = upload_profile(target_bucket, stage, request_id, summary, profiler)
+            if isinstance(response, dict) and isinstance(response.get('body'), dict):
+                response['body']['profile'] = artifacts
+    except Exception as e:
+        logger.error(f"Erro ao salvar perfil: {str(e)}")
+
+def profiled_handler(stage, bucket):
+    """
+    Decorador de lambda_handler: com o perfil desligado apenas repassa a chamada.
+
+    `bucket` é o nome do bucket ou um dict {linguagem: bucket} resolvido pelo evento.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            if not is_profiling_enabled(event):
+                return handler(event, context)
+
+            request_id = event.get('requestId', 'unknown') if isinstance(event, dict) else 'unknown'
+            logger.info(f"Perfil ativado para {stage} ({request_id})")
+
+            profiler = cProfile.Profile()
+            response, error = None, None
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            wall_started = time.perf_counter()
+            cpu_started = time.process_time()
+            remote_timer = _RemoteCallTimer()
+            try:
+                with remote_timer:
+                    profiler.enable()
+                    try:
+                        response = handler(event, context)
+                    finally:
+                        profiler.disable()
+            except Exception as e:
+                # DeadlineExceeded/StageInProgressError saem da Lambda de propósito;
+                # o perfil dessas invocações (as lentas) é salvo antes de propagar
+                error = e
+                raise
+            finally:
+                wall_ms = (time.perf_counter() - wall_started) * 1000
+                cpu_ms = (time.process_time() - cpu_started) * 1000
+                snapshot = tracemalloc.take_snapshot()
+                peak_bytes = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                _save_profile(stage, bucket, event, request_id, response, error,
+                              wall_ms, cpu_ms, remote_timer.calls, profiler, snapshot, peak_bytes)
+
+            return response
+        return wrapper
+    return decorator
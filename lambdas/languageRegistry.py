@@ -0,0 +1,34 @@
+import generateJavaCode
+import generatePythonCode
+
+# Constantes
+LANGUAGE_SPEC_FIELDS = ['display_name', 'bucket', 'stage', 'build_prompt', 'postprocess', 'describe_artifact', 'validate']
+
+# Registro de linguagens: um único handler (e um único pool de containers quentes) para todas.
+# Fica fora de generateCode para que extractHistory e generateBddTest validem a
+# linguagem sem carregar o motor de geração.
+LANGUAGES = {}
+LANGUAGE_BUCKETS = {}
+
+def register_language(language, spec):
+    """
+    Registra uma linguagem no motor de geração.
+
+    `spec` traz display_name, bucket, stage (nome da etapa de idempotência),
+    build_prompt(contexto), postprocess(código), describe_artifact(request_id, código)
+    -> {'key', 'metadata', 'fields'} e validate(código) -> lista de problemas.
+    """
+    missing = [field for field in LANGUAGE_SPEC_FIELDS if field not in spec]
+    if missing:
+        raise ValueError(f"Linguagem {language} sem: {', '.join(missing)}")
+    LANGUAGES[language] = spec
+    LANGUAGE_BUCKETS[language] = spec['bucket']
+
+def get_language(language):
+    """
+    Especificação registrada da linguagem (None se não suportada).
+    """
+    return LANGUAGES.get((language or '').lower())
+
+register_language('python', generatePythonCode.LANGUAGE_SPEC)
+register_language('java', generateJavaCode.LANGUAGE_SPEC)
@@ -0,0 +1,290 @@
+import argparse
+import ast
+import json
+import logging
+import os
+import re
+import statistics
+import time
+import boto3
+from datetime import datetime, timezone
+from extractHistory import build_standardization_prompt, build_context_for_generation, clean_text
+from generateJavaCode import build_java_prompt
+from generatePythonCode import build_python_prompt
+from generateBddTest import build_bdd_prompt
+
+# Configuração de logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Constantes
+MODELS_FILE = os.path.join(os.path.dirname(__file__), '..', 'backend', 'bedrock', 'models.txt')
+# Gravações e histórico ficam fora de lambdas/ (diretório empacotado no deploy)
+BENCHMARK_DIR = os.path.join(os.path.dirname(__file__), '..', 'backend', 'bedrock', 'benchmark')
+RECORDINGS_FILE = os.path.join(BENCHMARK_DIR, 'recordings.json')
+HISTORY_FILE = os.path.join(BENCHMARK_DIR, 'history.jsonl')
+TASKS = ['standardization', 'python', 'java', 'bdd']
+
+# Limites de saída por tarefa (mesmos valores das Lambdas)
+TASK_MAX_TOKENS = {
+    'standardization': 2000,
+    'python': 8000,
+    'java': 8000,
+    'bdd': 6000
+}
+
+# Preço em USD por 1K tokens (entrada, saída) - tabela pública on-demand us-east-1
+MODEL_PRICING = {
+    'anthropic.claude-3-5-haiku-20241022-v1:0': (0.0008, 0.004),
+    'anthropic.claude-3-5-sonnet-20240620-v1:0': (0.003, 0.015),
+    'anthropic.claude-3-5-sonnet-20241022-v2:0': (0.003, 0.015),
+    'anthropic.claude-sonnet-4-20250514-v1:0': (0.003, 0.015),
+    'amazon.nova-micro-v1:0': (0.000035, 0.00014),
+    'amazon.nova-lite-v1:0': (0.00006, 0.00024),
+    'amazon.nova-pro-v1:0': (0.0008, 0.0032),
+    'amazon.nova-premier-v1:0': (0.0025, 0.0125)
+}
+
+# Corpus fixo de histórias de usuário
+BENCHMARK_STORIES = [
+    {
+        'id': 'login',
+        'text': (
+            "Como usuário cadastrado, eu quero fazer login com e-mail e senha "
+            "para acessar minha conta. A senha deve ter no mínimo 8 caracteres e, "
+            "após 3 tentativas inválidas, a conta deve ser bloqueada por 15 minutos."
+        )
+    },
+    {
+        'id': 'carrinho',
+        'text': (
+            "Como cliente da loja online eu quero adicionar e remover produtos do carrinho, "
+            "ver o valor total com desconto aplicado e finalizar a compra. Cupons de desconto "
+            "expiram e não podem ser combinados. Produtos sem estoque não podem ser adicionados."
+        )
+    },
+    {
+        'id': 'agendamento',
+        'text': (
+            "precisamos de um sistema de agendamento de consultas: paciente escolhe médico, "
+            "data e horário livre; não pode marcar no passado nem dois horários iguais; "
+            "cancelamento até 24h antes sem multa, depois disso cobra 50% da consulta"
+        )
+    }
+]
+
+def load_models(path=MODELS_FILE):
+    """
+    Lê a lista de modelos candidatos de backend/bedrock/models.txt.
+    """
+    with open(path, encoding='utf-8') as models_file:
+        return [line.strip() for line in models_file if line.strip()]
+
+def build_task_prompt(task, story, generated_code=None):
+    """
+    Constrói o prompt de uma tarefa reutilizando os builders das Lambdas.
+    """
+    cleaned = clean_text(story)
+    if task == 'standardization':
+        return build_standardization_prompt(cleaned)
+    if task == 'python':
+        return build_python_prompt(build_context_for_generation(cleaned, 'python'))
+    if task == 'java':
+        return build_java_prompt(build_context_for_generation(cleaned, 'java'))
+    if task == 'bdd':
+        return build_bdd_prompt(generated_code or '', 'python')
+    raise ValueError(f"Tarefa desconhecida: {task}")
+
+def invoke_live(model_id, prompt, max_tokens):
+    """
+    Chama o modelo via Converse API (formato único para Nova e Claude).
+    """
+    bedrock_client = boto3.client('bedrock-runtime')
+    started = time.perf_counter()
+    response = bedrock_client.converse(
+        modelId=model_id,
+        messages=[{'role': 'user', 'content': [{'text': prompt}]}],
+        inferenceConfig={'maxTokens': max_tokens, 'temperature': 0.1, 'topP': 0.9}
+    )
+    latency_ms = (time.perf_counter() - started) * 1000
+    return {
+        'text': response['output']['message']['content'][0]['text'].strip(),
+        'inputTokens': response['usage']['inputTokens'],
+        'outputTokens': response['usage']['outputTokens'],
+        'latencyMs': latency_ms,
+        'stopReason': response.get('stopReason', '')
+    }
+
+def score_quality(task, text):
+    """
+    Sinais automáticos de qualidade por tarefa.
+    """
+    stripped = re.sub(r'^```\w*\n|\n```\s*$', '', text.strip())
+    if task == 'standardization':
+        return {'parseOk': bool(stripped), 'wordCount': len(stripped.split())}
+    if task == 'python':
+        try:
+            tree = ast.parse(stripped)
+            classes = [node.name for node in ast.walk(tree) if isinstance(node, ast.ClassDef)]
+            return {'parseOk': True, 'classCount': len(classes)}
+        except SyntaxError:
+            return {'parseOk': False, 'classCount': 0}
+    if task == 'java':
+        classes = re.findall(r'\b(?:class|interface|enum|record)\s+([A-Z]\w*)', stripped)
+        balanced = stripped.count('{') == stripped.count('}') and '{' in stripped
+        return {'parseOk': balanced, 'classCount': len(classes)}
+    if task == 'bdd':
+        scenarios = len(re.findall(r'^\s*(?:Scenario|Cenário|Scenario Outline|Esquema do Cenário):', stripped, re.MULTILINE))
+        has_feature = re.search(r'^\s*(?:Feature|Funcionalidade):', stripped, re.MULTILINE) is not None
+        return {'parseOk': has_feature and scenarios > 0, 'scenarioCount': scenarios}
+    return {'parseOk': False}
+
+def estimate_cost(model_id, input_tokens, output_tokens):
+    """
+    Custo estimado em USD a partir da tabela MODEL_PRICING.
+    """
+    input_price, output_price = MODEL_PRICING.get(model_id, (0.0, 0.0))
+    return input_tokens / 1000 * input_price + output_tokens / 1000 * output_price
+
+def run_benchmark(models, stories=None, live=False, recordings=None, record=False):
+    """
+    Executa o corpus nas tarefas para cada modelo.
+
+    Offline (live=False) reproduz respostas gravadas em `recordings`; no modo live
+    chama o Bedrock e, com record=True, grava as respostas para reuso offline.
+    """
+    stories = stories or BENCHMARK_STORIES
+    recordings = recordings if recordings is not None else {}
+    samples = []
+
+    for model_id in models:
+        for story in stories:
+            python_code = None
+            for task in TASKS:
+                recording_key = f"{model_id}|{task}|{story['id']}"
+                prompt = build_task_prompt(task, story['text'], python_code)
+
+                if live:
+                    try:
+                        result = invoke_live(model_id, prompt, TASK_MAX_TOKENS[task])
+                    except Exception as e:
+                        logger.error(f"Falha em {recording_key}: {str(e)}")
+                        samples.append({'model': model_id, 'task': task, 'story': story['id'], 'error': str(e)})
+                        continue
+                    if record:
+                        recordings[recording_key] = result
+                else:
+                    result = recordings.get(recording_key)
+                    if result is None:
+                        logger.info(f"Sem gravação para {recording_key}, ignorando")
+                        continue
+
+                if task == 'python':
+                    python_code = result['text']
+
+                latency_s = max(result['latencyMs'], 1) / 1000
+                samples.append({
+                    'model': model_id,
+                    'task': task,
+                    'story': story['id'],
+                    'latencyMs': result['latencyMs'],
+                    'inputTokens': result['inputTokens'],
+                    'outputTokens': result['outputTokens'],
+                    'tokensPerSecond': result['outputTokens'] / latency_s,
+                    'costUsd': estimate_cost(model_id, result['inputTokens'], result['outputTokens']),
+                    'truncated': result.get('stopReason') == 'max_tokens',
+                    'quality': score_quality(task, result['text'])
+                })
+
+    return samples
+
+def summarize(samples):
+    """
+    Agrega as amostras por (modelo, tarefa).
+    """
+    groups = {}
+    for sample in samples:
+        groups.setdefault((sample['model'], sample['task']), []).append(sample)
+
+    rows = []
+    for (model_id, task), group in sorted(groups.items()):
+        ok = [sample for sample in group if 'error' not in sample]
+        row = {'model': model_id, 'task': task, 'runs': len(group), 'errors': len(group) - len(ok)}
+        if ok:
+            latencies = sorted(sample['latencyMs'] for sample in ok)
+            row.update({
+                'p50LatencyMs': statistics.median(latencies),
+                'maxLatencyMs': latencies[-1],
+                'tokensPerSecond': statistics.mean(sample['tokensPerSecond'] for sample in ok),
+                'outputTokens': statistics.mean(sample['outputTokens'] for sample in ok),
+                'costUsd': sum(sample['costUsd'] for sample in ok),
+                'parseRate': sum(1 for sample in ok if sample['quality']['parseOk']) / len(ok),
+                'truncationRate': sum(1 for sample in ok if sample['truncated']) / len(ok),
+                'classCount': statistics.mean(sample['quality'].get('classCount', 0) for sample in ok),
+                'scenarioCount': statistics.mean(sample['quality'].get('scenarioCount', 0) for sample in ok)
+            })
+        rows.append(row)
+    return rows
+
+def format_table(rows):
+    """
+    Formata o resumo como tabela markdown.
+    """
+    header = '| modelo | tarefa | runs | p50 ms | tok/s | tokens saída | custo USD | parse | trunc | classes | cenários |'
+    lines = [header, '|' + '---|' * 11]
+    for row in rows:
+        if 'p50LatencyMs' not in row:
+            lines.append(f"| {row['model']} | {row['task']} | {row['runs']} | erro ({row['errors']}) | | | | | | | |")
+            continue
+        lines.append(
+            f"| {row['model']} | {row['task']} | {row['runs']} | {row['p50LatencyMs']:.0f} | "
+            f"{row['tokensPerSecond']:.1f} | {row['outputTokens']:.0f} | {row['costUsd']:.4f} | "
+            f"{row['parseRate']:.0%} | {row['truncationRate']:.0%} | {row['classCount']:.1f} | {row['scenarioCount']:.1f} |"
+        )
+    return '\n'.join(lines)
+
+def append_history(rows, live, path=HISTORY_FILE):
+    """
+    Acrescenta o resumo ao histórico (JSONL) para acompanhamento ao longo do tempo.
+    """
+    with open(path, 'a', encoding='utf-8') as history_file:
+        history_file.write(json.dumps({
+            'runAt': datetime.now(timezone.utc).isoformat(),
+            'mode': 'live' if live else 'offline',
+            'rows': rows
+        }) + '\n')
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de modelos Bedrock para as tarefas do pipeline')
+    parser.add_argument('--live', action='store_true', help='Chama o Bedrock em vez de usar respostas gravadas')
+    parser.add_argument('--record', action='store_true', help='No modo live, grava as respostas em --recordings')
+    parser.add_argument('--models', nargs='*', help='Subconjunto de modelos (padrão: models.txt)')
+    parser.add_argument('--recordings', default=RECORDINGS_FILE)
+    parser.add_argument('--history', default=HISTORY_FILE)
+    args = parser.parse_args()
+
+    recordings = {}
+    if os.path.exists(args.recordings):
+        with open(args.recordings, encoding='utf-8') as recordings_file:
+            recordings = json.load(recordings_file)
+
+    samples = run_benchmark(
+        args.models or load_models(), live=args.live, recordings=recordings, record=args.record
+    )
+    if not samples:
+        # Sem amostras não há o que resumir nem acrescentar ao histórico
+        print(f"Nenhuma amostra: sem gravações em {args.recordings} para os modelos selecionados")
+        return
+
+    rows = summarize(samples)
+    print(format_table(rows))
+
+    if args.live:
+        # Só medições reais entram no histórico; replays offline não são novas amostras
+        if args.record:
+            with open(args.recordings, 'w', encoding='utf-8') as recordings_file:
+                json.dump(recordings, recordings_file, ensure_ascii=False, indent=2)
+        append_history(rows, args.live, args.history)
+
+if __name__ == '__main__':
+    main()
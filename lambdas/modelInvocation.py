@@ -0,0 +1,151 @@
+import json
+import logging
+from bedrockScheduler import bedrock_slot, get_scheduler_store, LANE_INTERACTIVE, DEFAULT_TENANT
+from outputEnvelope import envelope_messages, fused_envelope_messages, extract_artifact, STOP_SEQUENCES, FUSED_STOP_SEQUENCES
+from tokenBudget import run_with_budget, get_token_stats_store
+from deadlines import DeadlineExceeded, client_for, get_current_deadline
+
+# Configuração de logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Constantes
+MODEL_ID = 'amazon.nova-pro-v1:0'
+
+def build_model_request(messages, max_tokens, temperature, stop_sequences=None):
+    """
+    Corpo de invoke_model no schema nativo do Nova (mesmo formato das linhas de batch).
+
+    `messages` usa conteúdo em texto simples ({'role', 'content': str}); os
+    parâmetros de geração, incluindo as stop sequences, vão em inferenceConfig.
+    """
+    inference_config = {'maxTokens': max_tokens, 'temperature': temperature, 'topP': 0.9}
+    if stop_sequences:
+        inference_config['stopSequences'] = stop_sequences
+    return {
+        'messages': [
+            {'role': message['role'], 'content': [{'text': message['content']}]}
+            for message in messages
+        ],
+        'inferenceConfig': inference_config
+    }
+
+def prepare_model_clients():
+    """
+    Cria no thread principal o cliente do Bedrock e os stores usados por invoke_model_text.
+
+    Chamada antes de disparar chamadas em um ThreadPoolExecutor, para que as
+    threads de trabalho só reutilizem clientes já criados.
+    """
+    client_for('bedrock-runtime', 'bedrock')
+    get_scheduler_store()
+    get_token_stats_store()
+
+class GenerationCancelled(Exception):
+    """
+    A geração foi interrompida pelo chamador (cancel_event) e o stream foi fechado.
+    """
+
+def _stream_model_text(bedrock_client, request, deadline=None, model_id=MODEL_ID, cancel_event=None):
+    # Lê a resposta em streaming: mantém o texto parcial se o prazo acabar e
+    # permite interromper a geração fechando o stream
+    parts = []
+    stop_reason = ''
+    output_tokens = 0
+    response = None
+    try:
+        response = bedrock_client.invoke_model_with_response_stream(
+            modelId=model_id,
+            body=json.dumps(request)
+        )
+        for event in response['body']:
+            chunk = json.loads(event['chunk']['bytes'])
+            if 'contentBlockDelta' in chunk:
+                parts.append(chunk['contentBlockDelta']['delta'].get('text', ''))
+            elif 'messageStop' in chunk:
+                stop_reason = chunk['messageStop'].get('stopReason', '')
+            elif 'metadata' in chunk:
+                output_tokens = chunk['metadata'].get('usage', {}).get('outputTokens', 0)
+            if cancel_event is not None and cancel_event.is_set():
+                raise GenerationCancelled(f"Geração cancelada após {len(parts)} trechos")
+            if deadline and deadline.expired():
+                raise DeadlineExceeded("Prazo esgotado durante a geração", ''.join(parts))
+    except (DeadlineExceeded, GenerationCancelled):
+        raise
+    except Exception as e:
+        # Timeout de leitura derivado do prazo: preserva o que já chegou
+        if deadline and deadline.expired():
+            raise DeadlineExceeded(f"Prazo esgotado durante a geração: {str(e)}", ''.join(parts)) from e
+        raise
+    finally:
+        # Fechar a conexão encerra a geração no Bedrock se ela ainda estiver em andamento
+        if response is not None:
+            response['body'].close()
+    return ''.join(parts), stop_reason, output_tokens
+
+def invoke_model_text(prompt, max_tokens, temperature=0.1, lane=LANE_INTERACTIVE, tenant=DEFAULT_TENANT, artifact=None, task=None, resume_from='', fused=False, extract=True, model_id=MODEL_ID, cancel_event=None):
+    """
+    Chama o Nova (Pro, ou `model_id`) e retorna (texto, stopReason, tokens de saída).
+
+    Com `artifact` (java, python ou gherkin) a resposta vem no envelope
+    <artifact>, a geração para na stop sequence e o texto volta já extraído.
+    Com `task`, `max_tokens` passa a ser o teto e cada chamada reserva apenas
+    o orçamento adaptativo da tarefa (tokenBudget), repetindo se truncar.
+    Dentro de uma invocação com prazo a resposta é lida em streaming e, se o
+    prazo acabar, DeadlineExceeded traz o texto parcial (incluindo `resume_from`,
+    o trecho de uma tentativa anterior que esta chamada continua).
+    Com `fused` a resposta traz o código de `artifact` e o .feature em seções
+    delimitadas; o texto volta bruto, para outputEnvelope.split_fused_artifacts.
+    `extract=False` devolve o texto do envelope sem extração (benchmarks).
+    Com `cancel_event` (threading.Event) a resposta também é lida em streaming;
+    quando o evento é sinalizado o stream é fechado e GenerationCancelled é
+    lançada, sem registrar tokens de saída no tokenBudget.
+    """
+    if task:
+        return run_with_budget(
+            task, prompt, max_tokens,
+            lambda budget: invoke_model_text(prompt, budget, temperature, lane, tenant, artifact, resume_from=resume_from, fused=fused, extract=extract, model_id=model_id, cancel_event=cancel_event)
+        )
+
+    resume_from = resume_from.rstrip() if artifact and not fused else ''
+    if fused:
+        messages = fused_envelope_messages(prompt)
+    elif artifact:
+        messages = envelope_messages(prompt, resume_from)
+    else:
+        messages = [
+            {
+                'role': 'user',
+                'content': prompt
+            }
+        ]
+    stop_sequences = None
+    if artifact:
+        stop_sequences = FUSED_STOP_SEQUENCES if fused else STOP_SEQUENCES
+    request = build_model_request(messages, max_tokens, temperature, stop_sequences)
+
+    deadline = get_current_deadline()
+    bedrock_client = client_for('bedrock-runtime', 'bedrock')
+    with bedrock_slot(lane, tenant, tokens=len(prompt) // 4 + max_tokens):
+        if cancel_event is not None and cancel_event.is_set():
+            raise GenerationCancelled("Geração cancelada antes da chamada")
+        if deadline or cancel_event is not None:
+            try:
+                text, stop_reason, output_tokens = _stream_model_text(bedrock_client, request, deadline, model_id, cancel_event)
+            except DeadlineExceeded as e:
+                e.partial = resume_from + e.partial
+                raise
+        else:
+            response = bedrock_client.invoke_model(
+                modelId=model_id,
+                body=json.dumps(request)
+            )
+            response_body = json.loads(response['body'].read())
+            text = response_body['output']['message']['content'][0]['text']
+            stop_reason = response_body.get('stopReason', '')
+            output_tokens = response_body.get('usage', {}).get('outputTokens', 0)
+
+    text = (resume_from + text).strip()
+    if artifact and extract and not fused:
+        text = extract_artifact(text, artifact)
+    return text, stop_reason, output_tokens
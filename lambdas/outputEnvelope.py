@@ -0,0 +1,228 @@
+import ast
+import logging
+import re
+import statistics
+import time
+
+# Configuração de logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Constantes
+ARTIFACT_OPEN = '<artifact>'
+ARTIFACT_CLOSE = '</artifact>'
+STOP_SEQUENCES = [ARTIFACT_CLOSE]
+ENVELOPE_INSTRUCTIONS = f"""
+FORMATO DA RESPOSTA (obrigatório):
+- Escreva o artefato completo entre {ARTIFACT_OPEN} e {ARTIFACT_CLOSE}
+- Nada antes de {ARTIFACT_OPEN} e nada depois de {ARTIFACT_CLOSE}: sem explicações, resumos ou markdown
+"""
+
+# Resposta combinada (código + .feature): o código fecha em </artifact> e os testes seguem em <feature>
+FEATURE_OPEN = '<feature>'
+FEATURE_CLOSE = '</feature>'
+FUSED_STOP_SEQUENCES = [FEATURE_CLOSE]
+FUSED_INSTRUCTIONS = f"""
+FORMATO DA RESPOSTA (obrigatório, substitui instruções anteriores de formato):
+- Primeiro o código completo entre {ARTIFACT_OPEN} e {ARTIFACT_CLOSE}
+- Em seguida os testes BDD (Gherkin) desse código entre {FEATURE_OPEN} e {FEATURE_CLOSE}
+- Nada fora das duas seções: sem explicações, resumos ou markdown
+"""
+
+LANGUAGE_ALIASES = {
+    'java': 'java',
+    'python': 'python',
+    'py': 'python',
+    'gherkin': 'gherkin',
+    'feature': 'gherkin',
+    'bdd': 'gherkin'
+}
+FENCED_BLOCK = re.compile(r'```[ \t]*([\w+-]*)[^\n]*\n(.*?)(?:\n[ \t]*```|\Z)', re.DOTALL)
+CODE_START = {
+    'java': re.compile(r'^\s*(package\s|import\s|public\s|protected\s|private\s|final\s|abstract\s|sealed\s|class\s|interface\s|enum\s|record\s|@\w|/\*|//)'),
+    'python': re.compile(r'^\s*(import\s|from\s+\S+\s+import\s|def\s|async\s+def\s|class\s|@\w|#|"""|\'\'\'|if\s+__name__|[A-Za-z_][\w.]*\s*(:[^=]+)?=)'),
+    'gherkin': re.compile(r'^\s*(#|@\w|Feature:|Funcionalidade:|Característica:)')
+}
+GHERKIN_LINE = re.compile(
+    r'^\s*(#|@|\||"""|```|(Feature|Funcionalidade|Característica|Rule|Regra|Background|Contexto|Cenário de Fundo|'
+    r'Scenario Outline|Scenario Template|Esquema do Cenário|Scenario|Cenário|Example|Exemplo|Examples|Exemplos):|'
+    r'(Given|When|Then|And|But|Dado|Dada|Dados|Dadas|Quando|Então|Entao|E|Mas|\*)\s)'
+)
+
+def envelope_messages(prompt, resume_from=''):
+    """
+    Mensagens com as instruções do envelope e a resposta já iniciada em <artifact>.
+
+    Com o prefixo do assistente o modelo começa dentro do envelope, e a stop
+    sequence </artifact> encerra a geração assim que o artefato termina.
+    `resume_from` continua um artefato interrompido a partir do texto parcial.
+    """
+    return [
+        {
+            'role': 'user',
+            'content': prompt + ENVELOPE_INSTRUCTIONS
+        },
+        {
+            'role': 'assistant',
+            'content': f"{ARTIFACT_OPEN}\n{resume_from}".rstrip()
+        }
+    ]
+
+def fused_envelope_messages(prompt):
+    """
+    Mensagens da resposta combinada, com a resposta já iniciada em <artifact>.
+
+    A stop sequence </feature> encerra a geração ao fim dos testes; </artifact>
+    não é stop sequence aqui, apenas separa o código do .feature.
+    """
+    return [
+        {
+            'role': 'user',
+            'content': prompt + FUSED_INSTRUCTIONS
+        },
+        {
+            'role': 'assistant',
+            'content': ARTIFACT_OPEN
+        }
+    ]
+
+def split_fused_artifacts(text, language):
+    """
+    Separa a resposta combinada em (código, .feature), já extraídos.
+
+    O .feature volta vazio se a resposta não chegou à seção <feature>
+    (ex.: truncada em max_tokens).
+    """
+    head, _, tail = (text or '').partition(FEATURE_OPEN)
+    code_part = head.split(ARTIFACT_CLOSE, 1)[0]
+    feature_part = tail.split(FEATURE_CLOSE, 1)[0]
+    generated_bdd = extract_artifact(feature_part, 'gherkin') if feature_part.strip() else ''
+    return extract_artifact(code_part, language), generated_bdd
+
+def _unwrap_fences(text, language):
+    # Usa o maior bloco cercado (preferindo os marcados com a linguagem)
+    blocks = FENCED_BLOCK.findall(text)
+    if not blocks:
+        return text
+    tagged = [body for tag, body in blocks if LANGUAGE_ALIASES.get(tag.lower()) == language]
+    return max(tagged or [body for _, body in blocks], key=len)
+
+def _drop_leading_prose(lines, language):
+    for index, line in enumerate(lines):
+        if CODE_START[language].match(line):
+            return lines[index:]
+    return lines
+
+def _parses(code):
+    try:
+        ast.parse(code)
+    except SyntaxError:
+        return False
+    return True
+
+def _is_python_prose(block):
+    # Parágrafo sem recuo que não começa como código nem compila sozinho
+    first_line = block.lstrip('\n').split('\n', 1)[0]
+    if not first_line.strip() or first_line[0] in ' \t':
+        return False
+    return not CODE_START['python'].match(first_line) and not _parses(block.strip())
+
+def _drop_trailing_prose(text, language):
+    if language == 'java':
+        # Depois da última chave só pode sobrar código, nunca texto corrido
+        last_brace = text.rfind('}')
+        tail = text[last_brace + 1:]
+        if last_brace >= 0 and tail.strip() and not re.search(r'[;{}]', tail):
+            return text[:last_brace + 1]
+        return text
+    if language == 'python':
+        # Remove só parágrafos finais de texto corrido; código nunca é descartado.
+        # Se o que sobra ainda não compila, o texto volta inteiro para a validação apontar
+        if _parses(text):
+            return text
+        blocks = re.split(r'(\n[ \t]*\n)', text)
+        end = len(blocks)
+        while end > 1 and _is_python_prose(blocks[end - 1]):
+            end -= 2
+        candidate = ''.join(blocks[:end]).rstrip()
+        if end < len(blocks) and _parses(candidate):
+            return candidate
+        return text
+    lines = text.split('\n')
+    last_gherkin = max((index for index, line in enumerate(lines) if GHERKIN_LINE.match(line)), default=len(lines) - 1)
+    return '\n'.join(lines[:last_gherkin + 1])
+
+def extract_artifact(text, language):
+    """
+    Extrai o artefato de uma resposta com envelope, cercas markdown ou texto ao redor.
+
+    `language` é java, python ou gherkin (aliases: py, feature, bdd). Código já limpo
+    volta inalterado, então a extração pode ser aplicada mais de uma vez.
+    """
+    language = LANGUAGE_ALIASES.get((language or '').lower(), language)
+    text = (text or '').strip()
+
+    if ARTIFACT_OPEN in text:
+        text = text.split(ARTIFACT_OPEN, 1)[1]
+    text = text.split(ARTIFACT_CLOSE, 1)[0].strip()
+
+    if language not in CODE_START:
+        return text
+
+    first_line = text.split('\n', 1)[0]
+    if text.startswith('```') or not CODE_START[language].match(first_line):
+        text = _unwrap_fences(text, language).strip()
+
+    text = '\n'.join(_drop_leading_prose(text.split('\n'), language))
+    return _drop_trailing_prose(text, language).strip()
+
+def benchmark_output_enforcement(samples, invoke, max_tokens=8000):
+    """
+    Compara a chamada sem envelope com envelope + stop sequence em um corpus de prompts.
+
+    `samples` é uma lista de (prompt, linguagem) e `invoke` é invoke_model_text.
+    Mede tokens de saída, tempo e quanto texto sobrava em volta do artefato
+    (no envelope, o texto antes da stop sequence que a extração ainda remove).
+    """
+    rows = {'plain': [], 'envelope': []}
+    for prompt, language in samples:
+        started = time.perf_counter()
+        raw_text, _, output_tokens = invoke(prompt, max_tokens)
+        rows['plain'].append({
+            'ms': (time.perf_counter() - started) * 1000,
+            'outputTokens': output_tokens,
+            'wrappedChars': len(raw_text) - len(extract_artifact(raw_text, language))
+        })
+
+        started = time.perf_counter()
+        envelope_text, _, output_tokens = invoke(prompt, max_tokens, artifact=language, extract=False)
+        rows['envelope'].append({
+            'ms': (time.perf_counter() - started) * 1000,
+            'outputTokens': output_tokens,
+            'wrappedChars': len(envelope_text) - len(extract_artifact(envelope_text, language))
+        })
+
+    summary = {
+        mode: {
+            'p50Ms': round(statistics.median(row['ms'] for row in samples_rows)),
+            'meanOutputTokens': round(statistics.mean(row['outputTokens'] for row in samples_rows)),
+            'meanWrappedChars': round(statistics.mean(row['wrappedChars'] for row in samples_rows))
+        }
+        for mode, samples_rows in rows.items()
+    }
+    summary['outputTokenReduction'] = round(1 - summary['envelope']['meanOutputTokens'] / max(1, summary['plain']['meanOutputTokens']), 3)
+    summary['p50TimeReduction'] = round(1 - summary['envelope']['p50Ms'] / max(1, summary['plain']['p50Ms']), 3)
+    return summary
+
+if __name__ == '__main__':
+    from modelInvocation import invoke_model_text
+    from extractHistory import build_context_for_generation
+    from languageRegistry import get_language
+    from modelBenchmark import BENCHMARK_STORIES
+
+    corpus = [
+        (get_language(language)['build_prompt'](build_context_for_generation(story['text'], language)), language)
+        for story in BENCHMARK_STORIES
+        for language in ('java', 'python')
+    ]
+    print(benchmark_output_enforcement(corpus, invoke_model_text))
@@ -0,0 +1,151 @@
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from languageRegistry import get_language
+from modelInvocation import prepare_model_clients, GenerationCancelled
+from deadlines import DeadlineExceeded
+from bedrockScheduler import LANE_INTERACTIVE, DEFAULT_TENANT
+
+# Configuração de logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Constantes
+SPECULATION_DIFF_THRESHOLD = 0.3
+MIN_WORD_LENGTH = 3
+
+# Métricas acumuladas no container (reutilizadas entre invocações quentes)
+SPECULATION_METRICS = {
+    'attempts': 0,
+    'hits': 0,
+    'savedMs': 0.0
+}
+
+def story_difference(original, standardized):
+    """
+    Diferença de conteúdo entre duas histórias (0 = mesmas palavras, 1 = nada em comum).
+
+    Usa distância de Jaccard sobre o vocabulário, insensível à reordenação
+    que a padronização costuma fazer.
+    """
+    def vocabulary(text):
+        return {word for word in re.findall(r'\w+', text.lower()) if len(word) >= MIN_WORD_LENGTH}
+
+    original_words = vocabulary(original)
+    standardized_words = vocabulary(standardized)
+    union = original_words | standardized_words
+    if not union:
+        return 0.0
+    return 1 - len(original_words & standardized_words) / len(union)
+
+def _timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+def generate_code_for_context(context_for_generation, language, lane=LANE_INTERACTIVE, tenant=DEFAULT_TENANT, cancel_event=None):
+    """
+    Gera código para um contexto com o prompt da linguagem registrada no motor.
+    """
+    # Carregado só no caminho especulativo: extractHistory não importa o motor de geração
+    from generateCode import generate_code_with_llm
+
+    spec = get_language(language)
+    return generate_code_with_llm(spec['build_prompt'](context_for_generation), language, lane, tenant, cancel_event=cancel_event)
+
+def run_speculative_generation(cleaned_text, language, standardize, build_context, threshold=SPECULATION_DIFF_THRESHOLD, lane=LANE_INTERACTIVE, tenant=DEFAULT_TENANT):
+    """
+    Padroniza a história e, em paralelo, gera código especulativo a partir do texto limpo.
+
+    Se a história padronizada diferir do original abaixo de `threshold`, o código
+    especulativo é mantido; caso contrário a chamada especulativa é interrompida
+    (stream fechado, vaga do agendador liberada) e o código é regenerado a partir
+    do contexto padronizado. `standardize(texto, lane, tenant)` padroniza a história.
+    """
+    logger.info(f"Iniciando geração especulativa ({language})")
+    started = time.perf_counter()
+
+    # Clientes criados aqui, no thread principal; as threads só os reutilizam
+    prepare_model_clients()
+    executor = ThreadPoolExecutor(max_workers=1)
+    cancel_event = threading.Event()
+    try:
+        speculative_context = build_context(cleaned_text, language)
+        speculation = executor.submit(_timed, generate_code_for_context, speculative_context, language, lane, tenant, cancel_event)
+        standardized_story, standardization_ms = _timed(standardize, cleaned_text, lane, tenant)
+
+        difference = story_difference(cleaned_text, standardized_story)
+        context_for_generation = build_context(standardized_story, language)
+        hit = difference <= threshold
+
+        if hit:
+            try:
+                generated_code, generation_ms = speculation.result()
+            except DeadlineExceeded:
+                # Sem tempo para regenerar
+                raise
+            except Exception as e:
+                logger.error(f"Especulação falhou, regenerando: {str(e)}")
+                hit = False
+        else:
+            logger.info(f"Especulação descartada: diferença {difference:.2f} > {threshold:.2f}")
+            cancel_speculation(speculation, cancel_event)
+
+        if not hit:
+            generated_code, generation_ms = _timed(generate_code_for_context, context_for_generation, language, lane, tenant)
+    finally:
+        # Nenhuma chamada especulativa continua rodando (e sendo cobrada) depois do retorno
+        cancel_event.set()
+        executor.shutdown(wait=True)
+
+    wall_ms = (time.perf_counter() - started) * 1000
+    saved_ms = max(0.0, standardization_ms + generation_ms - wall_ms)
+
+    SPECULATION_METRICS['attempts'] += 1
+    SPECULATION_METRICS['hits'] += 1 if hit else 0
+    SPECULATION_METRICS['savedMs'] += saved_ms
+
+    logger.info(
+        f"Especulação {'aproveitada' if hit else 'descartada'}: diferença {difference:.2f}, "
+        f"economia {saved_ms:.0f}ms, taxa de acerto {get_speculation_hit_rate():.0%}"
+    )
+
+    return {
+        'standardizedStory': standardized_story,
+        'contextForGeneration': context_for_generation,
+        'generatedCode': generated_code,
+        'stats': {
+            'hit': hit,
+            'difference': round(difference, 4),
+            'threshold': threshold,
+            'standardizationMs': round(standardization_ms),
+            'generationMs': round(generation_ms),
+            'wallClockMs': round(wall_ms),
+            'savedMs': round(saved_ms)
+        }
+    }
+
+def cancel_speculation(speculation, cancel_event):
+    """
+    Interrompe a geração especulativa e espera a thread encerrar.
+
+    O stream do Bedrock é fechado no próximo trecho recebido; a vaga do agendador
+    é liberada e a saída interrompida não entra nas estatísticas de tokens.
+    """
+    cancel_event.set()
+    try:
+        speculation.result()
+    except GenerationCancelled as e:
+        logger.info(f"Especulação interrompida: {str(e)}")
+    except Exception as e:
+        logger.error(f"Especulação descartada falhou: {str(e)}")
+
+def get_speculation_hit_rate():
+    """
+    Taxa de acerto da especulação desde o início do container.
+    """
+    if not SPECULATION_METRICS['attempts']:
+        return 0.0
+    return SPECULATION_METRICS['hits'] / SPECULATION_METRICS['attempts']
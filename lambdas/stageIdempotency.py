@@ -0,0 +1,209 @@
+import json
+import logging
+import time
+import boto3
+from botocore.exceptions import ClientError
+from artifactIndex import _is_trackable
+from deadlines import client_for
+from defaultInstance import DefaultInstance
+
+# Configuração de logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Constantes
+IDEMPOTENCY_TABLE = 'generation-stage-idempotency'
+IN_PROGRESS_LEASE_SECONDS = 360  # maior que o timeout de 300s da Lambda
+COMPLETED_RETENTION_SECONDS = 7 * 24 * 3600
+
+# Resultados de begin_stage
+STAGE_CLAIMED = 'CLAIMED'
+STAGE_IN_PROGRESS = 'IN_PROGRESS'
+STAGE_COMPLETED = 'COMPLETED'
+
+class StageInProgressError(Exception):
+    """
+    Outra execução detém a etapa (requestId, stage).
+
+    A Lambda falha com este erro em vez de responder: o nome da classe vira o
+    nome do erro no Step Functions, que repete a etapa com uma regra Retry
+    (ErrorEquals: ["StageInProgressError"]) até o lease expirar ou o resultado
+    ficar disponível.
+    """
+
+    def __init__(self, request_id, stage):
+        super().__init__(f"Etapa {stage} já em andamento para {request_id}")
+        self.request_id = request_id
+        self.stage = stage
+
+class DynamoIdempotencyStore:
+    """
+    Marcadores por (requestId, stage) no DynamoDB com escrita condicional.
+
+    O marcador IN_PROGRESS tem um lease: se a execução morrer (timeout), outra
+    tentativa pode assumir depois que o lease expira. `expiresAt` é o atributo de TTL.
+    """
+
+    def __init__(self, table_name=IDEMPOTENCY_TABLE):
+        self.table = boto3.resource('dynamodb').Table(table_name)
+
+    def claim(self, request_id, stage, now):
+        try:
+            self.table.put_item(
+                Item={
+                    'requestId': request_id,
+                    'stage': stage,
+                    'status': STAGE_IN_PROGRESS,
+                    'leaseExpiresAt': int(now + IN_PROGRESS_LEASE_SECONDS),
+                    'expiresAt': int(now + COMPLETED_RETENTION_SECONDS)
+                },
+                ConditionExpression=(
+                    'attribute_not_exists(requestId) OR '
+                    '(#status = :in_progress AND leaseExpiresAt < :now)'
+                ),
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={':in_progress': STAGE_IN_PROGRESS, ':now': int(now)}
+            )
+            return True, None
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+        item = self.table.get_item(Key={'requestId': request_id, 'stage': stage}, ConsistentRead=True).get('Item')
+        return False, item
+
+    def complete(self, request_id, stage, record, now):
+        self.table.put_item(Item={
+            'requestId': request_id,
+            'stage': stage,
+            'status': STAGE_COMPLETED,
+            'record': json.dumps(record),
+            'expiresAt': int(now + COMPLETED_RETENTION_SECONDS)
+        })
+
+    def release(self, request_id, stage):
+        self.table.delete_item(
+            Key={'requestId': request_id, 'stage': stage},
+            ConditionExpression='#status = :in_progress',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={':in_progress': STAGE_IN_PROGRESS}
+        )
+
+class LocalIdempotencyStore:
+    """
+    Substituto em memória do DynamoIdempotencyStore para testes e execução local.
+    """
+
+    def __init__(self):
+        self.items = {}
+
+    def claim(self, request_id, stage, now):
+        item = self.items.get((request_id, stage))
+        if item is None or (item['status'] == STAGE_IN_PROGRESS and item['leaseExpiresAt'] < now):
+            self.items[(request_id, stage)] = {
+                'requestId': request_id,
+                'stage': stage,
+                'status': STAGE_IN_PROGRESS,
+                'leaseExpiresAt': int(now + IN_PROGRESS_LEASE_SECONDS)
+            }
+            return True, None
+        return False, item
+
+    def complete(self, request_id, stage, record, now):
+        self.items[(request_id, stage)] = {
+            'requestId': request_id,
+            'stage': stage,
+            'status': STAGE_COMPLETED,
+            'record': json.dumps(record)
+        }
+
+    def release(self, request_id, stage):
+        item = self.items.get((request_id, stage))
+        if item and item['status'] == STAGE_IN_PROGRESS:
+            del self.items[(request_id, stage)]
+
+# Store padrão (DynamoDB); set_idempotency_store troca por LocalIdempotencyStore em testes
+_default_store = DefaultInstance(DynamoIdempotencyStore)
+get_idempotency_store = _default_store.get
+set_idempotency_store = _default_store.set
+
+def begin_stage(request_id, stage, store=None):
+    """
+    Tenta assumir a execução de (requestId, stage).
+
+    Retorna (STAGE_CLAIMED, None) se esta invocação deve executar, (STAGE_COMPLETED,
+    registro) se já existe resultado, ou (STAGE_IN_PROGRESS, None) se outra tentativa
+    está em andamento.
+
+    Falhas do próprio store não bloqueiam a etapa (fail-open): a invocação segue
+    como se tivesse assumido a etapa.
+    """
+    if not _is_trackable(request_id):
+        return STAGE_CLAIMED, None
+    try:
+        claimed, item = (store or get_idempotency_store()).claim(request_id, stage, time.time())
+    except Exception as e:
+        logger.error(f"Store de idempotência indisponível, executando etapa {stage} de {request_id}: {str(e)}")
+        return STAGE_CLAIMED, None
+    if claimed:
+        logger.info(f"Etapa {stage} assumida para {request_id}")
+        return STAGE_CLAIMED, None
+    if item and item['status'] == STAGE_COMPLETED:
+        logger.info(f"Etapa {stage} já concluída para {request_id}, reutilizando resultado")
+        return STAGE_COMPLETED, json.loads(item['record'])
+    logger.info(f"Etapa {stage} em andamento para {request_id} por outra execução")
+    return STAGE_IN_PROGRESS, None
+
+def complete_stage(request_id, stage, result, artifact=None, store=None):
+    """
+    Registra o resultado da etapa e a referência do artefato ({bucket, key}).
+    """
+    if not _is_trackable(request_id):
+        return
+    (store or get_idempotency_store()).complete(
+        request_id, stage, {'result': result, 'artifact': artifact}, time.time()
+    )
+
+def release_stage(request_id, stage, store=None):
+    """
+    Libera o marcador IN_PROGRESS após falha, permitindo nova tentativa imediata.
+    """
+    if not _is_trackable(request_id):
+        return
+    try:
+        (store or get_idempotency_store()).release(request_id, stage)
+    except Exception as e:
+        logger.error(f"Erro ao liberar etapa {stage} de {request_id}: {str(e)}")
+
+def _presign(s3_client, bucket, key, expires_in):
+    return s3_client.generate_presigned_url(
+        'get_object',
+        Params={'Bucket': bucket, 'Key': key},
+        ExpiresIn=expires_in
+    )
+
+def replay_stage_result(record, expires_in=3600):
+    """
+    Resultado armazenado com as presigned URLs renovadas.
+
+    Renova a URL do artefato principal, a de cada arquivo de componente
+    (`componentFiles`, no mesmo bucket) e a do BDD da geração combinada
+    (`bdd`, referência em artifact['bdd']).
+    """
+    result = dict(record['result'])
+    artifact = record.get('artifact')
+    if artifact:
+        s3_client = client_for('s3', 's3')
+        result['presignedUrl'] = _presign(s3_client, artifact['bucket'], artifact['key'], expires_in)
+        if result.get('componentFiles'):
+            result['componentFiles'] = [
+                dict(entry, presignedUrl=_presign(s3_client, artifact['bucket'], entry['key'], expires_in))
+                for entry in result['componentFiles']
+            ]
+        bdd_artifact = artifact.get('bdd')
+        if bdd_artifact and result.get('bdd'):
+            result['bdd'] = dict(
+                result['bdd'],
+                presignedUrl=_presign(s3_client, bdd_artifact['bucket'], bdd_artifact['key'], expires_in)
+            )
+    result['idempotentReplay'] = True
+    return result
@@ -0,0 +1,238 @@
+import logging
+import math
+import random
+import threading
+import time
+import boto3
+from defaultInstance import DefaultInstance
+
+# Configuração de logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Constantes
+TOKEN_STATS_TABLE = 'output-token-stats'
+BIN_WIDTH = 250                  # largura de cada faixa do histograma (tokens de saída)
+MAX_BINS = 64                    # faixas acima de 16000 tokens caem na última
+INPUT_SIZE_BUCKETS = [1000, 2000, 4000, 8000]  # limites de tokens de entrada estimados
+TARGET_PERCENTILE = 0.99
+BUDGET_MARGIN = 0.15
+MIN_SAMPLES = 30                 # abaixo disso usa o teto fixo
+MIN_BUDGET = 512
+STATS_CACHE_SECONDS = 300
+
+def input_size_bucket(prompt):
+    """
+    Faixa de tamanho de entrada do prompt (tokens estimados por len/4).
+    """
+    tokens = len(prompt) // 4
+    for limit in INPUT_SIZE_BUCKETS:
+        if tokens < limit:
+            return f"lt{limit}"
+    return f"ge{INPUT_SIZE_BUCKETS[-1]}"
+
+def _bin_index(output_tokens):
+    return min(MAX_BINS - 1, max(0, int(output_tokens) // BIN_WIDTH))
+
+def histogram_percentile(bins, percentile):
+    """
+    Percentil (limite superior da faixa) de um histograma {índice: contagem}.
+    """
+    total = sum(bins.values())
+    if not total:
+        return 0
+    threshold = math.ceil(total * percentile)
+    seen = 0
+    for index in sorted(bins):
+        seen += bins[index]
+        if seen >= threshold:
+            return (index + 1) * BIN_WIDTH
+    return MAX_BINS * BIN_WIDTH
+
+def compute_budget(bins, ceiling):
+    """
+    max_tokens para uma chamada: percentil alto + margem, entre MIN_BUDGET e o teto.
+    """
+    if sum(bins.values()) < MIN_SAMPLES:
+        return ceiling
+    budget = histogram_percentile(bins, TARGET_PERCENTILE) * (1 + BUDGET_MARGIN)
+    budget = math.ceil(budget / BIN_WIDTH) * BIN_WIDTH
+    return int(min(ceiling, max(MIN_BUDGET, budget)))
+
+def _empty_counters():
+    return {'calls': 0, 'retries': 0, 'reservedTokens': 0, 'ceilingTokens': 0}
+
+class LocalTokenStatsStore:
+    """
+    Histogramas e contadores em memória (um processo); substituto do DynamoTokenStatsStore.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bins = {}
+        self.counters = {}
+
+    def load_bins(self, key):
+        with self.lock:
+            return dict(self.bins.get(key, {}))
+
+    def record(self, key, output_tokens, reserved, ceiling, retried):
+        with self.lock:
+            if output_tokens is not None:
+                key_bins = self.bins.setdefault(key, {})
+                index = _bin_index(output_tokens)
+                key_bins[index] = key_bins.get(index, 0) + 1
+            counters = self.counters.setdefault(key, _empty_counters())
+            counters['calls'] += 1
+            counters['retries'] += 1 if retried else 0
+            counters['reservedTokens'] += reserved
+            counters['ceilingTokens'] += ceiling
+
+    def load_counters(self):
+        with self.lock:
+            return {key: dict(counters) for key, counters in self.counters.items()}
+
+class DynamoTokenStatsStore:
+    """
+    Um item por tarefa e faixa de entrada, com faixas do histograma como contadores atômicos.
+
+    Os histogramas lidos ficam em cache no container por STATS_CACHE_SECONDS para
+    não adicionar uma leitura ao DynamoDB a cada chamada ao Bedrock.
+    """
+
+    def __init__(self, table_name=TOKEN_STATS_TABLE):
+        self.table = boto3.resource('dynamodb').Table(table_name)
+        self.cache = {}
+
+    def load_bins(self, key):
+        cached = self.cache.get(key)
+        if cached and time.time() - cached[0] < STATS_CACHE_SECONDS:
+            return cached[1]
+        item = self.table.get_item(Key={'statsKey': key}).get('Item', {})
+        bins = {int(name[4:]): int(value) for name, value in item.items() if name.startswith('bin_')}
+        self.cache[key] = (time.time(), bins)
+        return bins
+
+    def record(self, key, output_tokens, reserved, ceiling, retried):
+        expression = 'ADD calls :one, retries :retried, reservedTokens :reserved, ceilingTokens :ceiling'
+        names = {}
+        values = {':one': 1, ':retried': 1 if retried else 0, ':reserved': reserved, ':ceiling': ceiling}
+        if output_tokens is not None:
+            expression += ', #bin :one'
+            names['#bin'] = f"bin_{_bin_index(output_tokens)}"
+        self.table.update_item(
+            Key={'statsKey': key},
+            UpdateExpression=expression,
+            **({'ExpressionAttributeNames': names} if names else {}),
+            ExpressionAttributeValues=values
+        )
+
+    def load_counters(self):
+        counters = {}
+        scan_kwargs = {'ProjectionExpression': 'statsKey, calls, retries, reservedTokens, ceilingTokens'}
+        while True:
+            page = self.table.scan(**scan_kwargs)
+            for item in page.get('Items', []):
+                counters[item['statsKey']] = {name: int(item.get(name, 0)) for name in _empty_counters()}
+            if 'LastEvaluatedKey' not in page:
+                return counters
+            scan_kwargs['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+# Store padrão (DynamoDB); set_token_stats_store troca por LocalTokenStatsStore em testes e simulações
+_default_store = DefaultInstance(DynamoTokenStatsStore)
+get_token_stats_store = _default_store.get
+set_token_stats_store = _default_store.set
+
+def choose_max_tokens(task, prompt, ceiling, store=None):
+    """
+    max_tokens adaptativo para a tarefa e a faixa de entrada do prompt.
+
+    Falhas do store não bloqueiam a geração: usa o teto fixo.
+    """
+    store = store or get_token_stats_store()
+    try:
+        return compute_budget(store.load_bins(f"{task}#{input_size_bucket(prompt)}"), ceiling)
+    except Exception as e:
+        logger.error(f"Estatísticas de tokens indisponíveis, usando teto: {str(e)}")
+        return ceiling
+
+def run_with_budget(task, prompt, ceiling, call, store=None):
+    """
+    Executa `call(max_tokens)` com o orçamento adaptativo e repete com o teto se truncar.
+
+    `call` retorna (texto, stopReason, tokens de saída). Só respostas completas
+    entram no histograma: uma saída truncada subestimaria a distribuição.
+    """
+    store = store or get_token_stats_store()
+    key = f"{task}#{input_size_bucket(prompt)}"
+    budget = choose_max_tokens(task, prompt, ceiling, store)
+
+    text, stop_reason, output_tokens = call(budget)
+    reserved = budget
+    retried = False
+    if stop_reason == 'max_tokens' and budget < ceiling:
+        logger.info(f"Saída truncada em {budget} tokens ({key}), repetindo com {ceiling}")
+        text, stop_reason, output_tokens = call(ceiling)
+        reserved += ceiling
+        retried = True
+
+    try:
+        store.record(key, output_tokens if stop_reason != 'max_tokens' else None, reserved, ceiling, retried)
+    except Exception as e:
+        logger.error(f"Erro ao registrar tokens de saída: {str(e)}")
+    return text, stop_reason, output_tokens
+
+def budget_report(store=None):
+    """
+    Folga de cota (1 - tokens reservados / teto fixo) e taxa de repetição por truncamento.
+    """
+    store = store or get_token_stats_store()
+    per_key = store.load_counters()
+    totals = _empty_counters()
+    for counters in per_key.values():
+        for name in totals:
+            totals[name] += counters[name]
+
+    def with_rates(counters):
+        return {
+            **counters,
+            'quotaHeadroom': round(1 - counters['reservedTokens'] / counters['ceilingTokens'], 3) if counters['ceilingTokens'] else 0.0,
+            'retryRate': round(counters['retries'] / counters['calls'], 3) if counters['calls'] else 0.0
+        }
+
+    return {
+        'perKey': {key: with_rates(counters) for key, counters in sorted(per_key.items())},
+        'total': with_rates(totals)
+    }
+
+def simulate_adaptive_budget(workloads, calls=2000, seed=11):
+    """
+    Reproduz chamadas com saídas sorteadas por tarefa sobre um LocalTokenStatsStore.
+
+    `workloads` = {tarefa: (teto, mediana de tokens de saída, sigma lognormal)}.
+    Retorna o budget_report do período, incluindo o aquecimento com o teto fixo.
+    """
+    rng = random.Random(seed)
+    store = LocalTokenStatsStore()
+    tasks = list(workloads)
+    for _ in range(calls):
+        task = rng.choice(tasks)
+        ceiling, median, sigma = workloads[task]
+        needed = int(rng.lognormvariate(math.log(median), sigma))
+
+        def call(max_tokens):
+            if needed > max_tokens:
+                return '', 'max_tokens', max_tokens
+            return '', 'end_turn', needed
+
+        run_with_budget(task, 'x' * 6000, ceiling, call, store)
+    return budget_report(store)
+
+if __name__ == '__main__':
+    # Distribuições aproximadas das saídas de cada tarefa (teto, mediana, sigma)
+    print(simulate_adaptive_budget({
+        'code_java': (8000, 2600, 0.35),
+        'code_python': (8000, 1800, 0.35),
+        'bdd': (6000, 1500, 0.3),
+        'standardization': (2000, 450, 0.3)
+    }, calls=20000)['total'])
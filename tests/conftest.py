@@ -0,0 +1,207 @@
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambdas'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import artifactIndex
+import bedrockScheduler
+import deadlines
+import stageIdempotency
+import tokenBudget
+
+
+class FakeStreamBody:
+    """
+    Corpo de invoke_model_with_response_stream: itera os eventos e registra o close().
+    """
+
+    def __init__(self, events):
+        self.events = events
+        self.closed = False
+
+    def __iter__(self):
+        for event in self.events:
+            yield {'chunk': {'bytes': json.dumps(event).encode()}}
+
+    def close(self):
+        self.closed = True
+
+
+class FakeBedrockRuntime:
+    """
+    Bedrock Runtime em memória: cada chamada consome o próximo roteiro de `streams`.
+
+    Um roteiro é uma função (request) -> lista de eventos Nova, ou a própria lista.
+    """
+
+    def __init__(self):
+        self.streams = []
+        self.requests = []
+        self.bodies = []
+
+    def invoke_model_with_response_stream(self, modelId, body):
+        request = json.loads(body)
+        self.requests.append(request)
+        script = self.streams.pop(0)
+        self.bodies.append(FakeStreamBody(script(request) if callable(script) else script))
+        return {'body': self.bodies[-1]}
+
+
+class FakeBody(io.BytesIO):
+    # Corpo de get_object com a leitura em trechos do StreamingBody
+    def iter_chunks(self, chunk_size=1024):
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def iter_lines(self):
+        for line in self.read().splitlines():
+            yield line
+
+
+class FakeS3:
+    """
+    S3 em memória indexado por (bucket, key).
+    """
+
+    class exceptions:
+        class NoSuchKey(KeyError):
+            pass
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[(Bucket, Key)] = Body
+
+    def get_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise self.exceptions.NoSuchKey(Key)
+        body = self.objects[(Bucket, Key)]
+        return {'Body': FakeBody(body.encode('utf-8') if isinstance(body, str) else body)}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        upload_id = f"upload-{len(self.uploads) + 1}"
+        self.uploads[upload_id] = {'bucket': Bucket, 'key': Key, 'parts': {}, 'status': 'open'}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.uploads[UploadId]['parts'][PartNumber] = Body
+        return {'ETag': f'"{UploadId}-{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        upload = self.uploads[UploadId]
+        upload['status'] = 'completed'
+        self.objects[(Bucket, Key)] = b''.join(upload['parts'][part['PartNumber']] for part in MultipartUpload['Parts'])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads[UploadId]['status'] = 'aborted'
+
+    def list_objects_v2(self, Bucket, Prefix):
+        keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))
+        return {'Contents': [{'Key': key} for key in keys]}
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://{Params['Bucket']}.s3.local/{Params['Key']}"
+
+
+class FakeBatchClient:
+    """
+    Cliente bedrock que imita o ciclo de vida de um job de batch inference.
+
+    Cada get_model_invocation_job avança o status (Submitted -> InProgress -> Completed);
+    ao completar, grava a saída no FakeS3 usando `responder(recordId, modelInput)`.
+    Respostas None viram registros com erro.
+    """
+
+    LIFECYCLE = ['Submitted', 'InProgress', 'Completed']
+
+    def __init__(self, s3_client, responder=None):
+        self.s3_client = s3_client
+        self.responder = responder
+        self.jobs = {}
+
+    def create_model_invocation_job(self, jobName, roleArn, modelId, inputDataConfig, outputDataConfig):
+        job_arn = f"arn:aws:bedrock:local:000000000000:model-invocation-job/{jobName}"
+        self.jobs[job_arn] = {
+            'step': 0,
+            'input': inputDataConfig['s3InputDataConfig']['s3Uri'],
+            'output': outputDataConfig['s3OutputDataConfig']['s3Uri']
+        }
+        return {'jobArn': job_arn}
+
+    def get_model_invocation_job(self, jobIdentifier):
+        job = self.jobs[jobIdentifier]
+        job['step'] = min(job['step'] + 1, len(self.LIFECYCLE) - 1)
+        status = self.LIFECYCLE[job['step']]
+        if status == 'Completed' and not job.get('written'):
+            self._write_output(jobIdentifier, job)
+        return {'jobArn': jobIdentifier, 'status': status}
+
+    def _write_output(self, job_arn, job):
+        bucket, input_key = job['input'][len('s3://'):].split('/', 1)
+        output_prefix = job['output'][len('s3://'):].split('/', 1)[1]
+        lines = []
+        for line in self.s3_client.get_object(Bucket=bucket, Key=input_key)['Body'].iter_lines():
+            record = json.loads(line)
+            text = self.responder(record['recordId'], record['modelInput'])
+            if text is None:
+                record['error'] = {'errorCode': 400, 'errorMessage': 'local failure'}
+            else:
+                record['modelOutput'] = {'output': {'message': {'role': 'assistant', 'content': [{'text': text}]}}}
+            lines.append(json.dumps(record, ensure_ascii=False))
+        output_key = f"{output_prefix}{job_arn.rsplit('/', 1)[1]}/{input_key.rsplit('/', 1)[1]}.out"
+        self.s3_client.put_object(Bucket=bucket, Key=output_key, Body='\n'.join(lines))
+        job['written'] = True
+
+
+class FakeSession:
+    def __init__(self, clients):
+        self.clients = clients
+
+    def client(self, service_name, config=None):
+        return self.clients[service_name]
+
+
+class FakeAws:
+    def __init__(self):
+        self.s3 = FakeS3()
+        self.bedrock = FakeBedrockRuntime()
+        self.batch = FakeBatchClient(self.s3)
+
+
+def text_delta(text):
+    return {'contentBlockDelta': {'delta': {'text': text}}}
+
+
+def message_stop(reason='end_turn', output_tokens=10):
+    return [{'messageStop': {'stopReason': reason}}, {'metadata': {'usage': {'outputTokens': output_tokens}}}]
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    """
+    Clientes falsos no lugar da Session do boto3 e stores locais no lugar do DynamoDB.
+    """
+    fake = FakeAws()
+    monkeypatch.setattr(deadlines, '_session', FakeSession({
+        's3': fake.s3, 'bedrock-runtime': fake.bedrock, 'bedrock': fake.batch
+    }))
+    monkeypatch.setattr(deadlines, '_clients', {})
+    monkeypatch.setattr(deadlines, '_current_deadline', None)
+    monkeypatch.setattr(stageIdempotency._default_store, 'instance', stageIdempotency.LocalIdempotencyStore())
+    monkeypatch.setattr(artifactIndex._default_index, 'instance', artifactIndex.LocalArtifactIndex())
+    monkeypatch.setattr(bedrockScheduler._default_store, 'instance', bedrockScheduler.LocalSchedulerStore())
+    monkeypatch.setattr(tokenBudget._default_store, 'instance', tokenBudget.LocalTokenStatsStore())
+    return fake
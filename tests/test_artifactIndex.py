@@ -0,0 +1,83 @@
+import artifactIndex
+from artifactIndex import (
+    USER_HISTORY_INDEX, DynamoArtifactIndex, build_index_entry, get_request_artifacts, list_user_history, record_artifact
+)
+
+
+def index_entry(request_id, kind='code', language='python', user_id='ana', created_at=None):
+    entry = build_index_entry(request_id, language, kind, f'bucket-{kind}', f'{kind}/{request_id}', f'conteúdo {request_id}', user_id=user_id)
+    if created_at:
+        entry['createdAt'] = created_at
+    return entry
+
+
+def test_point_lookup_returns_every_artifact_of_the_request(aws):
+    assert record_artifact(index_entry('req-1', 'code', 'java'))
+    assert record_artifact(index_entry('req-1', 'bdd', 'java'))
+    assert record_artifact(index_entry('req-2', 'code', 'python'))
+
+    artifacts = get_request_artifacts('req-1')
+
+    assert sorted(artifacts) == ['bdd_java', 'code_java']
+    assert artifacts['code_java']['key'] == 'code/req-1'
+    assert artifacts['code_java']['sha256'] == index_entry('req-1', 'code', 'java')['sha256']
+    assert get_request_artifacts('req-inexistente') == {}
+
+
+def test_untrackable_request_ids_are_not_indexed(aws):
+    assert record_artifact(index_entry('unknown')) is False
+    assert get_request_artifacts('unknown') == {}
+    assert artifactIndex.get_artifact_index().items == {}
+
+
+def test_history_pages_follow_the_cursor_newest_first(aws):
+    for day in range(1, 6):
+        record_artifact(index_entry(f'req-{day}', created_at=f'2026-10-0{day}T12:00:00+00:00'))
+    record_artifact(index_entry('req-outro', user_id='bruno', created_at='2026-10-09T12:00:00+00:00'))
+
+    pages, cursor = [], None
+    while True:
+        items, cursor = list_user_history('ana', limit=2, cursor=cursor)
+        pages.append([item['requestId'] for item in items])
+        if cursor is None:
+            break
+
+    assert pages == [['req-5', 'req-4'], ['req-3', 'req-2'], ['req-1']]
+
+
+def test_exact_page_size_has_no_next_cursor(aws):
+    for day in range(1, 3):
+        record_artifact(index_entry(f'req-{day}', created_at=f'2026-10-0{day}T12:00:00+00:00'))
+
+    items, cursor = list_user_history('ana', limit=2)
+
+    assert len(items) == 2
+    assert cursor is None
+
+
+class FakeHistoryTable:
+    def __init__(self, pages):
+        self.pages = pages
+        self.queries = []
+
+    def query(self, **params):
+        self.queries.append(params)
+        return self.pages[len(self.queries) - 1]
+
+
+def test_dynamo_history_passes_the_cursor_as_exclusive_start_key():
+    cursor = {'requestId': 'req-3', 'userId': 'ana', 'createdAt': '2026-10-03T12:00:00+00:00'}
+    index = DynamoArtifactIndex.__new__(DynamoArtifactIndex)
+    index.table = FakeHistoryTable([
+        {'Items': [{'requestId': 'req-5'}], 'LastEvaluatedKey': cursor},
+        {'Items': [{'requestId': 'req-2'}]},
+    ])
+
+    first = list_user_history('ana', limit=1, index=index)
+    second = list_user_history('ana', limit=1, cursor=first[1], index=index)
+
+    assert first == ([{'requestId': 'req-5'}], cursor)
+    assert second == ([{'requestId': 'req-2'}], None)
+    assert 'ExclusiveStartKey' not in index.table.queries[0]
+    assert index.table.queries[1]['ExclusiveStartKey'] == cursor
+    assert all(query['IndexName'] == USER_HISTORY_INDEX and query['ScanIndexForward'] is False for query in index.table.queries)
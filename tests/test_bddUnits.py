@@ -0,0 +1,52 @@
+from bddUnits import count_scenarios, merge_features
+
+PT_UNIT = """# language: pt
+@cadastro
+Funcionalidade: Cadastro de clientes
+  Cenário: cadastro válido
+    Dado um cliente novo
+    Quando ele é salvo
+    Então ele aparece na busca
+  Esquema do Cenário: nome inválido
+    Dado o nome "<nome>"
+    Exemplos:
+      | nome |
+      | ""   |
+"""
+
+EN_UNIT = """Feature: Remoção de clientes
+  Scenario: remoção de cliente existente
+    Given um cliente cadastrado
+    And nenhum pedido aberto
+    When ele é removido
+    Then ele não aparece na busca
+"""
+
+
+def test_portuguese_units_keep_portuguese_dialect():
+    merged = merge_features('Clientes', [('Cadastro', PT_UNIT), ('Busca', PT_UNIT), ('Remocao', EN_UNIT)])
+
+    lines = merged.split('\n')
+    assert lines[:2] == ['# language: pt', 'Funcionalidade: Clientes']
+    assert '  Regra: Cadastro de clientes' in lines
+    assert '  @cadastro' in lines
+    # A unidade em inglês é traduzida: o parser não aceita dialetos misturados
+    assert '  Regra: Remoção de clientes' in lines
+    assert '      E nenhum pedido aberto' in lines
+    assert not any(line.strip().startswith(('Feature:', 'Rule:', 'Scenario:', 'Given ', 'And ')) for line in lines)
+    assert merged.count('# language:') == 1
+
+
+def test_english_units_stay_english():
+    merged = merge_features('Clientes', [('Remocao', EN_UNIT), ('Outra', EN_UNIT), ('Cadastro', PT_UNIT)])
+
+    assert merged.startswith('Feature: Clientes\n')
+    assert '# language' not in merged
+    assert '    Scenario Outline: nome inválido' in merged
+    assert '      Given um cliente novo' in merged
+
+
+def test_count_scenarios_in_both_dialects():
+    assert count_scenarios(PT_UNIT) == 2
+    assert count_scenarios(EN_UNIT) == 1
+    assert count_scenarios(merge_features('Clientes', [('A', PT_UNIT), ('B', EN_UNIT)])) == 3
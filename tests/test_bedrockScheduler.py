@@ -0,0 +1,114 @@
+import pytest
+
+import bedrockScheduler
+from bedrockScheduler import (
+    BULK_MAX_CONCURRENCY, BULK_YIELD_CONCURRENCY, GLOBAL_CONCURRENCY, INTERACTIVE_QUIET_SECONDS,
+    LANE_BULK, LANE_INTERACTIVE, DynamoSchedulerStore, LocalSchedulerStore, bedrock_slot
+)
+
+NOW = 1_000_000.0
+
+
+def acquire_all(store, lane, now, attempts=GLOBAL_CONCURRENCY + 5):
+    # Tenants distintos para que o teto por tenant não interfira
+    leases = [store.try_acquire(lane, f"tenant-{index}", 0, now) for index in range(attempts)]
+    return [lease for lease in leases if lease]
+
+
+def test_global_cap_is_respected_across_lanes():
+    store = LocalSchedulerStore()
+    bulk = acquire_all(store, LANE_BULK, NOW - INTERACTIVE_QUIET_SECONDS - 1)
+    interactive = acquire_all(store, LANE_INTERACTIVE, NOW)
+
+    assert len(bulk) == BULK_MAX_CONCURRENCY
+    assert len(bulk) + len(interactive) == GLOBAL_CONCURRENCY
+    assert store.active == GLOBAL_CONCURRENCY
+
+    store.release(interactive[0])
+    assert store.try_acquire(LANE_INTERACTIVE, 'tenant-x', 0, NOW)
+    assert store.try_acquire(LANE_INTERACTIVE, 'tenant-y', 0, NOW) is None
+
+
+def test_interactive_demand_preempts_bulk():
+    store = LocalSchedulerStore()
+    quiet = NOW - INTERACTIVE_QUIET_SECONDS - 1
+    bulk = acquire_all(store, LANE_BULK, quiet, attempts=2)
+    assert len(bulk) == 2
+
+    assert store.try_acquire(LANE_INTERACTIVE, 'usuario', 0, NOW)
+    # Com interativo recente o bulk não recebe novas vagas até cair abaixo do teto reduzido
+    assert store.try_acquire(LANE_BULK, 'lote', 0, NOW) is None
+    for lease in bulk:
+        store.release(lease)
+    assert len(acquire_all(store, LANE_BULK, NOW)) == BULK_YIELD_CONCURRENCY
+
+    # Passada a janela sem interativo, o bulk volta a crescer
+    later = NOW + INTERACTIVE_QUIET_SECONDS + 1
+    assert len(acquire_all(store, LANE_BULK, later)) == BULK_MAX_CONCURRENCY - BULK_YIELD_CONCURRENCY
+
+
+class BrokenStore:
+    def __init__(self):
+        self.released = []
+
+    def try_acquire(self, lane, tenant, tokens, now):
+        raise RuntimeError('DynamoDB indisponível')
+
+    def release(self, lease):
+        self.released.append(lease)
+
+
+def test_slot_fails_open_when_the_store_errors(aws):
+    store = BrokenStore()
+    calls = []
+
+    with bedrock_slot(LANE_BULK, 'lote', tokens=100, store=store):
+        calls.append('bedrock')
+
+    assert calls == ['bedrock']
+    assert store.released == []
+
+
+class FakeSchedulerTable:
+    """
+    Tabela mínima: guarda o item de demanda interativa e registra as atualizações condicionais.
+    """
+
+    def __init__(self):
+        self.items = {}
+        self.updates = []
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues, **kwargs):
+        if UpdateExpression.startswith('SET lastInteractiveAt'):
+            self.items.setdefault(Key['pk'], {})['lastInteractiveAt'] = ExpressionAttributeValues[':now']
+        self.updates.append((Key['pk'], ExpressionAttributeValues))
+
+    def get_item(self, Key):
+        return {'Item': self.items[Key['pk']]} if Key['pk'] in self.items else {}
+
+
+@pytest.fixture
+def dynamo_store():
+    store = DynamoSchedulerStore.__new__(DynamoSchedulerStore)
+    store.table = FakeSchedulerTable()
+    return store
+
+
+def test_interactive_demand_survives_epoch_rollover(dynamo_store):
+    epoch_end = (int(NOW // DynamoSchedulerStore.LEASE_ITEM_TTL) + 1) * DynamoSchedulerStore.LEASE_ITEM_TTL
+    assert dynamo_store.try_acquire(LANE_INTERACTIVE, 'usuario', 0, epoch_end - 1)
+
+    assert dynamo_store.try_acquire(LANE_BULK, 'lote', 0, epoch_end + 1)
+
+    counters = [(pk, values) for pk, values in dynamo_store.table.updates if pk.startswith('counters#')]
+    assert counters[0][0] != counters[1][0]
+    assert counters[0][1][':lane_max'] == GLOBAL_CONCURRENCY
+    # Época nova, mas o interativo de 2s atrás ainda reduz o teto do bulk
+    assert counters[1][1][':lane_max'] == BULK_YIELD_CONCURRENCY
+
+
+def test_bulk_grows_again_without_interactive_demand(dynamo_store):
+    assert dynamo_store.try_acquire(LANE_BULK, 'lote', 0, NOW)
+
+    (_, values), _ = dynamo_store.table.updates
+    assert values[':lane_max'] == BULK_MAX_CONCURRENCY
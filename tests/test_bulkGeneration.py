@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+import bulkGeneration
+from generateBddTest import build_s3_key as build_bdd_key, S3_BUCKET as BDD_BUCKET
+from languageRegistry import get_language
+
+JOB_NAME = 'lote-teste'
+PYTHON_CODE = 'class Conta:\n    pass'
+JAVA_CODE = 'public class Conta {\n}'
+FEATURE = 'Feature: Conta\n  Scenario: abrir conta\n    Given um cliente'
+
+STORIES = [
+    {'requestId': 'bulk-1', 'language': 'python', 'userStory': 'Como cliente quero abrir uma conta', 'userId': 'ana'},
+    {'requestId': 'bulk-2', 'language': 'java', 'userStory': 'Como cliente quero abrir uma conta'},
+    {'requestId': 'bulk-3', 'language': 'python', 'userStory': 'Como cliente quero falhar'},
+    {'requestId': 'bulk-4', 'language': 'cobol', 'userStory': 'Linguagem não suportada'},
+]
+
+
+def responder(record_id, model_input):
+    request_id, language = record_id.split('|')
+    if request_id == 'bulk-3':
+        return None
+    prompt = model_input['messages'][0]['content'][0]['text']
+    if 'Gherkin' in prompt:
+        return FEATURE
+    return PYTHON_CODE if language == 'python' else JAVA_CODE
+
+
+def start_event(stories):
+    return {'action': 'start', 'jobName': JOB_NAME, 'stories': stories}
+
+
+def test_bulk_job_runs_code_and_bdd_phases_to_completion(aws):
+    aws.batch.responder = responder
+
+    progress = bulkGeneration.run_bulk_job(JOB_NAME, STORIES, poll_interval=0)
+
+    assert progress['phase'] == 'done'
+    assert sorted(progress['processed']['code']) == ['bulk-1|python', 'bulk-2|java', 'bulk-3|python']
+    assert progress['failed']['code'] == ['bulk-3|python']
+    # A fase BDD só recebe os códigos gerados com sucesso
+    assert sorted(progress['processed']['bdd']) == ['bulk-1|python', 'bulk-2|java']
+    assert progress['failed']['bdd'] == []
+
+    for request_id, language, code in [('bulk-1', 'python', PYTHON_CODE), ('bulk-2', 'java', JAVA_CODE)]:
+        spec = get_language(language)
+        assert aws.s3.objects[(spec['bucket'], spec['describe_artifact'](request_id, code)['key'])] == code
+        assert aws.s3.objects[(BDD_BUCKET, build_bdd_key(request_id))] == FEATURE
+    assert (BDD_BUCKET, build_bdd_key('bulk-3')) not in aws.s3.objects
+
+    # Estado retomável: avançar um job concluído não muda nada
+    assert bulkGeneration.advance_bulk_job(JOB_NAME)['phase'] == 'done'
+
+
+def test_handler_reports_progress_between_steps(aws):
+    aws.batch.responder = responder
+
+    started = bulkGeneration.lambda_handler(start_event(STORIES[:2]), None)
+    advanced = [bulkGeneration.lambda_handler({'jobName': JOB_NAME}, None)['body']['phase'] for _ in range(4)]
+
+    assert started['statusCode'] == 200
+    assert started['body']['phase'] == 'code'
+    assert advanced == ['code', 'bdd', 'bdd', 'done']
+
+
+@pytest.mark.parametrize('story, message', [
+    ({'language': 'python', 'userStory': 'Sem requestId'}, 'requestId ausente'),
+    ({'requestId': 'a|b', 'language': 'python', 'userStory': 'Separador'}, "requestId contém '|'"),
+])
+def test_start_rejects_invalid_request_ids(aws, story, message):
+    response = bulkGeneration.lambda_handler(start_event(STORIES[:1] + [story]), None)
+
+    assert response['statusCode'] == 400
+    assert message in json.loads(response['body'])['message']
+    assert not aws.batch.jobs
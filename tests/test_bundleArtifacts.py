@@ -0,0 +1,52 @@
+import hashlib
+import io
+import json
+import os
+import zipfile
+
+import bundleArtifacts
+from artifactIndex import build_index_entry, record_artifact
+from deadlines import LocalLambdaContext
+
+REQUEST_ID = 'req-bundle'
+CODE_BUCKET = 'codigo'
+CODE_KEY = f'generated-code/{REQUEST_ID}/Relatorio.py'
+FEATURE = 'Feature: Relatório\n  Scenario: gerar\n    Given dados'
+
+
+def index_artifact(aws, kind, bucket, key, content):
+    aws.s3.put_object(Bucket=bucket, Key=key, Body=content)
+    record_artifact(build_index_entry(REQUEST_ID, 'python', kind, bucket, key, content))
+
+
+def test_bundle_larger_than_one_part_is_a_valid_zip(aws):
+    # Bytes aleatórios não comprimem: o .zip passa de uma parte do multipart
+    code = os.urandom(bundleArtifacts.PART_SIZE + 1024 * 1024)
+    index_artifact(aws, 'code', CODE_BUCKET, CODE_KEY, code)
+    index_artifact(aws, 'bdd', 'bdd', f'bdd/{REQUEST_ID}.feature', FEATURE)
+
+    response = bundleArtifacts.lambda_handler(
+        {'requestId': REQUEST_ID, 'language': 'python', 'standardizedStory': 'Como gestor quero um relatório'},
+        LocalLambdaContext(300000)
+    )
+
+    assert response['statusCode'] == 200
+    (upload,) = aws.s3.uploads.values()
+    assert upload['status'] == 'completed'
+    assert len(upload['parts']) == 2
+    assert all(len(part) >= bundleArtifacts.PART_SIZE for part in list(upload['parts'].values())[:-1])
+
+    data = aws.s3.objects[(bundleArtifacts.S3_BUCKET, response['body']['bundleKey'])]
+    assert response['body']['bundleSize'] == len(data)
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == ['story.md', 'code/Relatorio.py', f'tests/{REQUEST_ID}.feature', 'manifest.json']
+        assert archive.read('code/Relatorio.py') == code
+        assert archive.read(f'tests/{REQUEST_ID}.feature').decode('utf-8') == FEATURE
+        manifest = json.loads(archive.read('manifest.json'))
+
+    code_file = manifest['files'][1]
+    assert code_file == {
+        'name': 'code/Relatorio.py', 'source': f's3://{CODE_BUCKET}/{CODE_KEY}',
+        'size': len(code), 'sha256': hashlib.sha256(code).hexdigest()
+    }
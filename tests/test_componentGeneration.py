@@ -0,0 +1,96 @@
+import json
+import re
+
+import generateCode
+from componentGeneration import assemble_components, order_components
+from conftest import text_delta, message_stop
+from deadlines import LocalLambdaContext
+
+
+def test_order_components_follows_depends_on():
+    components = [
+        {'name': 'ClienteService', 'dependsOn': ['ClienteRepository', 'Cliente']},
+        {'name': 'ClienteRepository', 'dependsOn': ['Cliente', 'Desconhecido']},
+        {'name': 'Cliente'},
+        {'name': 'A', 'dependsOn': ['B']},
+        {'name': 'B', 'dependsOn': ['A']},
+    ]
+
+    assert [component['name'] for component in order_components(components)] == [
+        'Cliente', 'ClienteRepository', 'ClienteService', 'A', 'B'
+    ]
+
+
+def test_python_components_run_in_dependency_order():
+    components = order_components([
+        {'name': 'service', 'dependsOn': ['model']},
+        {'name': 'model'},
+    ])
+    code = {
+        'service': 'from model import Cliente\n\nclass ClienteEspecial(Cliente):\n    pass',
+        'model': 'class Cliente:\n    pass',
+    }
+
+    combined, files = assemble_components('python', [(component['name'], code[component['name']]) for component in components])
+
+    namespace = {}
+    exec(compile(combined, 'combined.py', 'exec'), namespace)
+    assert issubclass(namespace['ClienteEspecial'], namespace['Cliente'])
+    assert set(files) == {'model.py', 'service.py'}
+
+
+def test_java_single_file_keeps_one_public_type():
+    generated = [
+        ('Cliente', 'package app;\n\npublic class Cliente {\n    public static class Endereco {}\n}'),
+        ('ClienteService', 'package app;\n\nimport java.util.List;\n\npublic final class ClienteService {\n    public List<Cliente> listar() { return null; }\n}'),
+    ]
+
+    combined, files = assemble_components('java', generated)
+
+    assert re.findall(r'^public\s.*', combined, re.MULTILINE) == ['public final class ClienteService {']
+    assert '    public static class Endereco {}' in combined
+    # No mapa de arquivos cada tipo continua público no próprio arquivo
+    assert files['Cliente.java'].count('public class Cliente') == 1
+
+
+def test_component_files_are_saved_next_to_single_file(aws):
+    plan = json.dumps({'components': [
+        {'name': 'ClienteService', 'kind': 'Service', 'dependsOn': ['Cliente']},
+        {'name': 'Cliente', 'kind': 'Model'},
+    ]})
+    aws.bedrock.streams.append([text_delta(plan)] + message_stop())
+
+    def component(request):
+        prompt = request['messages'][0]['content'][0]['text']
+        name = re.search(r'Implemente SOMENTE o componente (\w+)', prompt).group(1)
+        return [text_delta(f"public class {name} {{}}\n")] + message_stop()
+    aws.bedrock.streams.extend([component, component])
+
+    response = generateCode.lambda_handler(
+        {'requestId': 'req-components', 'language': 'java', 'contextForGeneration': 'Clientes', 'generationMode': 'components'},
+        LocalLambdaContext(300000)
+    )
+
+    assert response['statusCode'] == 200
+    assert response['body']['className'] == 'ClienteService'
+    saved = {item['file']: aws.s3.objects[(generateCode.get_language('java')['bucket'], item['key'])] for item in response['body']['componentFiles']}
+    assert saved == {'Cliente.java': 'public class Cliente {}', 'ClienteService.java': 'public class ClienteService {}'}
+
+
+def test_invalid_plan_falls_back_to_single_shot(aws):
+    aws.bedrock.streams.append([text_delta('Não consigo planejar esta história.')] + message_stop())
+    aws.bedrock.streams.append([text_delta('public class Cliente {\n}')] + message_stop())
+
+    response = generateCode.lambda_handler(
+        {'requestId': 'req-bad-plan', 'language': 'java', 'contextForGeneration': 'Clientes', 'generationMode': 'components'},
+        LocalLambdaContext(300000)
+    )
+
+    assert response['statusCode'] == 200
+    assert response['body']['className'] == 'Cliente'
+    assert 'componentFiles' not in response['body']
+    components = response['body']['stats']['components']
+    assert components['fallback'] == 'singleShot'
+    assert components['fallbackReason'] == 'Plano sem JSON'
+    # A segunda chamada usa o prompt normal da linguagem, não o de componente
+    assert 'COMPONENTE A IMPLEMENTAR' not in aws.bedrock.requests[1]['messages'][0]['content'][0]['text']
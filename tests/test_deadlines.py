@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+import deadlines
+import generateCode
+import stageIdempotency
+from conftest import text_delta, message_stop
+from deadlines import DeadlineExceeded, LocalLambdaContext, build_checkpoint_key
+
+REQUEST_ID = 'req-deadline'
+STAGE = 'generate_java_code'
+BUCKET = generateCode.get_language('java')['bucket']
+CHECKPOINT = (BUCKET, build_checkpoint_key(REQUEST_ID, STAGE))
+
+
+def java_event(**extra):
+    return dict({'requestId': REQUEST_ID, 'language': 'java', 'contextForGeneration': 'Cadastro de clientes'}, **extra)
+
+
+PARTIAL = 'public class Cliente {\n  void buscar() {}\n'
+
+
+def stream_then_stall(context, stall_ms):
+    # O orçamento acaba entre dois trechos; o segundo já recebido entra no parcial
+    def script(request):
+        yield text_delta('public class Cliente {\n')
+        context.consume_ms(stall_ms)
+        yield text_delta('  void buscar() {}\n')
+        yield text_delta('  void nunca() {}\n')
+    return script
+
+
+def test_client_timeouts_shrink_with_remaining_budget(aws):
+    context = LocalLambdaContext(60000)
+    deadline = deadlines.start_deadline(context)
+    assert deadline.timeout_bucket('bedrock') == 30
+
+    context.consume_ms(45000)
+    assert deadline.timeout_bucket('bedrock') == 5
+
+    context.consume_ms(10000)
+    assert deadline.expired()
+    with pytest.raises(DeadlineExceeded):
+        deadlines.client_for('s3', 's3')
+
+
+def test_expired_generation_saves_checkpoint_and_raises(aws):
+    context = LocalLambdaContext(30000)
+    aws.bedrock.streams.append(stream_then_stall(context, 25000))
+
+    with pytest.raises(DeadlineExceeded) as raised:
+        generateCode.lambda_handler(java_event(), context)
+
+    assert raised.value.partial == PARTIAL
+    assert aws.s3.objects[CHECKPOINT] == PARTIAL
+    # A etapa é liberada para a próxima tentativa
+    assert stageIdempotency.begin_stage(REQUEST_ID, STAGE)[0] == stageIdempotency.STAGE_CLAIMED
+
+
+def test_retry_resumes_from_checkpoint_and_clears_it(aws):
+    context = LocalLambdaContext(30000)
+    aws.bedrock.streams.append(stream_then_stall(context, 25000))
+    with pytest.raises(DeadlineExceeded):
+        generateCode.lambda_handler(java_event(), context)
+
+    # O modelo continua exatamente após o prefixo enviado (sem o espaço final)
+    aws.bedrock.streams.append([text_delta('\n  void salvar() {}\n}\n')] + message_stop())
+    response = generateCode.lambda_handler(java_event(), LocalLambdaContext(300000))
+
+    assert response['statusCode'] == 200
+    # A continuação parte do texto salvo, como prefixo da resposta do modelo
+    prefill = aws.bedrock.requests[-1]['messages'][-1]
+    assert prefill['role'] == 'assistant'
+    assert prefill['content'][0]['text'].endswith(PARTIAL.rstrip())
+    saved = [body for (bucket, key), body in aws.s3.objects.items() if key.endswith('.java')]
+    assert saved == [PARTIAL + '  void salvar() {}\n}']
+    assert CHECKPOINT not in aws.s3.objects
+
+
+def test_component_worker_partial_is_not_checkpointed(aws):
+    context = LocalLambdaContext(30000)
+    plan = json.dumps({'components': [{'name': 'Cliente', 'kind': 'class', 'responsibility': 'dados'}]})
+    aws.bedrock.streams.append([text_delta(plan)] + message_stop())
+    aws.bedrock.streams.append(stream_then_stall(context, 25000))
+
+    with pytest.raises(DeadlineExceeded) as raised:
+        generateCode.lambda_handler(java_event(generationMode='components'), context)
+
+    assert raised.value.partial == ''
+    assert CHECKPOINT not in aws.s3.objects
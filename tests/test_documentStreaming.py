@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+import documentStreaming
+import extractHistory
+from deadlines import LocalLambdaContext
+
+STORY = b'Como cliente, eu quero consultar meus pedidos para que eu acompanhe as entregas.'
+
+
+@pytest.fixture
+def uploads(aws, monkeypatch):
+    monkeypatch.setattr(documentStreaming, 'UPLOAD_BUCKET', 'story-uploads')
+    monkeypatch.setattr(documentStreaming, 'UPLOAD_PREFIX', 'uploads/')
+    aws.s3.put_object(Bucket='story-uploads', Key='uploads/historia.txt', Body=STORY)
+    aws.s3.put_object(Bucket='other-bucket', Key='uploads/historia.txt', Body=STORY)
+    return aws
+
+
+def extract(bucket, key):
+    event = {'requestId': 'req-upload', 'language': 'python', 'fileS3Bucket': bucket, 'fileS3Key': key, 'structureThreshold': 0}
+    return extractHistory.lambda_handler(event, LocalLambdaContext(300000))
+
+
+@pytest.mark.parametrize('bucket, key', [
+    ('other-bucket', 'uploads/historia.txt'),
+    ('story-uploads', 'generated-code/req_Cliente.java'),
+    ('story-uploads', 'uploads/../checkpoints/x.partial'),
+    ('story-uploads', 'uploads/'),
+])
+def test_reads_outside_the_upload_location_are_refused(uploads, bucket, key):
+    response = extract(bucket, key)
+
+    assert response['statusCode'] == 403
+    assert json.loads(response['body'])['error'] == 'Forbidden'
+
+
+def test_upload_location_is_read(uploads):
+    response = extract('story-uploads', 'uploads/historia.txt')
+
+    assert response['statusCode'] == 200
+    assert response['body']['originalStory'] == STORY.decode()
+
+
+def test_no_configured_bucket_refuses_every_read(uploads, monkeypatch):
+    monkeypatch.setattr(documentStreaming, 'UPLOAD_BUCKET', '')
+
+    assert extract('', 'uploads/historia.txt')['statusCode'] == 403
+
+
+CLEANING_SAMPLES = [
+    'Como cliente\r\neu quero\r\n\r\n\r\npagar com Pix\r\n',
+    '  \t Título   com\t\tespaços  \r\n \r\n  \r\n\r\n  fim  \t ',
+    'linha\r\rsolta\n \n \n \nção\x00 com\x07 controle\x85 e ã acentuação',
+    '\r\n\r\n   \n',
+    'a' + ' ' * 13 + '\n' * 5 + 'b\r',
+]
+
+
+@pytest.mark.parametrize('chunk_size', range(1, 8))
+@pytest.mark.parametrize('text', CLEANING_SAMPLES)
+def test_streamed_cleaning_matches_clean_text(text, chunk_size):
+    # Trechos pequenos partem \r\n, sequências de espaços e caracteres multibyte entre leituras
+    data = text.encode('utf-8')
+    chunks = [data[start:start + chunk_size] for start in range(0, len(data), chunk_size)]
+
+    streamed, stats = documentStreaming.stream_clean_text(iter(chunks), max_length=10000)
+
+    assert streamed == extractHistory.clean_text(text)
+    assert ''.join(cleaned for cleaned, _ in documentStreaming.iter_clean_chunks(iter(chunks))) == streamed
+    assert stats['originalLength'] == len(text)
+    assert stats['exceeded'] is False
@@ -0,0 +1,64 @@
+import generateBddTest
+import generateCode
+from conftest import text_delta, message_stop
+from deadlines import LocalLambdaContext
+from stageIdempotency import STAGE_CLAIMED, STAGE_COMPLETED, STAGE_IN_PROGRESS, begin_stage
+
+PYTHON_CODE = 'class Conta:\n    def depositar(self, valor):\n        return valor'
+FEATURE = 'Feature: Conta\n  Scenario: depositar\n    Given uma conta\n    When deposito 10\n    Then o saldo é 10'
+
+
+def code_event(request_id, **extra):
+    return dict({'requestId': request_id, 'language': 'python', 'contextForGeneration': 'Conta bancária'}, **extra)
+
+
+def fused_stream():
+    return [text_delta(f"\n{PYTHON_CODE}\n</artifact>\n<feature>\n{FEATURE}\n")] + message_stop()
+
+
+def body_shape(body):
+    return {key: sorted(value) if isinstance(value, dict) else type(value).__name__ for key, value in body.items()}
+
+
+def test_fused_generation_matches_the_separate_path(aws):
+    aws.bedrock.streams.append([text_delta(PYTHON_CODE)] + message_stop())
+    aws.bedrock.streams.append([text_delta(FEATURE)] + message_stop())
+    separate_code = generateCode.lambda_handler(code_event('req-separate'), LocalLambdaContext(300000))['body']
+    separate_bdd = generateBddTest.lambda_handler(
+        {'requestId': 'req-separate', 'language': 'python', 'code': PYTHON_CODE}, LocalLambdaContext(300000)
+    )['body']
+
+    aws.bedrock.streams.append(fused_stream())
+    fused = generateCode.lambda_handler(code_event('req-fused', generationMode='fused'), LocalLambdaContext(300000))['body']
+
+    fused_bdd = fused.pop('bdd')
+    assert fused['stats'].pop('fused')['bddFallback'] is False
+    assert body_shape(fused) == body_shape(separate_code)
+    assert body_shape(fused_bdd) == body_shape(separate_bdd)
+    assert fused_bdd['scenarioCount'] == separate_bdd['scenarioCount'] == 1
+
+    # Mesmas chaves S3 e conteúdo que o caminho de duas chamadas
+    for request_id in ['req-separate', 'req-fused']:
+        assert aws.s3.objects[(generateBddTest.S3_BUCKET, generateBddTest.build_s3_key(request_id))] == FEATURE
+        assert [body for (bucket, key), body in aws.s3.objects.items() if request_id in key and key.endswith('.py')] == [PYTHON_CODE]
+
+    # A etapa de BDD fica concluída: a chamada separada apenas devolve o resultado
+    assert begin_stage('req-fused', generateBddTest.STAGE_NAME)[0] == STAGE_COMPLETED
+    replayed = generateBddTest.lambda_handler(
+        {'requestId': 'req-fused', 'language': 'python', 'code': PYTHON_CODE}, LocalLambdaContext(300000)
+    )['body']
+    assert replayed['idempotentReplay'] is True
+    assert len(aws.bedrock.requests) == 3
+
+
+def test_fused_bdd_is_left_to_the_bdd_stage_when_it_is_in_progress(aws):
+    # Outra invocação já assumiu a etapa de BDD
+    assert begin_stage('req-busy', generateBddTest.STAGE_NAME)[0] == STAGE_CLAIMED
+    aws.bedrock.streams.append(fused_stream())
+
+    response = generateCode.lambda_handler(code_event('req-busy', generationMode='fused'), LocalLambdaContext(300000))
+
+    assert response['statusCode'] == 200
+    assert 'bdd' not in response['body']
+    assert response['body']['stats']['fused']['bddStage'] == STAGE_IN_PROGRESS
+    assert (generateBddTest.S3_BUCKET, generateBddTest.build_s3_key('req-busy')) not in aws.s3.objects
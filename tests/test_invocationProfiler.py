@@ -0,0 +1,98 @@
+import io
+import json
+import pstats
+import re
+import time
+import tracemalloc
+
+import boto3
+import pytest
+from botocore.client import BaseClient
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+
+import invocationProfiler
+from deadlines import DeadlineExceeded, LocalLambdaContext, start_deadline
+from invocationProfiler import profiled_handler
+
+
+class SlowRaw(io.BytesIO):
+    # Corpo que demora a chegar: cada leitura espera como uma conexão lenta
+    def read(self, *args):
+        time.sleep(0.05)
+        return super().read(*args)
+
+
+def stubbed_s3_client():
+    client = boto3.session.Session().client('s3', region_name='us-east-1', aws_access_key_id='x', aws_secret_access_key='x')
+    stubber = Stubber(client)
+    stubber.add_response('get_object', {'Body': StreamingBody(SlowRaw(b'conteudo'), len(b'conteudo'))}, {'Bucket': 'b', 'Key': 'k'})
+    stubber.activate()
+    return client
+
+
+def test_disabled_profile_only_calls_handler(monkeypatch):
+    monkeypatch.delenv(invocationProfiler.PROFILE_ENV_FLAG, raising=False)
+    monkeypatch.setattr(invocationProfiler, 'upload_profile', lambda *args: pytest.fail('upload sem perfil'))
+    original_call = BaseClient._make_api_call
+    seen = {}
+
+    @profiled_handler('stage', 'bucket')
+    def handler(event, context):
+        seen['tracing'] = tracemalloc.is_tracing()
+        seen['patched'] = BaseClient._make_api_call is not original_call
+        return {'statusCode': 200, 'body': {'ok': True}}
+
+    assert handler({'requestId': 'r1'}, None) == {'statusCode': 200, 'body': {'ok': True}}
+    assert seen == {'tracing': False, 'patched': False}
+
+
+def test_profile_artifacts_include_streamed_body_time(aws, tmp_path):
+    s3_client = stubbed_s3_client()
+    uploads = aws.s3
+
+    @profiled_handler('extract_history', {'java': 'bucket-java'})
+    def handler(event, context):
+        body = s3_client.get_object(Bucket='b', Key='k')['Body']
+        return {'statusCode': 200, 'body': {'content': body.read().decode()}}
+
+    response = handler({'requestId': 'r2', 'language': 'java', 'profile': True}, None)
+
+    assert not tracemalloc.is_tracing()
+    assert response['body']['content'] == 'conteudo'
+    profile = response['body']['profile']
+    assert profile['bucket'] == 'bucket-java'
+    assert re.fullmatch(r'profiles/r2/extract_history/\d{8}T\d{6}/summary\.json', profile['summaryKey'])
+    assert profile['pstatsKey'] == profile['summaryKey'].replace('summary.json', 'profile.pstats')
+
+    summary = json.loads(uploads.objects[('bucket-java', profile['summaryKey'])])
+    assert {'stage', 'requestId', 'profiledAt', 'wallMs', 'cpuMs', 'remoteWaitMs', 'otherWaitMs', 'remoteCalls', 'memory', 'topFunctions'} <= set(summary)
+    call = summary['remoteCalls']['s3.GetObject']
+    assert call['count'] == 1
+    # A leitura do corpo acontece depois de _make_api_call e entra no tempo da chamada
+    assert call['streamMs'] >= 40
+    assert call['wallMs'] >= call['streamMs']
+    assert summary['remoteWaitMs'] >= call['streamMs']
+    assert summary['memory']['peakBytes'] > 0
+
+    stats_path = tmp_path / 'profile.pstats'
+    stats_path.write_bytes(uploads.objects[('bucket-java', profile['pstatsKey'])])
+    assert pstats.Stats(str(stats_path)).total_calls > 0
+
+
+def test_raising_handler_stops_tracing_and_still_uploads_profile(aws):
+    context = LocalLambdaContext(30000)
+
+    @profiled_handler('generate_code', 'bucket-perfil')
+    def handler(event, context):
+        start_deadline(context)
+        context.consume_ms(30000)
+        raise DeadlineExceeded('Prazo esgotado durante a geração')
+
+    with pytest.raises(DeadlineExceeded):
+        handler({'requestId': 'r3', 'profile': True}, context)
+
+    assert not tracemalloc.is_tracing()
+    summaries = [json.loads(body) for (bucket, key), body in aws.s3.objects.items() if key.endswith('summary.json')]
+    assert [summary['error'] for summary in summaries] == ['DeadlineExceeded']
+    assert any(key.endswith('profile.pstats') for _, key in aws.s3.objects)
@@ -0,0 +1,55 @@
+import json
+import subprocess
+import sys
+
+import generateBddTest
+import generateCode
+import languageRegistry
+from deadlines import LocalLambdaContext
+
+
+def test_generate_code_exposes_the_shared_registry():
+    assert generateCode.LANGUAGES is languageRegistry.LANGUAGES
+    assert generateCode.get_language('JAVA')['stage'] == 'generate_java_code'
+
+
+def test_bdd_accepts_registered_languages_only(aws, monkeypatch):
+    spec = dict(languageRegistry.get_language('python'), display_name='Kotlin')
+    monkeypatch.setitem(languageRegistry.LANGUAGES, 'kotlin', spec)
+    event = {'requestId': 'req-bdd', 'generatedCode': 'fun main() {}'}
+
+    rejected = generateBddTest.lambda_handler(dict(event, language='cobol'), None)
+    assert rejected['statusCode'] == 400
+    assert 'kotlin' in json.loads(rejected['body'])['message']
+
+    aws.bedrock.streams.append([
+        {'contentBlockDelta': {'delta': {'text': 'Feature: Main\n  Scenario: roda\n    Given nada\n'}}},
+        {'messageStop': {'stopReason': 'end_turn'}}
+    ])
+    accepted = generateBddTest.lambda_handler(dict(event, language='kotlin'), LocalLambdaContext(300000))
+    assert accepted['statusCode'] == 200
+
+
+def test_extract_history_does_not_load_the_generation_engine():
+    loaded = subprocess.run(
+        [sys.executable, '-c', 'import sys, extractHistory; print(sorted(m for m in ("generateCode", "componentGeneration", "fusedGeneration") if m in sys.modules))'],
+        cwd=languageRegistry.__file__.rsplit('/', 1)[0], capture_output=True, text=True, check=True
+    )
+    assert loaded.stdout.strip() == '[]'
+
+
+def test_cold_start_simulation_replays_the_same_traffic_in_both_scenarios():
+    result = generateCode.simulate_cold_starts({'python': 0.85, 'java': 0.15}, requests_per_hour=30)
+    per_language, unified = result['perLanguageFunctions'], result['unifiedFunction']
+
+    for language in ('python', 'java'):
+        assert per_language['perLanguage'][language]['requests'] == unified['perLanguage'][language]['requests'] > 0
+    # A linguagem minoritária aproveita os containers quentes da majoritária
+    assert unified['perLanguage']['java']['coldStartRate'] < per_language['perLanguage']['java']['coldStartRate']
+    assert unified['coldStartRate'] < per_language['coldStartRate']
+
+
+def test_cold_start_simulation_is_identical_for_a_single_language():
+    result = generateCode.simulate_cold_starts({'python': 1.0}, requests_per_hour=30, hours=6)
+
+    assert result['perLanguageFunctions'] == result['unifiedFunction']
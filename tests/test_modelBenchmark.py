@@ -0,0 +1,78 @@
+import json
+import sys
+
+import pytest
+
+import modelBenchmark
+
+MODEL = 'amazon.nova-lite-v1:0'
+STORIES = [{'id': 'login', 'text': 'Como usuário eu quero fazer login.'},
+           {'id': 'carrinho', 'text': 'Como cliente eu quero montar um carrinho.'}]
+
+PYTHON_CODE = 'class Login:\n    pass\n\nclass Conta:\n    pass\n'
+FEATURE = 'Feature: Login\n  Scenario: ok\n    Given x\n  Scenario: falha\n    Given y\n'
+
+
+def recording(text, input_tokens, output_tokens, latency_ms, stop_reason='end_turn'):
+    return {'text': text, 'inputTokens': input_tokens, 'outputTokens': output_tokens,
+            'latencyMs': latency_ms, 'stopReason': stop_reason}
+
+
+# Replay mínimo para exercitar agregação e tabela; não representa medições reais
+REPLAY = {
+    f'{MODEL}|python|login': recording(PYTHON_CODE, 1000, 500, 1000),
+    f'{MODEL}|python|carrinho': recording('def quebrado(:', 1000, 8000, 3000, 'max_tokens'),
+    f'{MODEL}|bdd|login': recording(FEATURE, 2000, 1000, 2000),
+}
+
+
+def test_offline_replay_aggregates_per_model_and_task():
+    samples = modelBenchmark.run_benchmark([MODEL], stories=STORIES, recordings=REPLAY)
+    # Tarefas sem gravação são ignoradas
+    assert sorted((sample['task'], sample['story']) for sample in samples) == [
+        ('bdd', 'login'), ('python', 'carrinho'), ('python', 'login')]
+
+    rows = {row['task']: row for row in modelBenchmark.summarize(samples)}
+    python_row = rows['python']
+    assert python_row['runs'] == 2 and python_row['errors'] == 0
+    assert python_row['p50LatencyMs'] == 2000
+    assert python_row['maxLatencyMs'] == 3000
+    assert python_row['tokensPerSecond'] == pytest.approx((500 / 1 + 8000 / 3) / 2)
+    assert python_row['parseRate'] == 0.5
+    assert python_row['truncationRate'] == 0.5
+    assert python_row['classCount'] == 1
+    # Nova Lite: 0.00006 / 0.00024 por 1K tokens
+    assert python_row['costUsd'] == pytest.approx(2 * 0.00006 + 8.5 * 0.00024)
+
+    assert rows['bdd']['scenarioCount'] == 2
+    assert rows['bdd']['parseRate'] == 1
+
+
+def test_table_has_one_line_per_row_and_marks_errors():
+    rows = modelBenchmark.summarize([
+        {'model': MODEL, 'task': 'java', 'story': 'login', 'error': 'ThrottlingException'}
+    ] + modelBenchmark.run_benchmark([MODEL], stories=STORIES[:1], recordings=REPLAY))
+
+    lines = modelBenchmark.format_table(rows).splitlines()
+    assert len(lines) == 2 + len(rows)
+    assert lines[0].count('|') == lines[1].count('|') == 12
+    error_line = next(line for line in lines if '| java |' in line)
+    assert error_line.startswith(f'| {MODEL} | java | 1 | erro (1) |')
+    assert error_line.count('|') == 12
+    python_line = next(line for line in lines if '| python |' in line)
+    assert '| 1000 | 500.0 | 500 |' in python_line
+    assert '| 100% | 0% | 2.0 | 0.0 |' in python_line
+
+
+def test_offline_run_does_not_touch_history(tmp_path, monkeypatch, capsys):
+    recordings_file = tmp_path / 'recordings.json'
+    recordings_file.write_text(json.dumps(REPLAY), encoding='utf-8')
+    history_file = tmp_path / 'history.jsonl'
+    monkeypatch.setattr(modelBenchmark, 'BENCHMARK_STORIES', STORIES)
+    monkeypatch.setattr(sys, 'argv', ['modelBenchmark.py', '--models', MODEL,
+                                      '--recordings', str(recordings_file), '--history', str(history_file)])
+
+    modelBenchmark.main()
+
+    assert '| python |' in capsys.readouterr().out
+    assert not history_file.exists()
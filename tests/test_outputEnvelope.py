@@ -0,0 +1,29 @@
+from outputEnvelope import extract_artifact
+
+PYTHON_CODE = '''import sys
+
+
+def main():
+    print("ok")
+
+
+main()'''
+
+
+def test_trailing_prose_is_dropped_from_python():
+    text = PYTHON_CODE + '\n\nEste código imprime "ok" ao ser executado.\n\nObservação: requer Python 3.'
+
+    assert extract_artifact(text, 'python') == PYTHON_CODE
+
+
+def test_python_code_is_never_dropped_to_make_it_parse():
+    # Código incompleto (truncado) com código depois: nada é cortado e a validação aponta o erro
+    truncated = 'def total(itens):\n    return sum(\n\nresultado = total([1, 2])'
+
+    assert extract_artifact(truncated, 'python') == truncated
+
+
+def test_python_prose_is_kept_when_the_rest_still_does_not_parse():
+    text = 'def total(itens):\n    return sum(\n\nEste código soma os itens.'
+
+    assert extract_artifact(text, 'python') == text
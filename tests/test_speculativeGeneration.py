@@ -0,0 +1,69 @@
+import threading
+
+import bedrockScheduler
+import deadlines
+import speculativeGeneration
+import tokenBudget
+from conftest import text_delta, message_stop
+from deadlines import LocalLambdaContext
+from extractHistory import build_context_for_generation
+
+STORY = 'Como cliente eu quero consultar meus pedidos para acompanhar as entregas'
+SPECULATIVE_CODE = 'class Pedido:\n    pass'
+REGENERATED_CODE = 'class PedidoFinanceiro:\n    pass'
+
+
+def test_speculative_code_is_kept_when_the_story_barely_changes(aws):
+    aws.bedrock.streams.append([text_delta(SPECULATIVE_CODE)] + message_stop())
+
+    def standardize(text, lane, tenant):
+        return text + '.'
+
+    result = speculativeGeneration.run_speculative_generation(STORY, 'python', standardize, build_context_for_generation)
+
+    assert result['stats']['hit'] is True
+    assert result['generatedCode'] == SPECULATIVE_CODE
+    assert result['standardizedStory'] == STORY + '.'
+    assert len(aws.bedrock.requests) == 1
+
+
+def test_discarded_speculation_is_cancelled_and_regenerated(aws, monkeypatch):
+    speculation_started = threading.Event()
+    cancelled = threading.Event()
+    original_cancel = speculativeGeneration.cancel_speculation
+
+    def spy_cancel(speculation, cancel_event):
+        cancel_event.set()
+        cancelled.set()
+        original_cancel(speculation, cancel_event)
+
+    monkeypatch.setattr(speculativeGeneration, 'cancel_speculation', spy_cancel)
+
+    def speculative_stream(request):
+        speculation_started.set()
+        yield text_delta('class Pedido:\n')
+        # Só continua depois do descarte: o próximo trecho encontra o cancelamento
+        assert cancelled.wait(5)
+        yield text_delta('    pass\n')
+        yield from message_stop()
+
+    deadlines.start_deadline(LocalLambdaContext(300000))
+    aws.bedrock.streams.append(speculative_stream)
+    aws.bedrock.streams.append([text_delta(REGENERATED_CODE)] + message_stop())
+
+    def standardize(text, lane, tenant):
+        assert speculation_started.wait(5)
+        return 'Como analista financeiro eu quero conciliar faturas com pagamentos recebidos no banco'
+
+    result = speculativeGeneration.run_speculative_generation(STORY, 'python', standardize, build_context_for_generation)
+
+    assert result['stats']['hit'] is False
+    assert result['generatedCode'] == REGENERATED_CODE
+    speculative_body, regenerated_body = aws.bedrock.bodies
+    assert speculative_body.closed
+    # A regeneração parte do contexto padronizado
+    assert 'conciliar faturas' in aws.bedrock.requests[1]['messages'][0]['content'][0]['text']
+    # Vaga do agendador liberada e saída interrompida fora do histograma de tokens
+    assert bedrockScheduler.get_scheduler_store().active == 0
+    counters = tokenBudget.get_token_stats_store().load_counters()
+    assert sum(item['calls'] for item in counters.values()) == 1
@@ -0,0 +1,85 @@
+import generateCode
+import stageIdempotency
+from conftest import text_delta, message_stop
+from deadlines import LocalLambdaContext
+from stageIdempotency import STAGE_CLAIMED, STAGE_COMPLETED, STAGE_IN_PROGRESS, begin_stage
+
+REQUEST_ID = 'req-idempotency'
+STAGE = 'generate_java_code'
+JAVA_CODE = 'public class Cliente {\n}'
+
+
+def java_event(**extra):
+    return dict({'requestId': REQUEST_ID, 'language': 'java', 'contextForGeneration': 'Cadastro de clientes'}, **extra)
+
+
+class BrokenStore:
+    def claim(self, request_id, stage, now):
+        raise RuntimeError('DynamoDB indisponível')
+
+
+def test_stage_lifecycle_new_in_progress_completed(aws):
+    assert begin_stage(REQUEST_ID, STAGE) == (STAGE_CLAIMED, None)
+    assert begin_stage(REQUEST_ID, STAGE) == (STAGE_IN_PROGRESS, None)
+
+    stageIdempotency.complete_stage(REQUEST_ID, STAGE, {'codeLength': 10}, artifact={'bucket': 'b', 'key': 'k'})
+
+    status, record = begin_stage(REQUEST_ID, STAGE)
+    assert status == STAGE_COMPLETED
+    assert record == {'result': {'codeLength': 10}, 'artifact': {'bucket': 'b', 'key': 'k'}}
+
+
+def test_untracked_request_ids_always_run(aws):
+    for _ in range(2):
+        assert begin_stage('unknown', STAGE) == (STAGE_CLAIMED, None)
+
+
+def test_store_failure_fails_open(aws):
+    assert begin_stage(REQUEST_ID, STAGE, store=BrokenStore()) == (STAGE_CLAIMED, None)
+
+
+def test_completed_stage_is_replayed_without_calling_the_model(aws):
+    aws.bedrock.streams.append([text_delta(JAVA_CODE)] + message_stop())
+    first = generateCode.lambda_handler(java_event(), LocalLambdaContext(300000))
+
+    second = generateCode.lambda_handler(java_event(), LocalLambdaContext(300000))
+
+    assert len(aws.bedrock.requests) == 1
+    assert second['statusCode'] == 200
+    assert second['body'].pop('idempotentReplay') is True
+    assert second['body'] == first['body']
+
+
+def test_replay_re_signs_every_stored_key(aws):
+    stale = 'https://expirada'
+    record = {
+        'result': {
+            'presignedUrl': stale,
+            'componentFiles': [{'file': 'Cliente.java', 'key': 'code/Cliente.java', 'presignedUrl': stale}],
+            'bdd': {'presignedUrl': stale, 'scenarioCount': 2}
+        },
+        'artifact': {'bucket': 'codigo', 'key': 'code/all.java', 'bdd': {'bucket': 'bdd', 'key': 'bdd/x.feature'}}
+    }
+
+    replayed = stageIdempotency.replay_stage_result(record)
+
+    assert replayed['presignedUrl'] == 'https://codigo.s3.local/code/all.java'
+    assert replayed['componentFiles'] == [{
+        'file': 'Cliente.java', 'key': 'code/Cliente.java', 'presignedUrl': 'https://codigo.s3.local/code/Cliente.java'
+    }]
+    assert replayed['bdd'] == {'presignedUrl': 'https://bdd.s3.local/bdd/x.feature', 'scenarioCount': 2}
+    # O registro armazenado não é alterado
+    assert record['result']['componentFiles'][0]['presignedUrl'] == stale
+
+
+def test_failed_stage_is_released_for_the_next_attempt(aws, monkeypatch):
+    def failing_put(**kwargs):
+        raise RuntimeError('S3 indisponível')
+
+    monkeypatch.setattr(aws.s3, 'put_object', failing_put)
+    aws.bedrock.streams.append([text_delta(JAVA_CODE)] + message_stop())
+
+    response = generateCode.lambda_handler(java_event(), LocalLambdaContext(300000))
+
+    assert response['statusCode'] == 500
+    assert begin_stage(REQUEST_ID, STAGE) == (STAGE_CLAIMED, None)
@@ -0,0 +1,58 @@
+import json
+import os
+
+import pytest
+
+import extractHistory
+import storyStructure
+from storyStructure import STRUCTURE_SKIP_THRESHOLD, evaluate_classifier, load_labelled_stories
+
+STORY = 'Como cliente, eu quero consultar meus pedidos para que eu acompanhe as entregas.'
+LABELLED_STORIES = load_labelled_stories(os.path.join(os.path.dirname(__file__), 'fixtures', 'labelled_stories.json'))
+
+
+def test_default_threshold_never_skips_an_unstructured_story():
+    # Pular a padronização de uma história mal estruturada piora o código gerado
+    result = evaluate_classifier(LABELLED_STORIES, STRUCTURE_SKIP_THRESHOLD)
+
+    assert result['precision'] == 1.0, result
+    assert result['recall'] > 0, result
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, 0.9),
+    ('0.8', 0.8),
+    ('alto', 0.9),
+    ('1.5', 0.9),
+    ('-0.1', 0.9),
+    ('nan', 0.9),
+])
+def test_env_threshold_falls_back_to_default_when_invalid(monkeypatch, value, expected):
+    if value is None:
+        monkeypatch.delenv('STORY_STRUCTURE_THRESHOLD', raising=False)
+    else:
+        monkeypatch.setenv('STORY_STRUCTURE_THRESHOLD', value)
+
+    assert storyStructure._threshold_from_env('STORY_STRUCTURE_THRESHOLD', 0.9) == expected
+
+
+@pytest.mark.parametrize('field, value', [
+    ('structureThreshold', 'alto'),
+    ('structureThreshold', 1.5),
+    ('structureThreshold', None),
+    ('speculationThreshold', float('nan')),
+])
+def test_invalid_threshold_is_rejected_with_400(aws, field, value):
+    response = extractHistory.lambda_handler({'requestId': 'req-threshold', 'userStory': STORY, 'language': 'python', field: value}, None)
+
+    assert response['statusCode'] == 400
+    assert field in json.loads(response['body'])['message']
+
+
+def test_valid_threshold_is_reported(aws):
+    response = extractHistory.lambda_handler({'requestId': 'req-threshold', 'userStory': STORY, 'language': 'python', 'structureThreshold': '0'}, None)
+
+    assert response['statusCode'] == 200
+    standardization = response['body']['stats']['standardization']
+    assert standardization['threshold'] == 0.0
+    assert standardization['skipped'] is True
@@ -0,0 +1,88 @@
+from tokenBudget import (
+    BIN_WIDTH, MIN_SAMPLES, LocalTokenStatsStore, input_size_bucket, run_with_budget
+)
+
+TASK = 'code_python'
+PROMPT = 'Gere o código da história'
+CEILING = 8000
+KEY = f"{TASK}#{input_size_bucket(PROMPT)}"
+
+
+class ScriptedCall:
+    """
+    Substituto de invoke_model: registra os max_tokens pedidos e responde na ordem do roteiro.
+    """
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.budgets = []
+
+    def __call__(self, max_tokens):
+        self.budgets.append(max_tokens)
+        return self.responses.pop(0)
+
+
+def complete(output_tokens):
+    return ('código', 'end_turn', output_tokens)
+
+
+def truncated(output_tokens):
+    return ('códi', 'max_tokens', output_tokens)
+
+
+def warm_store(samples=MIN_SAMPLES, output_tokens=1000):
+    store = LocalTokenStatsStore()
+    for _ in range(samples):
+        run_with_budget(TASK, PROMPT, CEILING, ScriptedCall(complete(output_tokens)), store)
+    return store
+
+
+def test_ceiling_is_used_until_enough_samples_exist():
+    store = warm_store(samples=MIN_SAMPLES - 1)
+    call = ScriptedCall(complete(1000), complete(1000))
+
+    run_with_budget(TASK, PROMPT, CEILING, call, store)
+    run_with_budget(TASK, PROMPT, CEILING, call, store)
+
+    # A 30ª amostra chega na primeira chamada; a segunda já usa o orçamento adaptativo
+    assert call.budgets[0] == CEILING
+    assert BIN_WIDTH < call.budgets[1] < CEILING
+
+
+def test_truncated_output_is_retried_once_at_the_ceiling():
+    store = warm_store()
+    call = ScriptedCall(truncated(1500), truncated(CEILING))
+
+    text, stop_reason, _ = run_with_budget(TASK, PROMPT, CEILING, call, store)
+
+    assert len(call.budgets) == 2
+    assert call.budgets[0] < CEILING
+    assert call.budgets[1] == CEILING
+    assert stop_reason == 'max_tokens'
+    counters = store.load_counters()[KEY]
+    assert counters['retries'] == 1
+    assert counters['reservedTokens'] == MIN_SAMPLES * CEILING + call.budgets[0] + CEILING
+
+
+def test_truncation_at_the_ceiling_is_not_retried():
+    store = LocalTokenStatsStore()
+    call = ScriptedCall(truncated(CEILING))
+
+    run_with_budget(TASK, PROMPT, CEILING, call, store)
+
+    assert call.budgets == [CEILING]
+    assert store.load_counters()[KEY]['retries'] == 0
+
+
+def test_truncated_outputs_are_not_recorded_as_samples():
+    store = warm_store()
+    samples_before = sum(store.load_bins(KEY).values())
+
+    run_with_budget(TASK, PROMPT, CEILING, ScriptedCall(truncated(1500), truncated(CEILING)), store)
+    assert sum(store.load_bins(KEY).values()) == samples_before
+
+    # A repetição completa entra com o próprio tamanho
+    run_with_budget(TASK, PROMPT, CEILING, ScriptedCall(truncated(1500), complete(3000)), store)
+    bins = store.load_bins(KEY)
+    assert sum(bins.values()) == samples_before + 1
+    assert bins[3000 // BIN_WIDTH] == 1